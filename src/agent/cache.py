@@ -0,0 +1,124 @@
+"""On-disk, content-addressed cache of LLM summaries.
+
+Entries are keyed by a SHA-256 over the model, system prompt, user prompt and
+the post text actually sent, so the same article reappearing under
+a new id, in another config, or after a crashed run is served without another
+LLM call. Backed by a single SQLite file; safe to share across threads.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.util.paths import ensure_dir
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+class SummaryCache:
+    """SQLite-backed summary cache with size/age eviction and hit/miss counters."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    ):
+        ensure_dir(path.parent)
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.max_age_days = float(max_age_days)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " summary TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries(accessed)")
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, storage_dir: Path, cache_cfg: Optional[dict]) -> Optional["SummaryCache"]:
+        """Open the cache described by the ``cache:`` config section (None if disabled)."""
+        cache_cfg = cache_cfg or {}
+        if not cache_cfg.get("enabled", True):
+            return None
+        return cls(
+            storage_dir / cache_cfg.get("filename", "summary_cache.sqlite"),
+            max_entries=cache_cfg.get("max_entries", DEFAULT_MAX_ENTRIES),
+            max_age_days=cache_cfg.get("max_age_days", DEFAULT_MAX_AGE_DAYS),
+        )
+
+    @staticmethod
+    def key(model: str, system: str, user: str, text: str) -> str:
+        h = hashlib.sha256()
+        for part in (model, system, user, text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, created FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age_days > 0 and now - row[1] > self.max_age_days * 86400):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE summaries SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, summary: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries (key, model, summary, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, summary, now, now),
+            )
+            self._db.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used beyond ``max_entries``."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._db.execute("DELETE FROM summaries WHERE created < ?", (cutoff,)).rowcount
+            if self.max_entries > 0:
+                removed += self._db.execute(
+                    "DELETE FROM summaries WHERE key IN ("
+                    " SELECT key FROM summaries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            self._db.commit()
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM summaries").rowcount
+            self._db.commit()
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,11 +1,45 @@
 import os
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
 from pathlib import Path
 
-def make_client(project_root: Path) -> OpenAI:
+def _api_key(project_root: Path) -> str:
     load_dotenv(project_root / ".env")
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set (.env or env var).")
-    return OpenAI(api_key=api_key)
\ No newline at end of file
+    return api_key
+
+# SummaryScheduler owns retries (backoff, adaptive concurrency, RPM/TPM); the
+# SDK's own retries would hide 429s from it and multiply the attempts
+SDK_MAX_RETRIES = 0
+
+def make_client(project_root: Path) -> "OpenAI":
+    from openai import OpenAI  # ~0.7s to import; see LazyClient
+
+    return OpenAI(api_key=_api_key(project_root), max_retries=SDK_MAX_RETRIES)
+
+class LazyClient:
+    """Stand-in for ``make_client(project_root)`` that imports openai on first use.
+
+    The API key is still checked up front, so a missing key fails the run
+    immediately; runs whose summaries all come from the cache never pay for
+    the openai import.
+    """
+
+    def __init__(self, project_root: Path):
+        self._api_key = _api_key(project_root)
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+
+                    self._client = OpenAI(api_key=self._api_key, max_retries=SDK_MAX_RETRIES)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
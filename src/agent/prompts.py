@@ -0,0 +1,179 @@
+"""Prompt registry: templates loaded and validated once, reloaded on change.
+
+``PromptRegistry`` resolves each post kind to a pair of templates in
+``prompts/`` (``blog`` -> ``blog_*``, ``video`` -> ``youtube_*``, anything
+without its own files -> ``summary_*``), formats them with the configured
+interests once, and hands out the same string objects for every call. The
+system + user messages therefore form a byte-identical prefix for every post
+of a kind, which is what provider-side prompt caching keys on.
+
+Providers only cache prefixes above a minimum length (1024 tokens for OpenAI).
+When a kind's prefix falls short but is long enough that paying for padding at
+the cached rate is cheaper than sending it uncached, the system message is
+padded with a constant block up to the minimum. Templates are re-read when
+their mtime changes; a broken edit is logged and the previous version kept.
+"""
+from __future__ import annotations
+
+import logging
+import string
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from src.agent.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Post kind -> template name, for kinds whose files are named differently.
+KIND_TEMPLATES = {"video": "youtube"}
+FALLBACK_TEMPLATE = "summary"
+KINDS = ("blog", "video", "paper")
+ALLOWED_FIELDS = {"interests"}
+
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+DEFAULT_CACHED_DISCOUNT = 0.5   # cached input tokens cost this much less
+RELOAD_CHECK_SECONDS = 2.0
+PAD_HEADER = "\n\n(Reference padding: the lines below are constant filler that keeps this prompt prefix cacheable. Ignore them.)\n"
+PAD_LINE = "- - - - - - - -\n"
+
+
+class Prompt(NamedTuple):
+    kind: str
+    template: str        # template name actually used, e.g. "youtube"
+    system: str          # formatted system prompt, as used for cache keys
+    user: str            # formatted user prompt (interests filled in)
+    prefix_system: str   # system message actually sent (possibly padded)
+    prefix_tokens: int   # tokens in prefix_system + user
+    cacheable: bool      # prefix_tokens reaches the provider minimum
+
+
+def _validate_user(path: Path, text: str):
+    try:
+        fields = {f for _, f, _, _ in string.Formatter().parse(text) if f is not None}
+    except ValueError as exc:
+        raise ValueError(f"{path}: invalid template ({exc})") from None
+    unknown = fields - ALLOWED_FIELDS
+    if unknown:
+        raise ValueError(f"{path}: unknown placeholder(s) {', '.join(sorted(unknown))}; only {{interests}} is available")
+
+
+class PromptRegistry:
+    """Compiled prompts per post kind; safe to share across threads."""
+
+    def __init__(
+        self,
+        prompts_dir: Path,
+        interests: str,
+        *,
+        model: str = "gpt-4o-mini",
+        min_cacheable_tokens: int = DEFAULT_MIN_CACHEABLE_TOKENS,
+        cached_discount: float = DEFAULT_CACHED_DISCOUNT,
+        pad: bool = True,
+    ):
+        self.prompts_dir = Path(prompts_dir)
+        self.interests = interests or ""
+        self.model = model
+        self.min_cacheable_tokens = int(min_cacheable_tokens)
+        self.cached_discount = float(cached_discount)
+        self.pad = pad
+        self._lock = threading.Lock()
+        self._prompts: Dict[str, Prompt] = {}
+        self._mtimes: Dict[str, Tuple[float, float]] = {}
+        self._checked = 0.0
+        for kind in KINDS:
+            self._prompts[kind] = self._load(kind)
+
+    @classmethod
+    def from_config(cls, prompts_dir: Path, interests: str, cfg: Optional[dict], model: str = "gpt-4o-mini") -> "PromptRegistry":
+        """Build from the ``llm.prompt_cache:`` section of config.yml."""
+        cfg = cfg or {}
+        return cls(
+            prompts_dir,
+            interests,
+            model=model,
+            min_cacheable_tokens=int(cfg.get("min_tokens", DEFAULT_MIN_CACHEABLE_TOKENS)),
+            cached_discount=float(cfg.get("cached_discount", DEFAULT_CACHED_DISCOUNT)),
+            pad=bool(cfg.get("pad", True)),
+        )
+
+    # -- loading ---------------------------------------------------------
+    def _paths(self, name: str) -> Tuple[Path, Path]:
+        return self.prompts_dir / f"{name}_system.txt", self.prompts_dir / f"{name}_user.txt"
+
+    def _template_for(self, kind: str) -> str:
+        for name in (kind, KIND_TEMPLATES.get(kind), FALLBACK_TEMPLATE):
+            if name and all(p.exists() for p in self._paths(name)):
+                return name
+        raise FileNotFoundError(f"no prompt templates for kind {kind!r} in {self.prompts_dir}")
+
+    def _padded(self, system: str, user: str) -> Tuple[str, int]:
+        tokens = count_tokens(system, self.model) + count_tokens(user, self.model)
+        short = self.min_cacheable_tokens - tokens
+        # Padding pays off only if the whole prefix at the cached rate costs
+        # less than the unpadded prefix at the full rate.
+        if not self.pad or short <= 0 or tokens <= self.min_cacheable_tokens * (1 - self.cached_discount):
+            return system, tokens
+        user_tokens = count_tokens(user, self.model)
+        lines = max(1, (short - count_tokens(PAD_HEADER, self.model)) // max(1, count_tokens(PAD_LINE, self.model)))
+        while True:  # token counts are not additive across joins; top up until reached
+            padded = system + PAD_HEADER + PAD_LINE * lines
+            tokens = count_tokens(padded, self.model) + user_tokens
+            if tokens >= self.min_cacheable_tokens:
+                return padded, tokens
+            lines += 1
+
+    def _load(self, kind: str) -> Prompt:
+        name = self._template_for(kind)
+        system_path, user_path = self._paths(name)
+        system = system_path.read_text(encoding="utf-8")
+        user_tmpl = user_path.read_text(encoding="utf-8")
+        if not system.strip():
+            raise ValueError(f"{system_path}: empty system prompt")
+        _validate_user(user_path, user_tmpl)
+        user = user_tmpl.format(interests=self.interests)
+        prefix_system, tokens = self._padded(system, user)
+        self._mtimes[kind] = (system_path.stat().st_mtime, user_path.stat().st_mtime)
+        return Prompt(kind, name, system, user, prefix_system, tokens, tokens >= self.min_cacheable_tokens)
+
+    def _reload_changed(self):
+        for kind, prompt in list(self._prompts.items()):
+            paths = self._paths(prompt.template)
+            try:
+                mtimes = tuple(p.stat().st_mtime for p in paths)
+            except OSError:
+                mtimes = None
+            if mtimes == self._mtimes.get(kind):
+                continue
+            try:
+                self._prompts[kind] = self._load(kind)
+                logger.info("Reloaded %s prompts (%s)", kind, self._prompts[kind].template)
+            except (OSError, ValueError) as exc:
+                logger.warning("Keeping previous %s prompts; reload failed: %s", kind, exc)
+                if mtimes is not None:
+                    self._mtimes[kind] = mtimes
+
+    # -- lookup ----------------------------------------------------------
+    def get(self, kind: str) -> Prompt:
+        """The compiled prompt for a post kind (templates re-checked every few seconds)."""
+        now = time.monotonic()
+        if now - self._checked >= RELOAD_CHECK_SECONDS:
+            with self._lock:
+                if now - self._checked >= RELOAD_CHECK_SECONDS:
+                    self._checked = now
+                    self._reload_changed()
+        prompt = self._prompts.get(kind)
+        if prompt is None:
+            with self._lock:
+                prompt = self._prompts.get(kind) or self._load(kind)
+                self._prompts[kind] = prompt
+        return prompt
+
+    def describe(self) -> str:
+        """One-line summary of prefix sizes, e.g. for the run log."""
+        parts = []
+        for kind, p in sorted(self._prompts.items()):
+            state = "cacheable" if p.cacheable else "below cache minimum"
+            parts.append(f"{kind} {p.prefix_tokens} tok ({state})")
+        return ", ".join(parts)
@@ -1,65 +1,339 @@
+from __future__ import annotations
+
+import json
 import logging
+import threading
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
 
-from openai import OpenAI
-
+from src.agent.cache import SummaryCache
+from src.agent.prompts import Prompt, PromptRegistry
+from src.agent.tokens import count_tokens, split_by_tokens
 from src.sources.base import Post
 
+if TYPE_CHECKING:  # openai is imported lazily (see src.agent.client.LazyClient)
+    from openai import OpenAI
+
 MODEL = "gpt-4o-mini"  # good $/quality
+DEFAULT_MAX_INPUT_TOKENS = 16_000  # per request, prompts included
+DEFAULT_MAX_CHUNKS = 8             # long posts: at most this many notes combined per call
+CHUNK_INSTRUCTIONS = (
+    "The article below is too long for one request, so you are seeing one part of it. "
+    "Write compact notes on this part only: its key claims, results, numbers and names. "
+    "Do not write an overall summary; the notes will be combined afterwards."
+)
+MERGE_INSTRUCTIONS = (
+    "The article below is too long for one request. Here are notes on several consecutive parts of it. "
+    "Merge them into one set of compact notes that keeps every key claim, result, number and name. "
+    "Do not write an overall summary; the notes will be combined afterwards."
+)
+REDUCE_PREFIX = "Notes on consecutive parts of the article (the full text was too long to send at once):"
 logger = logging.getLogger(__name__)
 
 def load_prompt_texts(prompts_dir: Path, kind: str, interests: str) -> tuple[str, str]:
+    # Uncached one-off read; the summarizers use a PromptRegistry.
     system = (prompts_dir / f"{kind}_system.txt").read_text(encoding="utf-8")
     user_tmpl = (prompts_dir / f"{kind}_user.txt").read_text(encoding="utf-8")
     user = user_tmpl.format(interests=interests)
     return system, user
 
-def summarize_post(post: Post, client: OpenAI, prompts_dir: Path, interests: str):
+def local_summary(post: Post) -> Optional[str]:
+    """Summary for digest modes that need no LLM call; None if the LLM is needed."""
     if post["kind"] == "paper" and post.get("metadata", {}).get("digest_mode") == "abstract_only":
         abstract = (post.get("text") or "").strip()
-        summary = abstract[:1200]  # keep digest readable; adjust if you like
-        return {"post": post, "summary": summary}
+        return abstract[:1200]  # keep digest readable; adjust if you like
 
     if post["kind"] == "video" and post.get("metadata", {}).get("digest_mode") in ("title_only", "title_plus_description"):
         # No LLM call: produce a compact summary based on title/description rules.
         desc = (post.get("text") or "").strip()
         if post["metadata"]["digest_mode"] == "title_only" or not desc:
-            summary = "A new video is available."
-        else:
-            # Trim noisy lines (sponsor blocks, link dumps); keep a short paragraph
-            lines = [ln.strip() for ln in desc.splitlines() if ln.strip()]
-            # Heuristic: drop lines that are just links or “My Links” blocks
-            keep = []
-            for ln in lines:
-                if ln.lower().startswith(("http://","https://")): 
-                    continue
-                if any(k in ln.lower() for k in ["sponsor", "discord", "newsletter", "subscribe", "links:", "my links"]):
-                    continue
-                keep.append(ln)
-            collapsed = " ".join(keep)
-            summary = collapsed[:500]  # keep it short; enough to hint topics
+            return "A new video is available."
+        # Trim noisy lines (sponsor blocks, link dumps); keep a short paragraph
+        lines = [ln.strip() for ln in desc.splitlines() if ln.strip()]
+        # Heuristic: drop lines that are just links or “My Links” blocks
+        keep = []
+        for ln in lines:
+            if ln.lower().startswith(("http://","https://")): 
+                continue
+            if any(k in ln.lower() for k in ["sponsor", "discord", "newsletter", "subscribe", "links:", "my links"]):
+                continue
+            keep.append(ln)
+        collapsed = " ".join(keep)
+        return collapsed[:500]  # keep it short; enough to hint topics
+    return None
+
+def _post_header(post: Post) -> str:
+    return f"Title: {post['title']}\nURL: {post['url']}\n\n"
+
+def _post_text(post: Post) -> str:
+    return _post_header(post) + (post.get("text") or "")
+
+def _usage(resp, calls: int = 1) -> dict:
+    """Token usage reported for a response (zeros if the client reports none).
+
+    `cached_tokens` is the part of the input served from the provider's
+    prompt-prefix cache.
+    """
+    usage = getattr(resp, "usage", None)
+    tokens = {}
+    for name in ("input_tokens", "output_tokens"):
+        val = getattr(usage, name, None)
+        tokens[name] = val if isinstance(val, int) else 0
+    cached = getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", None)
+    tokens["cached_tokens"] = cached if isinstance(cached, int) else 0
+    tokens["calls"] = calls
+    return tokens
+
+def _add_usage(total: dict, usage: dict) -> dict:
+    for name, val in usage.items():
+        total[name] = total.get(name, 0) + val
+    return total
+
+def _messages(prompt: Prompt, content: str) -> list:
+    # System and user prompts first and unchanged: the shared, cacheable prefix.
+    return [
+        {"role": "system", "content": prompt.prefix_system},
+        {"role": "user", "content": prompt.user},
+        {"role": "user", "content": content},
+    ]
+
+def _fan_out(client, fn, items) -> list:
+    """``fn`` over `items` on the client's scheduler pool if it has one, else one after another."""
+    gather = getattr(getattr(client, "scheduler", None), "gather", None)
+    if gather is not None:
+        return gather(fn, items)
+    return [fn(item) for item in items]
+
+def _notes_text(notes) -> str:
+    return "\n\n".join(
+        f"Part {first}:\n{text}" if first == last else f"Parts {first}-{last}:\n{text}"
+        for first, last, text in notes
+    )
+
+def _group_notes(notes: list, budget: int, fan_in: int) -> List[list]:
+    """Consecutive notes in groups of at most `fan_in` whose text fits `budget` tokens (two at least)."""
+    groups: List[list] = []
+    current: list = []
+    used = 0
+    for note in notes:
+        tokens = count_tokens(note[2], MODEL)
+        if current and (len(current) >= fan_in or (len(current) >= 2 and used + tokens > budget)):
+            groups.append(current)
+            current, used = [], 0
+        current.append(note)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def _map_reduce(post: Post, client: OpenAI, prompt: Prompt, *, chunk_tokens: int, max_chunks: int):
+    """Summarize an over-budget post: summarize every chunk, merge the notes, then combine.
+
+    Chunks are summarized through the scheduler the post runs on (see
+    ``SummaryScheduler.gather``). While there are more than `max_chunks`
+    notes, or they do not fit one request, consecutive notes are merged in
+    rounds (notes of notes), so no part of the post is dropped.
+    Returns ``(summary, usage)``; raises if any call fails.
+    """
+    chunks = split_by_tokens(post.get("text") or "", chunk_tokens, MODEL)
+    header = _post_header(post)
+    usage: dict = {}
+    usage_lock = threading.Lock()  # calls run on the scheduler's threads
+
+    def call(content: str) -> str:
+        resp = client.responses.create(model=MODEL, input=_messages(prompt, content))
+        with usage_lock:
+            _add_usage(usage, _usage(resp))
+        return resp.output_text
+
+    texts = _fan_out(client, call, [
+        f"{CHUNK_INSTRUCTIONS}\n\n{header}Part {n} of {len(chunks)}:\n\n{chunk}"
+        for n, chunk in enumerate(chunks, start=1)
+    ])
+    notes = [(n, n, text) for n, text in enumerate(texts, start=1)]  # (first part, last part, notes)
+    fan_in = max(2, max_chunks)
+    rounds = 0
+    while len(notes) > 1 and (len(notes) > fan_in or count_tokens(_notes_text(notes), MODEL) > chunk_tokens):
+        groups = _group_notes(notes, chunk_tokens, fan_in)
+        texts = _fan_out(client, call, [f"{MERGE_INSTRUCTIONS}\n\n{header}{_notes_text(group)}" for group in groups])
+        notes = [(group[0][0], group[-1][1], text) for group, text in zip(groups, texts)]
+        rounds += 1
+    if rounds:
+        logger.info("%s: %d chunks merged in %d round(s)", post.get("url") or post.get("title"), len(chunks), rounds)
+    summary = call(f"{header}{REDUCE_PREFIX}\n\n{_notes_text(notes)}")
+    return summary, usage
+
+def summarize_post(
+    post: Post,
+    client: OpenAI,
+    prompts: PromptRegistry,
+    cache: Optional[SummaryCache] = None,
+    *,
+    max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+    max_chunks: int = DEFAULT_MAX_CHUNKS,
+):
+    """Summarize one post; the result carries the post's token `usage`.
+
+    Posts whose prompt plus text exceed `max_input_tokens` are split on
+    paragraph boundaries and map-reduced instead of being truncated. LLM
+    results also carry `seconds` (wall time, rate-limit waits included) and
+    `fallback` when the call failed and the body excerpt was used instead.
+    """
+    started = time.perf_counter()
+    summary = local_summary(post)
+    if summary is not None:
         return {"post": post, "summary": summary}
 
     # default path: use LLM with source-specific prompts
-    system, user = load_prompt_texts(prompts_dir, post["kind"], interests)
-    header = f"Title: {post['title']}\nURL: {post['url']}\n\n"
+    prompt = prompts.get(post["kind"])
     body = (post.get("text") or "")
-    text = header + body
+    text = _post_text(post)
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(MODEL, prompt.system, prompt.user, text)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {"post": post, "summary": cached, "cached": True, "usage": _usage(None, calls=0)}
+    prompt_tokens = prompt.prefix_tokens
     try:
-        resp = client.responses.create(
-            model=MODEL,
-            input=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-                {"role": "user", "content": text[:80_000]},
-            ],
-        )
-        summary = resp.output_text
+        if prompt_tokens + count_tokens(text, MODEL) <= max_input_tokens:
+            resp = client.responses.create(model=MODEL, input=_messages(prompt, text))
+            summary, usage = resp.output_text, _usage(resp)
+        else:
+            chunk_tokens = max_input_tokens - prompt_tokens - count_tokens(CHUNK_INSTRUCTIONS + _post_header(post), MODEL) - 16
+            summary, usage = _map_reduce(
+                post, client, prompt,
+                chunk_tokens=max(chunk_tokens, 256), max_chunks=max(1, max_chunks),
+            )
     except Exception:  # noqa: BLE001 - we want to keep digest generation resilient
         ident = post.get("url") or post.get("id") or post.get("title") or "unknown post"
         logger.exception("LLM summarization failed for %s; using fallback content", ident)
-        summary = fallback_summary(post, body)
-    return {"post": post, "summary": summary}
+        return {"post": post, "summary": fallback_summary(post, body), "fallback": True, "seconds": time.perf_counter() - started}
+    if cache is not None:
+        cache.put(cache_key, MODEL, summary)
+    return {"post": post, "summary": summary, "usage": usage, "seconds": time.perf_counter() - started}
+
+
+# -- batched summarization of short posts ---------------------------------
+
+BATCH_INSTRUCTIONS = (
+    "You will receive several independent items, each introduced by a line '### ITEM <n>'. "
+    "Summarize every item separately, following the rules above for each one. "
+    'Reply with JSON only, in the form {"items": [{"n": <n>, "summary": "<summary>"}, ...]}, '
+    "with exactly one entry per item."
+)
+BATCH_OUTPUT_ALLOWANCE = 250  # expected completion tokens per packed item
+
+def plan_batches(
+    posts: List[Post],
+    *,
+    short_tokens: int,
+    budget_tokens: int,
+    max_items: int,
+) -> List[List[Post]]:
+    """Group posts into summarization units, in input order.
+
+    Short LLM-bound posts (at most `short_tokens`) of the same kind are packed
+    greedily while their input plus expected output fits `budget_tokens`; every
+    other post is a unit of its own.
+    """
+    units: List[List[Post]] = []
+    open_batches: dict = {}  # kind -> (unit, tokens used)
+    for post in posts:
+        cost = count_tokens(_post_text(post), MODEL)
+        if local_summary(post) is not None or cost > short_tokens:
+            units.append([post])
+            continue
+        cost += BATCH_OUTPUT_ALLOWANCE
+        unit, used = open_batches.get(post["kind"], (None, 0))
+        if unit is None or len(unit) >= max_items or used + cost > budget_tokens:
+            unit, used = [], 0
+            units.append(unit)
+        unit.append(post)
+        open_batches[post["kind"]] = (unit, used + cost)
+    return units
+
+def _parse_batch(output: str, n_items: int) -> dict:
+    """Map item number -> summary from the model's JSON; raises ValueError if malformed."""
+    raw = (output or "").strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`")
+        raw = raw[raw.find("{"):]
+    data = json.loads(raw)
+    results = {}
+    for entry in data.get("items", []):
+        n = int(entry["n"])
+        summary = str(entry.get("summary") or "").strip()
+        if 1 <= n <= n_items and summary:
+            results[n] = summary
+    return results
+
+def summarize_batch(
+    posts: List[Post],
+    client: OpenAI,
+    prompts: PromptRegistry,
+    cache: Optional[SummaryCache] = None,
+    **limits,
+):
+    """Summarize a unit from `plan_batches`; returns items in the same order.
+
+    Several posts share one request (one system prompt, one round-trip) and
+    the model answers with per-item JSON. Items missing from the reply, or the
+    whole batch if the reply cannot be parsed, fall back to `summarize_post`
+    (which also receives `limits`). Summaries are cached under the same
+    per-post key as single calls; a batch's token usage is split evenly over
+    the items it answered.
+    """
+    if len(posts) == 1:
+        return [summarize_post(posts[0], client, prompts, cache=cache, **limits)]
+
+    prompt = prompts.get(posts[0]["kind"])
+    items: List[Optional[dict]] = [None] * len(posts)
+    keys: List[Optional[str]] = [None] * len(posts)
+    pending = []
+    for i, post in enumerate(posts):
+        if cache is not None:
+            keys[i] = cache.key(MODEL, prompt.system, prompt.user, _post_text(post))
+            cached = cache.get(keys[i])
+            if cached is not None:
+                items[i] = {"post": post, "summary": cached, "cached": True, "usage": _usage(None, calls=0)}
+                continue
+        pending.append(i)
+
+    share: dict = {}  # per-item part of the batch request's usage
+    parsed: dict = {}
+    if len(pending) > 1:
+        packed = "\n\n".join(f"### ITEM {n}\n{_post_text(posts[i])}" for n, i in enumerate(pending, start=1))
+        started = time.perf_counter()
+        resp = None
+        try:
+            resp = client.responses.create(
+                model=MODEL,
+                input=_messages(prompt, BATCH_INSTRUCTIONS + "\n\n" + packed),
+                text={"format": {"type": "json_object"}},
+            )
+            parsed = _parse_batch(resp.output_text, len(pending))
+        except Exception:  # noqa: BLE001 - fall back to one call per item
+            logger.warning("Batched summarization of %d posts failed; falling back to single calls", len(pending), exc_info=True)
+            parsed = {}
+        if resp is not None:
+            # Charge the request to the items it answered, or to all if none parsed
+            share = {k: v / (len(parsed) or len(pending)) for k, v in _usage(resp).items()}
+        seconds = time.perf_counter() - started  # the whole request, for each item in it
+        for n, i in enumerate(pending, start=1):
+            if n in parsed:
+                items[i] = {"post": posts[i], "summary": parsed[n], "batched": True, "usage": dict(share), "seconds": seconds}
+                if cache is not None:
+                    cache.put(keys[i], MODEL, parsed[n])
+
+    for i, post in enumerate(posts):
+        if items[i] is None:
+            items[i] = summarize_post(post, client, prompts, cache=cache, **limits)
+            # Only when nothing parsed was the request charged to the fallbacks
+            if share and not parsed and i in pending and "usage" in items[i]:
+                _add_usage(items[i]["usage"], share)
+    return items
 
 
 def fallback_summary(post: Post, body: str) -> str:
@@ -0,0 +1,313 @@
+"""Concurrent, rate-limit-aware scheduling of LLM summarization calls.
+
+``SummaryScheduler`` wraps any client shaped like the one returned by
+``make_client`` (i.e. exposing ``client.responses.create(...)``) in a throttled
+proxy and runs summarization jobs on a thread pool:
+
+- requests-per-minute and tokens-per-minute budgets are enforced with token
+  buckets before each call (tokens are counted from the input with
+  ``src.agent.tokens`` and corrected from ``resp.usage`` afterwards);
+- 429 and 5xx responses are retried with exponential backoff (honouring a
+  ``Retry-After`` header when present) and halve the concurrency limit, which
+  then grows back by one after a streak of successes;
+- results are returned in input order;
+- a job can fan out sub-requests (the chunks of a long post) through
+  ``client.scheduler.gather``, on the same pool and under the same limits.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+from src.agent.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+# Rough allowance for the completion when reserving tokens-per-minute budget.
+OUTPUT_TOKEN_ALLOWANCE = 400
+
+_RETRYABLE_NAMES = {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+def _input_tokens(kwargs: dict) -> int:
+    payload = kwargs.get("input")
+    model = kwargs.get("model") or "gpt-4o-mini"
+    if isinstance(payload, str):
+        return count_tokens(payload, model)
+    total = 0
+    for msg in payload or []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, str):
+            total += count_tokens(content, model)
+    return total
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "status", "http_status"):
+        val = getattr(exc, attr, None)
+        if isinstance(val, int):
+            return val
+    val = getattr(getattr(exc, "response", None), "status_code", None)
+    return val if isinstance(val, int) else None
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    status = _status_of(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in _RETRYABLE_NAMES
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        val = headers.get("retry-after")
+        return float(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``per_minute / 60`` units per second."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+        need = min(amount, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.rate
+
+
+class _AdaptiveLimit:
+    """Concurrency limit that halves on throttling and creeps back up on success."""
+
+    def __init__(self, limit: int):
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self.active = 0
+        self._streak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, throttled: bool):
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._streak = 0
+            else:
+                self._streak += 1
+                if self._streak >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._streak = 0
+            self._cond.notify_all()
+
+
+class _ThrottledResponses:
+    # Resolves ``client.responses`` per call, so a lazily created client is
+    # only built once a request is actually made.
+    def __init__(self, scheduler: "SummaryScheduler", client):
+        self._scheduler = scheduler
+        self._client = client
+
+    def create(self, **kwargs):
+        return self._scheduler._call(self._client.responses.create, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client.responses, name)
+
+
+class _ThrottledClient:
+    def __init__(self, scheduler: "SummaryScheduler", inner):
+        self._inner = inner
+        self.scheduler = scheduler
+        self.responses = _ThrottledResponses(scheduler, inner)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class SummaryScheduler:
+    """Run summarization jobs concurrently under RPM/TPM budgets.
+
+    Parameters
+    ----------
+    client : object exposing ``responses.create(**kwargs)``.
+    max_concurrency : upper bound on in-flight LLM requests.
+    requests_per_minute, tokens_per_minute : budgets; ``None``/0 disables.
+    max_retries : retries per request on 429/5xx before giving up.
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = int(max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._clock = clock
+        now = clock()
+        self._rpm = _Bucket(requests_per_minute, now) if requests_per_minute else None
+        self._tpm = _Bucket(tokens_per_minute, now) if tokens_per_minute else None
+        self._budget_lock = threading.Lock()
+        self._limit = _AdaptiveLimit(self.max_concurrency)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.client = _ThrottledClient(self, client)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+
+    @classmethod
+    def from_config(cls, client, llm_cfg: Optional[dict], **overrides) -> "SummaryScheduler":
+        """Build from the ``llm:`` section of config.yml; non-None overrides win."""
+        llm_cfg = llm_cfg or {}
+        kwargs = {
+            "max_concurrency": int(llm_cfg.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+            "requests_per_minute": llm_cfg.get("requests_per_minute"),
+            "tokens_per_minute": llm_cfg.get("tokens_per_minute"),
+            "max_retries": int(llm_cfg.get("max_retries", DEFAULT_MAX_RETRIES)),
+        }
+        kwargs.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(client, **kwargs)
+
+    # -- budgets ---------------------------------------------------------
+    def _reserve(self, tokens: int):
+        while True:
+            with self._budget_lock:
+                now = self._clock()
+                wait = 0.0
+                if self._rpm:
+                    wait = max(wait, self._rpm.wait_time(1, now))
+                if self._tpm:
+                    wait = max(wait, self._tpm.wait_time(tokens, now))
+                if wait <= 0:
+                    if self._rpm:
+                        self._rpm.level -= 1
+                    if self._tpm:
+                        self._tpm.level -= tokens
+                    return
+            self._sleep(wait)
+
+    def _settle(self, reserved: int, resp):
+        """Correct the TPM bucket with the provider-reported usage, if any."""
+        if not self._tpm:
+            return
+        usage = getattr(resp, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if isinstance(actual, int):
+            with self._budget_lock:
+                self._tpm.level -= actual - reserved
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(self.max_delay, hinted)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    # -- calls -----------------------------------------------------------
+    def _count(self, name: str):
+        with self._budget_lock:
+            self.stats[name] += 1
+
+    def _call(self, create: Callable[..., Any], kwargs: dict):
+        reserved = _input_tokens(kwargs) + OUTPUT_TOKEN_ALLOWANCE
+        attempt = 0
+        while True:
+            self._reserve(reserved)
+            self._limit.acquire()
+            throttled = False
+            try:
+                self._count("requests")
+                resp = create(**kwargs)
+            except Exception as exc:  # noqa: BLE001 - classify, retry or re-raise
+                throttled = _is_retryable(exc)
+                if not throttled or attempt >= self.max_retries:
+                    raise
+                self._count("throttled")
+                delay = self._backoff(attempt, exc)
+                logger.warning(
+                    "LLM request throttled/failed (%s); retry %d/%d in %.1fs",
+                    _status_of(exc) or type(exc).__name__, attempt + 1, self.max_retries, delay,
+                )
+            else:
+                self._settle(reserved, resp)
+                return resp
+            finally:
+                self._limit.release(throttled)
+            self._count("retries")
+            attempt += 1
+            self._sleep(delay)
+
+    # -- jobs ------------------------------------------------------------
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="summarize")
+        return self._pool
+
+    def submit(self, fn: Callable[..., Any], post, *args, **kwargs) -> Future:
+        """Schedule ``fn(post, client, *args, **kwargs)`` with the throttled client."""
+        return self._executor().submit(fn, post, self.client, *args, **kwargs)
+
+    def gather(self, fn: Callable[[Any], Any], items: Iterable) -> List[Any]:
+        """Run ``fn(item)`` for every item on the pool, from inside a job; results keep order.
+
+        The calling worker runs any item that has not started yet itself
+        instead of blocking on it, so nested fan-out cannot starve the pool.
+        If one item fails, the items not started yet are dropped and the
+        error is raised.
+        """
+        items = list(items)
+        futures = [self._executor().submit(fn, item) for item in items]
+        results = []
+        try:
+            for item, fut in zip(items, futures):
+                results.append(fn(item) if fut.cancel() else fut.result())
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+        return results
+
+    def map(self, fn: Callable[..., Any], posts: Iterable, *args, **kwargs) -> List[Any]:
+        """Run ``fn(post, client, ...)`` for every post; results keep input order."""
+        futures = [self.submit(fn, post, *args, **kwargs) for post in posts]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self) -> "SummaryScheduler":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
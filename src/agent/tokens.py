@@ -0,0 +1,86 @@
+"""Token counting and token-budgeted text splitting.
+
+Uses ``tiktoken`` when it is installed (and its encoding can be loaded);
+otherwise falls back to a heuristic that counts ~4 characters per token for
+alphabetic scripts and one token per CJK/kana/hangul character, which is far
+closer than a flat character cut for short-token languages.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import List
+
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING = "o200k_base"  # gpt-4o family
+_WIDE_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:  # optional dependency, imported on first use
+        import tiktoken  # type: ignore
+    except ImportError:  # pragma: no cover - depends on environment
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:  # noqa: BLE001 - unknown model or encoding not downloadable
+        try:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception:  # noqa: BLE001
+            return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Number of tokens ``text`` costs for ``model`` (exact with tiktoken, else estimated)."""
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    wide = len(_WIDE_RE.findall(text))
+    return wide + (len(text) - wide) // CHARS_PER_TOKEN + 1
+
+
+def _hard_split(text: str, budget: int, model: str) -> List[str]:
+    enc = _encoding(model)
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        return [enc.decode(ids[i:i + budget]) for i in range(0, len(ids), budget)]
+    pieces, start, cost = [], 0, 0.0
+    for i, ch in enumerate(text):
+        cost += 1.0 if _WIDE_RE.match(ch) else 1.0 / CHARS_PER_TOKEN
+        if cost >= budget:
+            pieces.append(text[start:i + 1])
+            start, cost = i + 1, 0.0
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def split_by_tokens(text: str, budget: int, model: str = "gpt-4o-mini") -> List[str]:
+    """Split ``text`` into chunks of at most ~``budget`` tokens.
+
+    Chunks break on paragraph boundaries where possible; a paragraph that is
+    itself over budget is cut on token boundaries.
+    """
+    budget = max(1, int(budget))
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for para in (p for p in text.split("\n\n") if p.strip()):
+        cost = count_tokens(para, model)
+        if cost > budget:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            chunks.extend(_hard_split(para, budget, model))
+            continue
+        if used + cost > budget and current:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(para)
+        used += cost + 1
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
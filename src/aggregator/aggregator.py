@@ -1,47 +1,272 @@
-from typing import List
+import logging
+import time
+from typing import Collection, List, Optional
+from functools import partial
+from importlib import import_module
 from pathlib import Path
+from urllib.parse import urlparse
 import yaml
 
-from src.sources.base import Post
-from src.sources import blog as blog_src
-from src.sources import youtube as yt_src
-from src.sources import biorxiv as bio_src
+from src.sources.base import Post, normalize_post
+from src.aggregator.fetch import iter_fetch_jobs, DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST
+from src.util.archive import PostArchive
+from src.util.http import configure as configure_http, retry_budget
 from src.util.paths import resolve_storage_dir, ensure_dir
-from src.util.state import load_state, save_state, mark_seen, have_seen
+from src.util.state import load_state, save_state, mark_seen, have_seen, set_feed_validators, get_source_health
 
-def collect_posts(config_path: Path, *, mark_seen_immediately: bool = True) -> tuple[list[Post], dict, Path]:
-    cfg = yaml.safe_load(config_path.read_text(encoding="utf-8"))
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_BUDGET = 4          # HTTP retries one source may spend per poll
+DEFAULT_BREAKER_FAILURES = 3      # failed polls in a row before a source is skipped
+DEFAULT_BREAKER_COOLDOWN_HOURS = 6
+
+# Adapters are named, not imported: each one (and its feedparser / bs4 /
+# requests dependencies) is loaded only when its section has an enabled entry.
+ADAPTERS = (
+    ("blogs", "src.sources.blog"),
+    ("youtube", "src.sources.youtube"),
+    ("biorxiv", "src.sources.biorxiv"),
+)
+
+# metadata["body"]["loader"] -> adapter exposing load_body(handle, extractor) -> str
+BODY_LOADERS = {
+    "blog": "src.sources.blog",
+}
+
+def load_adapter(module_name: str):
+    return import_module(module_name)
+
+def _guarded(fn, meta: dict, key: str, retries: int):
+    """Wrap a fetch job: time it, give it a retry budget, and turn a failure
+    into an empty result with `meta["error"]` set instead of failing the run."""
+    def run():
+        t0 = time.perf_counter()
+        try:
+            with retry_budget(retries) as budget:
+                try:
+                    return fn()
+                finally:
+                    meta["retries"] = budget.used
+        except Exception as exc:  # noqa: BLE001 - one dead source must not sink the run
+            meta["error"] = f"{type(exc).__name__}: {exc}"
+            logger.debug("Polling %s failed", key, exc_info=True)  # reported by the caller
+            return []
+        finally:
+            meta["seconds"] = time.perf_counter() - t0
+    return run
+
+def collect_posts(
+    config_path: Path,
+    *,
+    mark_seen_immediately: bool = True,
+    stats: Optional[dict] = None,
+    cfg: Optional[dict] = None,
+    source_keys: Optional[Collection[str]] = None,
+    listener=None,
+) -> tuple[list[Post], dict, Path]:
+    """Fetch new posts from every configured source.
+
+    `cfg` reuses an already-loaded config instead of reading `config_path`;
+    `source_keys` restricts polling to those entries (the daemon's schedule).
+    `listener` (e.g. ``src.pipeline.SummaryStream``) follows the poll as it runs:
+    ``listener.sources_planned([(section, entry), ...])`` is called once before
+    fetching starts, then ``listener.source_done(key, posts)`` on this thread as
+    each source finishes, in completion order, with its normalized posts.
+
+    If `stats` is given it is filled with run information:
+      - feeds_polled / feeds_unchanged: sources polled, and feeds that answered 304
+      - pending_validators: {source_key: (validators, [post ids])} for feeds whose
+        ETag/Last-Modified may only be persisted once all those ids are marked seen
+        (see `commit_feed_validators`)
+      - sources: {source_key: {section, seconds, posts, unchanged, retries, ...}} per
+        entry, plus any counters the adapter reported (e.g. bioRxiv pages). Failed
+        polls carry `error`, `failures` and `open_until`; entries skipped by the
+        circuit breaker carry `skipped: True` instead of being polled.
+
+    A source that fails `sources.circuit_breaker.failures` polls in a row is
+    skipped until `cooldown_hours` have passed; health is kept in the state store.
+    """
+    if cfg is None:
+        cfg = yaml.safe_load(config_path.read_text(encoding="utf-8"))
     storage_dir = resolve_storage_dir(cfg.get("storage_dir", "./data"))
     ensure_dir(storage_dir)
 
-    state_path = storage_dir / "state.json"
+    state_path = storage_dir / "state.sqlite"
     state = load_state(state_path)
 
     ua = cfg.get("user_agent", "StayUpToDate/0.1")
+    # Every adapter fetches through one pooled session (see src.util.http)
+    configure_http(cfg.get("http"), user_agent=ua)
+    src_cfg = cfg.get("sources", {}) or {}
+    breaker_cfg = src_cfg.get("circuit_breaker", {}) or {}
+    failure_threshold = int(breaker_cfg.get("failures", DEFAULT_BREAKER_FAILURES))
+    cooldown = float(breaker_cfg.get("cooldown_hours", DEFAULT_BREAKER_COOLDOWN_HOURS)) * 3600
+    retries = int(src_cfg.get("retry_budget", DEFAULT_RETRY_BUDGET))
     results: List[Post] = []
+    sources = {}
+    now = time.time()
 
-    # blogs only (for MVP)
-    for b in cfg.get("sources", {}).get("blogs", []):
-        new_posts = blog_src.fetch_new(b, state, ua)
-        if mark_seen_immediately:
-            # immediately mark as seen so next run doesn't re-fetch
-            mark_seen(state, b["key"], [p["id"] for p in new_posts])
-        results.extend(new_posts)
+    # blogs, then youtube, then bioRxiv, each in config order. Fetches run
+    # concurrently and are handed to `listener` as they finish, but results are
+    # returned in this order, so marking and the caps applied later in main.py
+    # see exactly what a serial walk would.
+    entries = []
+    sections = []
+    metas = []
+    jobs = []
+    for section, module_name in ADAPTERS:
+        for entry in src_cfg.get(section, []) or []:
+            if source_keys is not None and entry.get("key") not in source_keys:
+                continue
+            if not entry.get("enabled", True):
+                continue
+            health = get_source_health(state, entry["key"])
+            if failure_threshold > 0 and (health.get("open_until") or 0) > now:
+                # Circuit open: a dead source is not retried until its cool-down ends
+                sources[entry["key"]] = dict(health, section=section, skipped=True, posts=0)
+                continue
+            adapter = load_adapter(module_name)
+            meta: dict = {}
+            entries.append(entry)
+            sections.append(section)
+            metas.append(meta)
+            meta["section"] = section
+            fetch = partial(adapter.fetch_new, entry, state, ua, meta=meta)
+            jobs.append((adapter.source_host(entry), _guarded(fetch, meta, entry["key"], retries)))
 
-    # youtube
-    for y in cfg.get("sources", {}).get("youtube", []):
-        new_posts = yt_src.fetch_new(y, state, ua)
-        if mark_seen_immediately:
-            mark_seen(state, y["key"], [p["id"] for p in new_posts])
-        results.extend(new_posts)
+    if listener is not None:
+        listener.sources_planned(list(zip(sections, entries)))
+    fetched: List[List[Post]] = [[] for _ in jobs]
+    for idx, new_posts in iter_fetch_jobs(
+        jobs,
+        max_workers=int(src_cfg.get("max_concurrency", DEFAULT_MAX_WORKERS)),
+        per_host=int(src_cfg.get("per_host_concurrency", DEFAULT_PER_HOST)),
+    ):
+        fetched[idx] = [normalize_post(p) for p in new_posts]
+        if listener is not None:
+            listener.source_done(entries[idx]["key"], fetched[idx])
 
-    # bioRxiv
-    for b in cfg.get("sources", {}).get("biorxiv", []):
-        new_posts = bio_src.fetch_new(b, state, ua)
+    unchanged = 0
+    pending = {}
+    validators_changed = False
+    for entry, meta, new_posts in zip(entries, metas, fetched):
+        health = state.record_source_result(
+            entry["key"], error=meta.get("error"), failure_threshold=failure_threshold, cooldown_seconds=cooldown,
+        )
+        sources[entry["key"]] = dict(
+            {k: v for k, v in meta.items() if k != "validators"},
+            posts=len(new_posts),
+            unchanged=bool(meta.get("unchanged")),
+        )
+        if meta.get("error"):
+            sources[entry["key"]].update(failures=health["failures"], open_until=health["open_until"])
         if mark_seen_immediately:
-            mark_seen(state, b["key"], [p["id"] for p in new_posts])
+            # immediately mark as seen so next run doesn't re-fetch
+            mark_seen(state, entry["key"], [p["id"] for p in new_posts])
+        if meta.get("unchanged"):
+            unchanged += 1
+        if meta.get("validators"):
+            if mark_seen_immediately or not new_posts:
+                set_feed_validators(state, entry["key"], meta["validators"])
+                validators_changed = True
+            else:
+                # A 304 next run would hide posts that caps leave unseen this run,
+                # so these validators wait until every post is marked seen.
+                pending[entry["key"]] = (meta["validators"], [p["id"] for p in new_posts])
         results.extend(new_posts)
 
-    if mark_seen_immediately:
+    if mark_seen_immediately or validators_changed:
         save_state(state_path, state)
+    state.close()
+    if stats is not None:
+        stats["feeds_polled"] = len(entries)
+        stats["feeds_unchanged"] = unchanged
+        stats["pending_validators"] = pending
+        stats["sources"] = sources
     return results, cfg, storage_dir
+
+
+def commit_feed_validators(state: dict, pending: dict):
+    """Persist pending feed validators whose posts have all been marked seen."""
+    for key, (validators, ids) in (pending or {}).items():
+        if all(have_seen(state, key, i) for i in ids):
+            set_feed_validators(state, key, validators)
+
+
+def resolve_bodies(posts: List[Post], cfg: dict, storage_dir: Path, stats: Optional[dict] = None, extractor=None, archive=None):
+    """Fill in `text` for posts that still carry a lazy body handle.
+
+    Call this only for posts that survived capping. Bodies already in the post
+    archive (`storage_dir / "posts"`, see ``src.util.archive``) are read from
+    it; the rest are downloaded concurrently under the same global/per-host
+    caps as feed fetching, and extracted on a process pool backed by the cache
+    in `storage_dir / "extract_cache"`. Every resolved or inline body is then
+    archived.
+    An open `extractor` and `archive` may be passed to share them across
+    calls; they are then neither closed nor evicted here.
+    If `stats` is given it receives `bodies` (downloaded), `archive_hits` and
+    the extractor's cache `extract_hits` / `extract_misses`.
+    """
+    src_cfg = cfg.get("sources", {}) or {}
+    owned_archive = archive is None
+    if owned_archive:
+        archive = PostArchive.from_config(storage_dir, cfg.get("archive"))
+    try:
+        todo = []
+        archived = 0
+        for p in posts:
+            if not (p.get("metadata") or {}).get("body"):
+                continue
+            text = archive.get(p.get("source_key") or "", p.get("id") or "") if archive is not None else None
+            if text is None:
+                todo.append(p)
+            else:
+                p["text"] = text
+                p["metadata"].pop("body", None)
+                archived += 1
+        if todo:
+            _download_bodies(todo, cfg, storage_dir, src_cfg, extractor, stats)
+        if archive is not None:
+            for p in posts:
+                if p.get("text") and p.get("id"):
+                    archive.put(p.get("source_key") or "", p["id"], p["text"])
+    finally:
+        if owned_archive and archive is not None:
+            archive.close()
+    if stats is not None:
+        stats["bodies"] = len(todo)
+        stats["archive_hits"] = archived
+
+
+def _download_bodies(todo: List[Post], cfg: dict, storage_dir: Path, src_cfg: dict, extractor, stats: Optional[dict]):
+    from src.sources.extract import Extractor
+
+    configure_http(cfg.get("http"), user_agent=cfg.get("user_agent", "StayUpToDate/0.1"))
+    owned = extractor is None
+    if owned:
+        # The pool is made here, before iter_fetch_jobs starts its threads
+        extractor = Extractor.from_config(storage_dir, cfg.get("extract")).start()
+    try:
+        jobs = []
+        for p in todo:
+            handle = p["metadata"]["body"]
+            loader = load_adapter(BODY_LOADERS[handle["loader"]])
+            jobs.append((
+                urlparse(handle.get("url", "")).netloc.lower(),
+                partial(loader.load_body, handle, extractor=extractor),
+            ))
+        for idx, text in iter_fetch_jobs(
+            jobs,
+            max_workers=int(src_cfg.get("max_concurrency", DEFAULT_MAX_WORKERS)),
+            per_host=int(src_cfg.get("per_host_concurrency", DEFAULT_PER_HOST)),
+        ):
+            todo[idx]["text"] = text
+            todo[idx]["metadata"].pop("body", None)
+        if owned:
+            extractor.cache.evict()
+    finally:
+        if owned:
+            extractor.close()
+    if stats is not None:
+        stats["extract_hits"] = extractor.hits
+        stats["extract_misses"] = extractor.misses
@@ -0,0 +1,361 @@
+"""Cross-source near-duplicate detection, run on collected posts before capping.
+
+The same story often arrives as a Substack post, a crosspost on another blog
+and a YouTube description. Two posts from different sources are copies when
+
+- their canonical URLs match (scheme, ``www.``, tracking parameters,
+  fragments and trailing slashes ignored; ``youtu.be`` links mapped to
+  ``youtube.com/watch``), or
+- their MinHash signatures (word 3-gram shingles of the title plus the text
+  known at ingest: body, feed teaser, video description or abstract) agree
+  on at least ``threshold`` of their hashes. Candidates come from LSH
+  banding, so each post is compared against a handful of others, not all.
+
+The first copy seen is the representative; later copies are attached to it
+as ``metadata["also_at"]`` links and are not summarized. If the per-source
+caps then leave the representative out, ``promote`` hands the cluster to a
+copy that fits under its own source's cap (see ``src.summarize``), so the
+story is not lost with it. Signatures of the
+posts that made a digest are kept in ``dedup.sqlite`` for ``keep_days``, so a
+copy arriving in a later run is recognized too and dropped as already
+covered. numpy is imported only once there is a post to sign.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.sources.base import Post
+from src.util.paths import ensure_dir
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16        # 16 bands x 8 rows: pairs above ~0.7 similarity become candidates
+DEFAULT_KEEP_DAYS = 30
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 8          # shorter texts are matched by URL only
+MAX_TEXT_CHARS = 20_000
+_PRIME = 4294967311       # smallest prime above 2**32: (a*x + b) fits in uint64 for 32-bit a, b, x
+_SEED = 1
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "ref_url", "source",
+})
+
+
+def canonical_url(url: str) -> str:
+    """Normalize `url` so copies of one page compare equal ("" for no URL)."""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if host == "youtu.be" and path:
+        host, query = "youtube.com", [("v", path.lstrip("/"))] + query
+        path = "/watch"
+    query = sorted((k, v) for k, v in query if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS)
+    return urlunsplit(("https", host, path or "/", urlencode(query), ""))
+
+
+def shingles(text: str) -> set:
+    """Hashed word 3-grams of `text` (32-bit CRCs)."""
+    words = TOKEN_RE.findall((text or "").lower()[:MAX_TEXT_CHARS])
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _link(post: Post) -> dict:
+    """The ``also_at`` entry for a copy."""
+    key = post.get("source_key") or ""
+    return {
+        "id": post.get("id"),
+        "source_key": key,
+        "display_name": (post.get("metadata") or {}).get("display_name") or key,
+        "title": post.get("title") or "",
+        "url": post.get("url") or "",
+    }
+
+
+def _ref(post: Post) -> str:
+    return f"{post.get('source_key') or ''}:{post.get('id')}"
+
+
+class MinHasher:
+    """`num_perm` universal hash functions ``(a*x + b) mod p``, fixed by a seed so signatures persist."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM):
+        import numpy as np
+
+        rng = np.random.default_rng(_SEED)
+        self.num_perm = int(num_perm)
+        self._np = np
+        self._a = rng.integers(1, 2**32, size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=(self.num_perm, 1), dtype=np.uint64)
+
+    def signature(self, hashes: set) -> bytes:
+        np = self._np
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+        return ((self._a * x + self._b) % _PRIME).min(axis=1).tobytes()
+
+    def similarity(self, sig_a: bytes, sig_b: bytes) -> float:
+        """Estimated Jaccard similarity: the share of equal signature slots."""
+        np = self._np
+        return float((np.frombuffer(sig_a, dtype=np.uint64) == np.frombuffer(sig_b, dtype=np.uint64)).mean())
+
+
+class _Entry:
+    __slots__ = ("source_key", "title", "url", "sig", "post")
+
+    def __init__(self, source_key: str, title: str, url: str, sig: Optional[bytes], post: Optional[Post] = None):
+        self.source_key = source_key
+        self.title = title
+        self.url = url
+        self.sig = sig
+        self.post = post   # None for entries loaded from earlier runs
+
+
+class _Index:
+    """Canonical URL map plus LSH buckets (band bytes -> entries)."""
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.by_url: Dict[str, _Entry] = {}
+        self.buckets: Dict[Tuple[int, bytes], List[_Entry]] = {}
+
+    def _band_keys(self, sig: bytes):
+        width = self.rows * 8  # uint64 slots
+        for band in range(self.bands):
+            yield band, sig[band * width:(band + 1) * width]
+
+    def add(self, canon: str, entry: _Entry):
+        if canon:
+            self.by_url.setdefault(canon, entry)
+        if entry.sig is not None:
+            for key in self._band_keys(entry.sig):
+                self.buckets.setdefault(key, []).append(entry)
+
+    def match(self, canon: str, sig: Optional[bytes], source_key: str, hasher: Optional[MinHasher], threshold: float) -> Optional[_Entry]:
+        hit = self.by_url.get(canon) if canon else None
+        if hit is not None and hit.source_key != source_key:
+            return hit
+        if sig is None:
+            return None
+        checked = set()
+        for key in self._band_keys(sig):
+            for entry in self.buckets.get(key, ()):
+                if id(entry) in checked or entry.source_key == source_key:
+                    continue
+                checked.add(id(entry))
+                if hasher.similarity(sig, entry.sig) >= threshold:
+                    return entry
+        return None
+
+
+class Deduplicator:
+    """Cluster a run's posts and drop copies; see the module docstring.
+
+    Not thread-safe: call ``filter`` from the thread consuming the poll.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        keep_days: float = DEFAULT_KEEP_DAYS,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"dedup: num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.bands = int(bands)
+        self.keep_days = float(keep_days)
+        self.duplicates = 0                 # copies attached to a representative this run
+        self.covered: List[Post] = []       # copies of posts summarized in earlier runs
+        self._hasher: Optional[MinHasher] = None
+        self._run = _Index(self.bands, self.num_perm // self.bands)
+        self._history: Optional[_Index] = None
+        self._decided: Dict[int, bool] = {}  # id(post) -> kept
+        self._signed: Dict[int, Tuple[str, Optional[bytes]]] = {}  # id(post) -> (canonical URL, ingest signature)
+        self._entries: Dict[int, _Entry] = {}     # id(representative) -> its run index entry
+        self._copies: Dict[int, List[Post]] = {}  # id(representative) -> copies, in arrival order
+        self._rep_of: Dict[int, Post] = {}        # id(copy) -> representative
+        self._db: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_config(cls, storage_dir: Path, dedup_cfg: Optional[dict]) -> Optional["Deduplicator"]:
+        """Build from the ``dedup:`` config section (None if disabled)."""
+        dedup_cfg = dedup_cfg or {}
+        if not dedup_cfg.get("enabled", True):
+            return None
+        return cls(
+            storage_dir / dedup_cfg.get("filename", "dedup.sqlite"),
+            threshold=dedup_cfg.get("threshold", DEFAULT_THRESHOLD),
+            num_perm=int(dedup_cfg.get("num_perm", DEFAULT_NUM_PERM)),
+            bands=int(dedup_cfg.get("bands", DEFAULT_BANDS)),
+            keep_days=dedup_cfg.get("keep_days", DEFAULT_KEEP_DAYS),
+        )
+
+    # -- storage ---------------------------------------------------------
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            ensure_dir(self.path.parent)
+            self._db = sqlite3.connect(str(self.path))
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                " post_key TEXT PRIMARY KEY,"
+                " source_key TEXT NOT NULL,"
+                " title TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " canonical_url TEXT NOT NULL,"
+                " num_perm INTEGER NOT NULL,"
+                " sig BLOB,"
+                " created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS signatures_created ON signatures(created)")
+            self._db.commit()
+        return self._db
+
+    def _load_history(self) -> _Index:
+        if self._history is None:
+            self._history = _Index(self.bands, self.num_perm // self.bands)
+            if self.keep_days > 0:
+                cutoff = time.time() - self.keep_days * 86400
+                rows = self._conn().execute(
+                    "SELECT source_key, title, url, canonical_url, sig FROM signatures"
+                    " WHERE created >= ? AND num_perm = ?",
+                    (cutoff, self.num_perm),
+                )
+                for source_key, title, url, canon, sig in rows:
+                    self._history.add(canon, _Entry(source_key, title, url, sig))
+        return self._history
+
+    # -- clustering ------------------------------------------------------
+    def _signature(self, post: Post) -> Optional[bytes]:
+        md = post.get("metadata") or {}
+        hashes = shingles(f"{post.get('title') or ''} {post.get('text') or md.get('teaser') or ''}")
+        if len(hashes) < MIN_SHINGLES:
+            return None
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm)
+        return self._hasher.signature(hashes)
+
+    def _classify(self, post: Post) -> bool:
+        key = post.get("source_key") or ""
+        canon = canonical_url(post.get("url") or "")
+        sig = self._signature(post)
+        self._signed[id(post)] = (canon, sig)
+        rep = self._run.match(canon, sig, key, self._hasher, self.threshold)
+        if rep is not None:
+            rep.post.setdefault("metadata", {}).setdefault("also_at", []).append(_link(post))
+            post.setdefault("metadata", {})["duplicate_of"] = _ref(rep.post)
+            self._copies.setdefault(id(rep.post), []).append(post)
+            self._rep_of[id(post)] = rep.post
+            self.duplicates += 1
+            return False
+        earlier = self._load_history().match(canon, sig, key, self._hasher, self.threshold)
+        if earlier is not None:
+            post.setdefault("metadata", {})["covered_by"] = {"title": earlier.title, "url": earlier.url}
+            self.covered.append(post)
+            return False
+        entry = _Entry(key, post.get("title") or "", post.get("url") or "", sig, post)
+        self._entries[id(post)] = entry
+        self._run.add(canon, entry)
+        return True
+
+    def filter(self, posts: Iterable[Post]) -> List[Post]:
+        """The posts that are not copies, in order. Idempotent: a post is classified once."""
+        kept = []
+        for p in posts:
+            decided = self._decided.get(id(p))
+            if decided is None:
+                decided = self._decided[id(p)] = self._classify(p)
+            if decided:
+                kept.append(p)
+        return kept
+
+    def copies(self, post: Post) -> List[Post]:
+        """This run's copies of representative `post`, in arrival order."""
+        return list(self._copies.get(id(post), ()))
+
+    def representative(self, post: Post) -> Optional[Post]:
+        """The post copy `post` is attached to (None if `post` is not a copy)."""
+        return self._rep_of.get(id(post))
+
+    def promote(self, copy: Post):
+        """Make `copy` its cluster's representative, for when caps leave the current one out.
+
+        The former representative and the other copies become `copy`'s
+        ``also_at`` links, so they are still marked seen with it.
+        """
+        rep = self._rep_of.pop(id(copy))
+        others = [c for c in self._copies.pop(id(rep)) if c is not copy]
+        rep_md = rep.setdefault("metadata", {})
+        rep_md.pop("also_at", None)
+        copy_md = copy.setdefault("metadata", {})
+        copy_md.pop("duplicate_of", None)
+        copy_md["also_at"] = [_link(p) for p in [rep, *others]]
+        for p in [rep, *others]:
+            p.setdefault("metadata", {})["duplicate_of"] = _ref(copy)
+            self._rep_of[id(p)] = copy
+        self._copies[id(copy)] = [rep, *others]
+        self._decided[id(rep)] = False
+        self._decided[id(copy)] = True
+        # Later posts of this run that match the cluster attach to the new representative
+        entry = self._entries.pop(id(rep))
+        entry.post = copy
+        entry.source_key = copy.get("source_key") or ""
+        self._entries[id(copy)] = entry
+
+    def remember(self, items: Iterable[dict]):
+        """Persist the signatures of summarized posts for later runs, then drop expired ones."""
+        if self.keep_days <= 0:
+            return
+        now = time.time()
+        rows = []
+        for it in items:
+            post = it.get("post") or {}
+            # Signed as collected: later copies are compared by their ingest text too
+            signed = self._signed.get(id(post))
+            if signed is None:
+                continue
+            canon, sig = signed
+            rows.append((
+                f"{post.get('source_key') or ''}:{post.get('id') or post.get('url')}",
+                post.get("source_key") or "",
+                post.get("title") or "",
+                post.get("url") or "",
+                canon,
+                self.num_perm,
+                sig,
+                now,
+            ))
+        db = self._conn()
+        db.executemany(
+            "INSERT OR REPLACE INTO signatures (post_key, source_key, title, url, canonical_url, num_perm, sig, created)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        db.execute("DELETE FROM signatures WHERE created < ?", (now - self.keep_days * 86400,))
+        db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,70 @@
+"""Concurrent execution of source adapter fetches.
+
+Each job is a ``(host, fn)`` pair where ``fn`` takes no arguments and returns
+the adapter's list of posts. Jobs run on a shared thread pool bounded by a
+global worker cap, and a job is only started while its host has a free slot,
+so a few hundred YouTube channels (all on www.youtube.com) cannot starve the
+pool or hammer a single server.
+"""
+from __future__ import annotations
+
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterator, List, Sequence, Tuple
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST = 2
+
+FetchJob = Tuple[str, Callable[[], Any]]
+
+
+def iter_fetch_jobs(
+    jobs: Sequence[FetchJob],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    per_host: int = DEFAULT_PER_HOST,
+) -> Iterator[Tuple[int, Any]]:
+    """Run ``jobs`` concurrently and yield ``(index, result)`` as each finishes.
+
+    Jobs are started in submission order, skipping (but not reordering) jobs
+    whose host is already at ``per_host`` in-flight requests. A job that raises
+    re-raises here; jobs already running are allowed to finish first.
+    ``per_host <= 0`` disables the per-host cap.
+    """
+    max_workers = max(1, int(max_workers or 1))
+    pending = deque(range(len(jobs)))
+    active_by_host: Counter = Counter()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as pool:
+        while pending or running:
+            blocked = deque()
+            while pending and len(running) < max_workers:
+                idx = pending.popleft()
+                host = jobs[idx][0]
+                if per_host > 0 and active_by_host[host] >= per_host:
+                    blocked.append(idx)
+                    continue
+                active_by_host[host] += 1
+                running[pool.submit(jobs[idx][1])] = idx
+            blocked.extend(pending)
+            pending = blocked
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = running.pop(fut)
+                active_by_host[jobs[idx][0]] -= 1
+                yield idx, fut.result()
+
+
+def run_fetch_jobs(
+    jobs: Sequence[FetchJob],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    per_host: int = DEFAULT_PER_HOST,
+) -> List[Any]:
+    """Run ``jobs`` concurrently and return their results in submission order."""
+    results: List[Any] = [None] * len(jobs)
+    for idx, res in iter_fetch_jobs(jobs, max_workers=max_workers, per_host=per_host):
+        results[idx] = res
+    return results
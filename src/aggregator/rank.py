@@ -0,0 +1,72 @@
+"""Local relevance ranking of collected posts against the `interests` config.
+
+Scores are Okapi BM25 with the interests text as the query, computed fully
+locally with NumPy: one (posts × query terms) term-frequency matrix, then a
+vectorized BM25 over it. Used by main.py to pick which posts are worth an LLM
+call when there are more candidates than the global limit.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+from collections import Counter
+from typing import List, Sequence
+
+import numpy as np
+
+from src.sources.base import Post, published_ts
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Only what the interests text is likely to contain; BM25's IDF handles the rest.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with "
+    "about this that these those i me my we our you your etc e g".split()
+)
+TITLE_WEIGHT = 2          # title tokens count this many times
+MAX_BODY_CHARS = 20_000   # keep long articles from dominating length normalization
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _post_tokens(post: Post) -> List[str]:
+    md = post.get("metadata") or {}
+    body = post.get("text") or md.get("teaser") or ""
+    return tokenize(post.get("title") or "") * TITLE_WEIGHT + tokenize(body[:MAX_BODY_CHARS])
+
+
+def bm25_scores(docs: Sequence[List[str]], query: Sequence[str], *, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 score of each tokenized doc for the (deduplicated) query terms."""
+    terms = list(dict.fromkeys(query))
+    if not docs or not terms:
+        return np.zeros(len(docs))
+    col = {t: j for j, t in enumerate(terms)}
+    tf = np.zeros((len(docs), len(terms)))
+    for i, doc in enumerate(docs):
+        for term, n in Counter(t for t in doc if t in col).items():
+            tf[i, col[term]] = n
+    dl = np.array([len(d) for d in docs], dtype=float)
+    avgdl = dl.mean() or 1.0
+    df = (tf > 0).sum(axis=0)
+    idf = np.log((len(docs) - df + 0.5) / (df + 0.5) + 1.0)
+    norm = k1 * (1.0 - b + b * dl / avgdl)
+    return ((tf * (k1 + 1.0)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def rank_posts(posts: List[Post], interests: str, top_n: int) -> List[Post]:
+    """Keep the `top_n` posts most relevant to `interests` (newest first on ties).
+
+    Each post's score is stored in `metadata["relevance"]` for the templates.
+    The returned list is ordered newest first, like the unranked digest.
+    """
+    scores = bm25_scores([_post_tokens(p) for p in posts], tokenize(interests))
+    for post, score in zip(posts, scores):
+        post.setdefault("metadata", {})["relevance"] = round(float(score), 3)
+    best = heapq.nlargest(
+        max(0, top_n),
+        range(len(posts)),
+        key=lambda i: (scores[i], published_ts(posts[i])),
+    )
+    kept = [posts[i] for i in best]
+    return sorted(kept, key=published_ts, reverse=True)
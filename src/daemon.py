@@ -0,0 +1,342 @@
+"""Long-running mode: ``python -m src.main --daemon``.
+
+One warm process instead of a cold start per run (openai, trafilatura, bs4 and
+feedparser are imported once):
+
+- every enabled source in ``config.yml`` is polled on its own interval
+  (``poll_minutes`` on the entry, else ``daemon.poll_minutes`` for its section);
+- new posts from a poll are capped, summarized right away (while the rest of
+  the poll is still fetching, see ``src.pipeline``) and appended to today's
+  digest store (see ``src.report.store``);
+- the digest is rendered and delivered at the ``daemon.digest_times`` of day;
+  when the day rolls over, the previous day's files get a final render;
+- each poll that found posts, and each emission, writes its own metrics file
+  (see ``src.util.metrics``);
+- ``config.yml`` is re-read when its mtime changes: added sources are polled
+  immediately, removed ones dropped, new intervals, caps, LLM and output
+  settings apply from the next poll (the summary cache is reopened when
+  ``cache:`` changes, and the OpenAI client rebuilt when ``llm:`` does). A
+  config that fails to parse or to apply (a bad interval, a broken prompt
+  template, a missing API key) is logged and the previous one kept whole.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+from src.aggregator.aggregator import ADAPTERS, collect_posts
+from src.aggregator.dedup import Deduplicator
+from src.agent.cache import SummaryCache
+from src.agent.client import LazyClient
+from src.agent.prompts import PromptRegistry
+from src.agent.router import MODEL
+from src.pipeline import SummaryStream
+from src.report.output import output_options, render_and_deliver, write_metrics
+from src.report.render import render_digest
+from src.report.store import DigestStore
+from src.summarize import mark_summarized, report_duplicates, report_source_health, select_posts, summarize_posts
+from src.util.metrics import RunMetrics
+from src.util.paths import ensure_dir, resolve_storage_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_MINUTES = {"blogs": 60, "youtube": 60, "biorxiv": 360}
+DEFAULT_DIGEST_TIMES = ("07:00",)
+DEFAULT_TICK_SECONDS = 30
+
+
+def source_intervals(cfg: dict) -> Dict[str, float]:
+    """Poll interval in seconds for every enabled source key."""
+    daemon_cfg = cfg.get("daemon", {}) or {}
+    section_minutes = dict(DEFAULT_POLL_MINUTES)
+    section_minutes.update(daemon_cfg.get("poll_minutes", {}) or {})
+    src_cfg = cfg.get("sources", {}) or {}
+    intervals = {}
+    for section, _ in ADAPTERS:
+        for entry in src_cfg.get(section, []) or []:
+            if not entry.get("enabled", True) or not entry.get("key"):
+                continue
+            minutes = entry.get("poll_minutes", section_minutes.get(section, 60))
+            intervals[entry["key"]] = max(1.0, float(minutes)) * 60
+    return intervals
+
+
+def digest_times(cfg: dict) -> List[dt.time]:
+    """Times of day at which the digest is emitted, sorted."""
+    raw = (cfg.get("daemon", {}) or {}).get("digest_times") or DEFAULT_DIGEST_TIMES
+    times = []
+    for value in raw:
+        try:
+            hh, mm = str(value).split(":")
+            times.append(dt.time(int(hh), int(mm)))
+        except ValueError:
+            logger.warning("Ignoring invalid daemon.digest_times entry %r (expected HH:MM)", value)
+    return sorted(times)
+
+
+def last_slot(now: dt.datetime, times: List[dt.time]) -> Optional[dt.datetime]:
+    """The most recent scheduled digest time at or before `now` (looking back one day)."""
+    candidates = [
+        dt.datetime.combine(day, t)
+        for day in (now.date() - dt.timedelta(days=1), now.date())
+        for t in times
+    ]
+    past = [c for c in candidates if c <= now]
+    return max(past) if past else None
+
+
+class Daemon:
+    """Poll/summarize/emit loop; `run()` blocks until SIGINT/SIGTERM."""
+
+    def __init__(self, args, *, clock=time.time, now=dt.datetime.now):
+        self.args = args
+        self.config_path = Path(args.config)
+        self._clock = clock
+        self._now = now
+        self._stop = threading.Event()
+        self._mtime: Optional[float] = None
+        self.cfg: dict = {}
+        self.intervals: Dict[str, float] = {}
+        self.next_due: Dict[str, float] = {}
+        self.times: List[dt.time] = []
+        self.prompts: Optional[PromptRegistry] = None
+        self._prompt_key = None
+        self.client = None
+        self._client_key = None
+        self.cache: Optional[SummaryCache] = None
+        self._cache_key = None
+        self.storage_dir: Optional[Path] = None
+        self.last_emitted: Optional[dt.datetime] = None
+        self.day = now().date().isoformat()
+
+    # -- config ----------------------------------------------------------
+    def reload_config(self) -> bool:
+        """Re-read config.yml if it changed; returns True when a new config was applied."""
+        try:
+            mtime = self.config_path.stat().st_mtime
+        except OSError as exc:
+            if not self.cfg:
+                raise
+            logger.warning("Cannot stat %s (%s); keeping current config", self.config_path, exc)
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            cfg = yaml.safe_load(self.config_path.read_text(encoding="utf-8"))
+            if not isinstance(cfg, dict):
+                raise ValueError("top level is not a mapping")
+        except (OSError, yaml.YAMLError, ValueError) as exc:
+            if not self.cfg:
+                raise
+            logger.warning("Ignoring unreadable %s (%s); keeping previous config", self.config_path, exc)
+            return False
+        try:
+            self._apply(cfg)
+        except Exception as exc:  # noqa: BLE001 - a bad edit must not stop the daemon
+            if not self.cfg:
+                raise
+            logger.warning("Cannot apply %s (%s); keeping previous config", self.config_path, exc)
+            return False
+        return True
+
+    def _apply(self, cfg: dict):
+        # Everything that can fail on a bad value is built first; the daemon
+        # switches to the new config only once all of it has succeeded.
+        first = not self.cfg
+        storage_dir = resolve_storage_dir(cfg.get("storage_dir", "./data"))
+        ensure_dir(storage_dir)
+        intervals = source_intervals(cfg)
+        times = digest_times(cfg)
+
+        llm_cfg = cfg.get("llm", {}) or {}
+        prompts = self.prompts
+        prompt_key = (cfg.get("interests", ""), repr(llm_cfg.get("prompt_cache")))
+        if prompt_key != self._prompt_key:
+            prompts = PromptRegistry.from_config(Path(self.args.prompts), cfg.get("interests", ""), llm_cfg.get("prompt_cache"), model=MODEL)
+        client = self.client
+        client_key = repr(llm_cfg)
+        if client_key != self._client_key:
+            # Also re-reads OPENAI_API_KEY
+            client = LazyClient(Path(__file__).resolve().parents[1])
+        cache = self.cache
+        cache_key = (str(storage_dir), repr(cfg.get("cache")))
+        if cache_key != self._cache_key:
+            # Opened last, so a failure above leaves nothing to close
+            cache = SummaryCache.from_config(storage_dir, cfg.get("cache")) if self.args.use_cache else None
+            if self.cache is not None:
+                self.cache.close()
+
+        self.cfg = cfg
+        self.storage_dir = storage_dir
+        self.prompts, self._prompt_key = prompts, prompt_key
+        self.client, self._client_key = client, client_key
+        self.cache, self._cache_key = cache, cache_key
+
+        now = self._clock()
+        self.intervals = intervals
+        added = [k for k in intervals if k not in self.next_due]
+        for key in added:
+            self.next_due[key] = now  # new sources are polled right away
+        for key in [k for k in self.next_due if k not in intervals]:
+            del self.next_due[key]
+        for key, interval in intervals.items():
+            # A shorter interval takes effect without waiting out the old one
+            self.next_due[key] = min(self.next_due[key], now + interval)
+
+        self.times = times
+        if first:
+            # Don't emit for slots that passed before startup
+            self.last_emitted = last_slot(self._now(), times)
+        print(
+            f"[update_agent] {'Loaded' if first else 'Reloaded'} {self.config_path}: "
+            f"{len(intervals)} source(s), digests at {', '.join(t.strftime('%H:%M') for t in times) or 'never'}"
+        )
+
+    def _output(self):
+        cfg_output, formats = output_options(self.cfg, self.args)
+        cfg_output["incremental"] = True  # the store is what the daemon renders from
+        return cfg_output, formats
+
+    # -- work ------------------------------------------------------------
+    def poll(self, keys: List[str]):
+        """Poll `keys`, summarize their new posts and add them to today's store."""
+        metrics = RunMetrics()
+        collect_stats: dict = {}
+        dedup = Deduplicator.from_config(self.storage_dir, self.cfg.get("dedup"))
+        stream = SummaryStream.from_config(
+            self.cfg, self.storage_dir, self.args, lambda: self.client, self.prompts, self.cache, metrics=metrics, dedup=dedup,
+        )
+        try:
+            with metrics.stage("collect"):
+                posts, cfg, storage_dir = collect_posts(
+                    self.config_path,
+                    mark_seen_immediately=False,
+                    stats=collect_stats,
+                    cfg=self.cfg,
+                    source_keys=set(keys),
+                    listener=stream,
+                )
+            metrics.add_sources(collect_stats.get("sources"))
+            report_source_health(collect_stats.get("sources"))
+            if dedup is not None:
+                posts = dedup.filter(posts)
+                report_duplicates(dedup, metrics)
+            posts = select_posts(posts, cfg, self.args, dedup)
+            if not posts:
+                if dedup is not None and dedup.covered:
+                    mark_summarized([], storage_dir, collect_stats.get("pending_validators"), dedup.covered)
+                return
+            if stream is not None:
+                items = stream.finish(posts)
+            else:
+                items = summarize_posts(posts, cfg, storage_dir, self.args, self.client, self.prompts, self.cache, metrics)
+            mark_summarized(items, storage_dir, collect_stats.get("pending_validators"), dedup.covered if dedup is not None else ())
+            if dedup is not None:
+                dedup.remember(items)
+        finally:
+            if stream is not None:
+                stream.close()
+            if dedup is not None:
+                dedup.close()
+        store = DigestStore.from_config(storage_dir, self._output()[0])
+        try:
+            added = store.add(self.day, items)
+            store.evict(self.day)
+        finally:
+            store.close()
+        print(f"[update_agent] Polled {', '.join(keys)}: {added} new item(s) for {self.day}")
+        write_metrics(metrics, cfg, storage_dir, self._output()[0])
+
+    def emit(self):
+        """Render today's digest from the store and run deliveries."""
+        store = DigestStore.from_config(self.storage_dir, self._output()[0])
+        try:
+            has_items = bool(store.items(self.day))
+        finally:
+            store.close()
+        if not has_items:
+            print(f"[update_agent] No items for {self.day} yet; skipping digest.")
+            return
+        cfg_output, formats = self._output()
+        metrics = RunMetrics()
+        render_and_deliver([], self.storage_dir, cfg_output, formats, open_html=False, metrics=metrics)
+        write_metrics(metrics, self.cfg, self.storage_dir, cfg_output)
+        if self.cache is not None:
+            self.cache.evict()
+
+    def _rollover(self):
+        """Final render of the previous day's files once the date changes."""
+        today = self._now().date().isoformat()
+        if today == self.day:
+            return
+        previous, self.day = self.day, today
+        cfg_output, formats = self._output()
+        out_dir = Path(cfg_output["save_dir"]).expanduser() if cfg_output.get("save_dir") else None
+        store = DigestStore.from_config(self.storage_dir, cfg_output)
+        try:
+            if store.items(previous):
+                render_digest([], self.storage_dir, formats=tuple(formats), out_dir=out_dir, store=store, day=previous)
+        finally:
+            store.close()
+
+    def tick(self):
+        """One scheduler step: reload config, poll due sources, emit if a slot passed."""
+        self.reload_config()
+        self._rollover()
+        now = self._clock()
+        due = [k for k, t in self.next_due.items() if t <= now]
+        if due:
+            try:
+                self.poll(due)
+            except Exception:  # noqa: BLE001 - one bad poll must not stop the daemon
+                logger.exception("Poll of %s failed; will retry next interval", ", ".join(due))
+            for key in due:
+                if key in self.intervals:
+                    self.next_due[key] = now + self.intervals[key]
+        slot = last_slot(self._now(), self.times)
+        if slot is not None and (self.last_emitted is None or slot > self.last_emitted):
+            self.last_emitted = slot
+            try:
+                self.emit()
+            except Exception:  # noqa: BLE001
+                logger.exception("Digest emission failed")
+
+    def seconds_until_next(self) -> float:
+        tick = float((self.cfg.get("daemon", {}) or {}).get("tick_seconds", DEFAULT_TICK_SECONDS))
+        wait = tick
+        if self.next_due:
+            wait = min(wait, min(self.next_due.values()) - self._clock())
+        return max(1.0, wait)
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self) -> int:
+        self.reload_config()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+        print("[update_agent] Daemon started; stop with Ctrl-C or SIGTERM.")
+        try:
+            while not self._stop.is_set():
+                self.tick()
+                self._stop.wait(self.seconds_until_next())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.cache is not None:
+                self.cache.close()
+        print("[update_agent] Daemon stopped.")
+        return 0
+
+
+def run_daemon(args) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return Daemon(args).run()
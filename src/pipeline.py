@@ -0,0 +1,301 @@
+"""Streaming collect → summarize: summarize posts while sources are still being fetched.
+
+``SummaryStream`` listens to ``collect_posts(listener=...)``. As each source
+finishes, its posts are capped per source and every post that is already
+certain to be in the final digest is released to body resolution and the
+LLM scheduler, so fetching, extraction and summarization overlap instead of
+running one after another.
+
+A post is certain once fewer than ``--limit`` posts could still rank ahead
+of it: the capped posts seen so far that are at least as new, plus the most
+each unfinished source can still add (its per-source cap, or the adapter's
+``max_posts(entry)``). Sources with no such bound, and relevance ranking
+(BM25 needs every post before it can score one), hold posts back until
+collection ends. The final selection is still ``select_posts`` over every
+post in config order, so the digest is exactly what a non-streaming run
+produces; the stream only starts the work earlier. The one exception is
+near-duplicate removal (``src.aggregator.dedup``), which runs as sources
+finish: the copy kept is the first to arrive rather than the first in config
+order (or, when the caps leave that one out, the first later copy that fits
+its own source's cap).
+
+At most ``pipeline.max_pending_posts`` released posts are in flight; when they
+are, the poll loop blocks and no new fetches start until summaries complete.
+
+Because extraction and summarization overlap collection, their stage times
+are wall-clock spans: ``extract`` from the first group released to the last
+body resolved, ``summarize`` from the first request queued to the last one
+completed. The time the worker threads spent resolving bodies, summed, is
+the ``extract_busy_seconds`` counter.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.aggregator.aggregator import ADAPTERS, BODY_LOADERS, load_adapter, resolve_bodies
+from src.aggregator.dedup import Deduplicator
+from src.aggregator.fetch import DEFAULT_MAX_WORKERS
+from src.agent.router import summarize_batch
+from src.agent.scheduler import SummaryScheduler
+from src.sources.base import Post, published_ts
+from src.summarize import cap_per_source, cap_room, plan_units, ranking_enabled, report_usage, source_caps, summary_limits
+from src.util.archive import PostArchive
+from src.util.metrics import RunMetrics
+
+DEFAULT_MAX_PENDING = 32
+
+
+class SummaryStream:
+    """Summarize capped posts as their sources finish; see the module docstring.
+
+    Use as the `listener` of ``collect_posts``, then call ``finish`` with the
+    selected posts to get their digest items in order.
+    """
+
+    def __init__(
+        self,
+        cfg: dict,
+        storage_dir: Path,
+        args,
+        client_factory: Callable[[], object],
+        prompts,
+        cache,
+        *,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        metrics: Optional[RunMetrics] = None,
+        dedup: Optional[Deduplicator] = None,
+    ):
+        self.cfg = cfg
+        self.dedup = dedup
+        self.storage_dir = storage_dir
+        self.prompts = prompts
+        self.cache = cache
+        self.metrics = metrics or RunMetrics()
+        self.yt_cap, self.blog_cap = source_caps(cfg, args)
+        self.limit = max(0, args.limit)
+        # Relevance ranking needs the whole corpus before it can pick a post
+        self.early = not ranking_enabled(cfg, args)
+        self._llm_cfg = cfg.get("llm", {}) or {}
+        self._batching = bool((self._llm_cfg.get("batch", {}) or {}).get("enabled", False))
+        self._batch_size = max(1, int((self._llm_cfg.get("batch", {}) or {}).get("max_items", 8)))
+        self._client_factory = client_factory
+        self._llm_concurrency = args.llm_concurrency
+        self._scheduler: Optional[SummaryScheduler] = None   # made with the first group, on the caller's thread
+        # Released groups resolve their bodies on as many threads as feeds are fetched on
+        workers = int((cfg.get("sources", {}) or {}).get("max_concurrency", DEFAULT_MAX_WORKERS))
+        self._dispatcher = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stream")
+        self._slots = threading.Semaphore(max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self._extractor = None
+        self._archive = PostArchive.from_config(storage_dir, cfg.get("archive"))
+        self._archive_hits = 0
+        self._extract_busy = 0.0
+        self._spans: Dict[str, List[Optional[float]]] = {"extract": [None, None], "summarize": [None, None]}
+        self._bodies = 0
+
+        self._bounds: Dict[str, Optional[int]] = {}   # unfinished source -> most posts it can still add
+        self._newer: List[float] = []                 # -published_ts of every capped post so far, sorted
+        self._held: List[Tuple[float, int, Post]] = []  # heap of capped posts not released yet, newest first
+        self._seq = itertools.count()
+        self._buffer: List[Post] = []
+        self._released = set()                        # id() of posts handed to the workers
+        self._capped_out = set()                      # id() of dedup representatives the caps left out
+        self._dispatches: List[Future] = []
+        self.streamed = 0                             # posts released before collection ended
+        self._closed = False
+
+    @classmethod
+    def from_config(
+        cls, cfg: dict, storage_dir: Path, args, client_factory: Callable[[], object], prompts, cache, *,
+        metrics: Optional[RunMetrics] = None, dedup: Optional[Deduplicator] = None,
+    ) -> Optional["SummaryStream"]:
+        """Build from the ``pipeline:`` section; None when streaming is off (config or ``--no-stream``).
+
+        `client_factory` is called once, when the first post is released, so a
+        poll that finds nothing never needs an API key.
+        """
+        pipeline_cfg = cfg.get("pipeline", {}) or {}
+        enabled = args.stream if getattr(args, "stream", None) is not None else bool(pipeline_cfg.get("streaming", True))
+        if not enabled:
+            return None
+        return cls(
+            cfg, storage_dir, args, client_factory, prompts, cache,
+            max_pending=int(pipeline_cfg.get("max_pending_posts", DEFAULT_MAX_PENDING)),
+            metrics=metrics,
+            dedup=dedup,
+        )
+
+    # -- collect_posts listener ------------------------------------------
+    def sources_planned(self, planned: List[Tuple[str, dict]]):
+        for section, entry in planned:
+            self._bounds[entry["key"]] = self._source_bound(section, entry)
+        adapters = dict(ADAPTERS)
+        if any(adapters[section] in BODY_LOADERS.values() for section, _ in planned):
+            # Still on the collecting thread, before any fetch thread runs (see Extractor.start)
+            from src.sources.extract import Extractor
+
+            self._extractor = Extractor.from_config(self.storage_dir, self.cfg.get("extract")).start()
+
+    def source_done(self, key: str, posts: List[Post]):
+        self._bounds.pop(key, None)
+        if self.dedup is not None:
+            # Copies of posts from sources that finished earlier are not summarized,
+            # unless the caps left that earlier post out (see select_posts)
+            kept = self.dedup.filter(posts)
+            capped = self._promote(posts, kept, cap_per_source(kept, self.yt_cap, self.blog_cap))
+        else:
+            capped = cap_per_source(posts, self.yt_cap, self.blog_cap)
+        for p in capped:
+            ts = published_ts(p)
+            bisect.insort(self._newer, -ts)
+            heapq.heappush(self._held, (-ts, next(self._seq), p))
+        if self.early:
+            self._release_certain()
+
+    def _promote(self, arrived: List[Post], kept: List[Post], capped: List[Post]) -> List[Post]:
+        """`capped` plus the copies in `arrived` that take over a capped-out representative."""
+        take = cap_room(capped, self.yt_cap, self.blog_cap)
+        promoted = []
+        for p in arrived:
+            rep = self.dedup.representative(p)
+            if rep is not None and id(rep) in self._capped_out and take(p):
+                self.dedup.promote(p)
+                self._capped_out.discard(id(rep))
+                promoted.append(p)
+        in_cap = {id(p) for p in capped}
+        self._capped_out.update(id(p) for p in kept if id(p) not in in_cap)
+        return capped + promoted
+
+    def _source_bound(self, section: str, entry: dict) -> Optional[int]:
+        if section == "blogs":
+            return self.blog_cap if self.blog_cap > 0 else None
+        if section == "youtube":
+            return self.yt_cap if self.yt_cap > 0 else None
+        adapter = load_adapter(dict(ADAPTERS)[section])
+        max_posts = getattr(adapter, "max_posts", None)
+        return max_posts(entry) if max_posts else None
+
+    def _release_certain(self):
+        if any(b is None for b in self._bounds.values()):
+            return
+        still_to_come = sum(self._bounds.values())
+        while self._held:
+            neg_ts = self._held[0][0]
+            # capped posts at least as new as this one (ties count against it), itself excluded
+            ahead = bisect.bisect_right(self._newer, neg_ts) - 1
+            if ahead + still_to_come >= self.limit:
+                break
+            self._release(heapq.heappop(self._held)[2])
+            self.streamed += 1
+        if not self._batching:
+            self._flush()
+
+    # -- dispatch --------------------------------------------------------
+    def _release(self, post: Post):
+        self._released.add(id(post))
+        if not self._slots.acquire(blocking=False):
+            # Backpressure: hand over what is buffered, then wait for a summary to finish
+            self._flush()
+            self._slots.acquire()
+        self._buffer.append(post)
+        if len(self._buffer) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            if self._scheduler is None:
+                self._scheduler = SummaryScheduler.from_config(
+                    self._client_factory(), self._llm_cfg, max_concurrency=self._llm_concurrency,
+                )
+            group, self._buffer = self._buffer, []
+            self._mark("extract", start=True)
+            self._dispatches.append(self._dispatcher.submit(self._summarize, group))
+
+    def _summarize(self, group: List[Post]) -> List[Future]:
+        """Dispatcher thread: resolve bodies, then queue the group's requests on the scheduler."""
+        try:
+            stats: dict = {}
+            t0 = time.perf_counter()
+            resolve_bodies(
+                group, self.cfg, self.storage_dir, stats=stats,
+                extractor=self._extractor, archive=self._archive,
+            )
+            self._mark("extract")
+            with self._lock:
+                self._extract_busy += time.perf_counter() - t0
+                self._bodies += stats.get("bodies", 0)
+                self._archive_hits += stats.get("archive_hits", 0)
+            units = plan_units(group, self._llm_cfg)
+        except BaseException:
+            self._slots.release(len(group))
+            raise
+        futures = []
+        for unit in units:
+            self._mark("summarize", start=True)
+            fut = self._scheduler.submit(summarize_batch, unit, self.prompts, cache=self.cache, **summary_limits(self._llm_cfg))
+            fut.add_done_callback(lambda _f, n=len(unit): self._unit_done(n))
+            futures.append(fut)
+        return futures
+
+    def _unit_done(self, n: int):
+        self._mark("summarize")
+        self._slots.release(n)
+
+    def _mark(self, stage: str, *, start: bool = False):
+        """Record the first start or the latest end of `stage`'s wall-clock span."""
+        now = time.perf_counter()
+        with self._lock:
+            span = self._spans[stage]
+            if start:
+                if span[0] is None:
+                    span[0] = now
+            else:
+                span[1] = now
+
+    # -- results ---------------------------------------------------------
+    def finish(self, posts: List[Post]) -> List[dict]:
+        """Summarize whatever of the selected `posts` is not done yet; items keep their order."""
+        try:
+            for p in posts:
+                if id(p) not in self._released:
+                    self._release(p)
+            self._flush()
+            results = [unit_fut.result() for d in self._dispatches for unit_fut in d.result()]
+        finally:
+            self.close()
+        by_post = {id(it["post"]): it for unit_items in results for it in unit_items}
+        items = [by_post[id(p)] for p in posts]
+        self.metrics.add_items(items)
+        report_usage(items)
+        return items
+
+    def close(self):
+        """Wait for in-flight work and release the pools (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._dispatcher.shutdown(wait=True)
+        if self._scheduler is not None:
+            self._scheduler.shutdown()
+        m = self.metrics
+        for stage, (start, end) in self._spans.items():
+            if start is not None and end is not None:
+                m.add_span(stage, start, end)
+        m.count("extract_busy_seconds", round(self._extract_busy, 4))
+        m.count("streamed_posts", self.streamed)
+        if self._archive is not None:
+            self._archive.close()
+            m.count("archive_hits", self._archive_hits)
+        if self._extractor is not None:
+            self._extractor.close()
+            self._extractor.cache.evict()
+            m.count("bodies", self._bodies)
+            m.count("extract_hits", self._extractor.hits)
+            m.count("extract_misses", self._extractor.misses)
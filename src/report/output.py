@@ -0,0 +1,169 @@
+"""Output settings, rendering, delivery and metrics files, shared by the CLI and the daemon."""
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from src.util.metrics import RunMetrics
+
+# Optional delivery helpers (introduced in future refactor). If missing, we skip gracefully.
+try:
+    from src.report.delivery import deliver_to_icloud, deliver_to_apple_notes  # type: ignore
+except Exception:  # module may not exist yet
+    deliver_to_icloud = None  # type: ignore
+    deliver_to_apple_notes = None  # type: ignore
+
+
+def output_options(cfg: dict, args) -> tuple[dict, List[str]]:
+    """Output settings merged as defaults <- config <- CLI, plus the formats to render."""
+    output_defaults = {
+        "save_dir": None,             # fallback handled inside renderer (data/reports)
+        "formats": ["html"],         # default format
+        "ios": {
+            "icloud": {"enabled": False, "folder": "BlogDigest"},
+            "notes": {"enabled": False, "title_template": "Daily Digest — {date}"},
+        },
+    }
+    cfg_output = dict(output_defaults)
+    cfg_output.update(cfg.get("output", {}) or {})
+    # normalize nested dicts
+    cfg_output.setdefault("ios", {}).setdefault("icloud", {}).setdefault("enabled", output_defaults["ios"]["icloud"]["enabled"])
+    cfg_output.setdefault("ios", {}).setdefault("icloud", {}).setdefault("folder", output_defaults["ios"]["icloud"]["folder"])
+    cfg_output.setdefault("ios", {}).setdefault("notes", {}).setdefault("enabled", output_defaults["ios"]["notes"]["enabled"])
+    cfg_output.setdefault("ios", {}).setdefault("notes", {}).setdefault("title_template", output_defaults["ios"]["notes"]["title_template"])
+
+    # Apply CLI overrides if provided
+    if args.out_dir is not None:
+        cfg_output["save_dir"] = args.out_dir
+    if args.formats:
+        cfg_output["formats"] = [f.strip() for f in args.formats.split(",") if f.strip()]
+    if args.icloud is not None:
+        cfg_output["ios"]["icloud"]["enabled"] = bool(args.icloud)
+    if args.notes is not None:
+        cfg_output["ios"]["notes"]["enabled"] = bool(args.notes)
+    if args.notes_title:
+        cfg_output["ios"]["notes"]["title_template"] = args.notes_title
+    if args.incremental is not None:
+        cfg_output["incremental"] = bool(args.incremental)
+
+    # Canonicalize formats and filter/sanitize
+    wanted_formats = {fmt.lower() for fmt in (cfg_output.get("formats") or ["html"]) if fmt}
+    valid_formats = {"html", "md"}
+    # Allow a special "notes" format for Apple Notes-friendly HTML
+    valid_formats |= {"notes"}
+    wanted_formats = [f for f in wanted_formats if f in valid_formats]
+    if not wanted_formats:
+        wanted_formats = ["html"]
+    # If Apple Notes delivery is enabled, ensure we also render the Notes HTML
+    if cfg_output["ios"]["notes"]["enabled"]:
+        if "notes" not in wanted_formats:
+            wanted_formats.append("notes")
+    return cfg_output, wanted_formats
+
+
+def render_and_deliver(items: List[dict], storage_dir: Path, cfg_output: dict, wanted_formats: List[str], *, open_html: bool = True, metrics: Optional[RunMetrics] = None):
+    """Render the digest (merged with today's stored items) and run deliveries."""
+    metrics = metrics or RunMetrics()
+    with metrics.stage("render"):
+        md_path, html_path, out_dir = _render(items, storage_dir, cfg_output, wanted_formats)
+    with metrics.stage("deliver"):
+        _deliver(md_path, html_path, out_dir, storage_dir, cfg_output, open_html=open_html)
+    return md_path, html_path
+
+
+def _render(items: List[dict], storage_dir: Path, cfg_output: dict, wanted_formats: List[str]):
+    from src.report.render import render_digest  # jinja2, only when there is something to render
+    from src.report.store import DigestStore
+
+    # Render with configured formats and optional out_dir
+    out_dir = Path(cfg_output["save_dir"]).expanduser() if cfg_output.get("save_dir") else None
+
+    # Same-day reruns: append to today's stored items and render them all
+    store = DigestStore.from_config(storage_dir, cfg_output)
+    try:
+        md_path, html_path = render_digest(
+            items,
+            storage_dir,
+            formats=tuple(wanted_formats),
+            out_dir=out_dir,
+            store=store,
+        )
+    finally:
+        if store is not None:
+            store.evict()
+            store.close()
+    return md_path, html_path, out_dir
+
+
+def _deliver(md_path, html_path, out_dir, storage_dir: Path, cfg_output: dict, *, open_html: bool):
+    # Report what we produced in a stable way
+    produced = {}
+    if html_path:
+        produced["html"] = str(html_path)
+    if md_path:
+        produced["md"] = str(md_path)
+    if produced:
+        print("[update_agent] Wrote:")
+        for k, v in produced.items():
+            print(f"  - {k}: {v}")
+    else:
+        print("[update_agent] Nothing was rendered (no formats enabled or render failed).")
+
+    # Optional: iOS deliveries (only if helpers are available and HTML exists)
+    today = None
+    try:
+        from datetime import date as _date
+        today = _date.today().isoformat()
+    except Exception:
+        today = None
+
+    if html_path:
+        # iCloud copy
+        if cfg_output["ios"]["icloud"]["enabled"]:
+            if deliver_to_icloud:
+                try:
+                    folder = cfg_output["ios"]["icloud"].get("folder", "BlogDigest")
+                    deliver_to_icloud(html_path, folder)
+                    print(f"[update_agent] iCloud copy updated: folder={folder}")
+                except Exception as e:
+                    print(f"[update_agent] iCloud delivery failed: {e}")
+            else:
+                print("[update_agent] iCloud delivery requested but helper not available; skipping.")
+        # Apple Notes
+        if cfg_output["ios"]["notes"]["enabled"]:
+            if deliver_to_apple_notes:
+                try:
+                    title_tmpl = cfg_output["ios"]["notes"].get("title_template", "Daily Digest — {date}")
+                    title = title_tmpl.format(date=today or "")
+                    # Prefer the Apple Notes-friendly HTML if it was rendered
+                    notes_candidate = (out_dir or (storage_dir / "reports")) / f"digest-notes-{today}.html"
+                    deliver_path = notes_candidate if notes_candidate.exists() else html_path
+                    deliver_to_apple_notes(deliver_path, title)
+                    print(f"[update_agent] Apple Notes updated: '{title}'")
+                except Exception as e:
+                    print(f"[update_agent] Apple Notes delivery failed: {e}")
+            else:
+                print("[update_agent] Apple Notes delivery requested but helper not available; skipping.")
+
+    # Auto-open HTML only if we actually have one and user likely expects local viewing
+    if html_path and open_html:
+        try:
+            subprocess.run(["open", str(html_path)], check=False)
+        except Exception:
+            pass
+
+
+def write_metrics(metrics: RunMetrics, cfg: dict, storage_dir: Path, cfg_output: dict):
+    """Write the run's metrics JSON next to the digest (and the Prometheus textfile, if set)."""
+    metrics_cfg = cfg.get("metrics", {}) or {}
+    if not metrics_cfg.get("enabled", True):
+        return
+    out_dir = Path(cfg_output["save_dir"]).expanduser() if cfg_output.get("save_dir") else storage_dir / "reports"
+    try:
+        path = metrics.write_json(out_dir)
+        print(f"[update_agent] Metrics: {path}")
+        if metrics_cfg.get("prometheus_textfile"):
+            metrics.write_prometheus(Path(metrics_cfg["prometheus_textfile"]).expanduser())
+    except OSError as e:
+        print(f"[update_agent] Could not write metrics: {e}")
@@ -1,38 +1,47 @@
+import hashlib
+import os
 from pathlib import Path
 from datetime import date
 from collections import defaultdict
-from typing import Optional, Sequence, Tuple
-from jinja2 import Template
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+from src.report.store import DigestStore, item_key
+from src.sources.base import published_ts
 from src.util.paths import ensure_dir
 
-def render_digest(
-    items,
-    storage_dir: Path,
-    *,
-    formats: Sequence[str] = ("html",),
-    out_dir: Optional[Path] = None,
-) -> Tuple[Optional[Path], Optional[Path]]:
-    """Render the daily digest.
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+STREAM_BUFFER_CHUNKS = 256  # template chunks joined per write
+# format -> (page template, per-item template, output file name pattern)
+FORMATS = {
+    "md": ("digest.md.j2", "item.md.j2", "digest-{date}.md"),
+    "html": ("digest.html.j2", "item.html.j2", "digest-{date}.html"),
+    "notes": ("digest_notes.html.j2", "item_notes.html.j2", "digest-notes-{date}.html"),
+}
 
-    Parameters
-    ----------
-    items : list
-        Aggregated items with summaries.
-    storage_dir : Path
-        Project storage directory; defaults for outputs derive from here.
-    formats : sequence of {"html", "md"}
-        Which formats to generate. Defaults to ("html",).
-    out_dir : Path or None
-        If provided, write outputs here; otherwise defaults to `storage_dir / "reports"`.
 
-    Returns
-    -------
-    (md_path, html_path) : tuple[Optional[Path], Optional[Path]]
-        Paths to files that were actually written (None if not generated).
+@lru_cache(maxsize=4)
+def get_environment(bytecode_dir: Optional[Path] = None) -> Environment:
+    """Shared Jinja environment for the digest templates.
+
+    Templates are compiled once per process (and reloaded if the file changes);
+    with `bytecode_dir`, the compiled bytecode is also kept on disk so the next
+    run skips parsing. Settings match `jinja2.Template` defaults, so output is
+    unchanged.
     """
-    today = date.today().isoformat()
+    bytecode_cache = None
+    if bytecode_dir is not None:
+        ensure_dir(bytecode_dir)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_dir))
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        bytecode_cache=bytecode_cache,
+        auto_reload=True,
+    )
+
 
-    # Build summary stats grouped by (kind, display_name or source_key)
+def digest_stats(items) -> List[dict]:
+    """Per-source summary rows, grouped by (kind, display_name or source_key)."""
     groups = defaultdict(list)
     for it in items:
         post = it["post"]
@@ -43,67 +52,134 @@ def render_digest(
     for (kind, name), grp in groups.items():
         mt = None
         cap = None
+        partial = False
         for it in grp:
             md = it["post"].get("metadata", {})
             if md.get("matched_total") is not None:
                 mt = md.get("matched_total")
             if md.get("max_keep") is not None:
                 cap = md.get("max_keep")
+            partial = partial or bool(md.get("matched_partial"))
         stats.append({
             "kind": kind,
             "name": name,
             "shown": len(grp),
             "matched_total": mt,
+            "matched_partial": partial,
             "cap": cap,
         })
+    return stats
 
-    # Determine output directory
-    reports_dir = Path(out_dir) if out_dir else (storage_dir / "reports")
-    ensure_dir(reports_dir)
 
-    fmtset = {f.lower() for f in formats}
-    want_html = "html" in fmtset
-    want_md = "md" in fmtset
-    want_notes = "notes" in fmtset
+class FragmentRenderer:
+    """Per-item fragments for one format, reused from a `DigestStore` when current.
 
-    md_path: Optional[Path] = None
-    html_path: Optional[Path] = None
-    notes_path: Optional[Path] = None
+    Pages call ``fragment(item)`` for each item; fragments rendered with the
+    same item template (by source signature) are served from the store, the
+    rest are rendered and saved by `save()`.
+    """
 
-    # Markdown (optional)
-    if want_md:
-        try:
-            md_tpl_path = Path(__file__).parent / "templates" / "digest.md.j2"
-            md_tpl = Template(md_tpl_path.read_text(encoding="utf-8"))
-            md_out = md_tpl.render(date=today, items=items, stats=stats)
-            md_path = reports_dir / f"digest-{today}.md"
-            md_path.write_text(md_out, encoding="utf-8")
-        except Exception as e:
-            print(f"[render_digest] Markdown render skipped/failed: {e}")
-            md_path = None
+    def __init__(self, env: Environment, fmt: str, template_name: str, store: Optional[DigestStore] = None, day: str = ""):
+        self.template = env.get_template(template_name)
+        source = env.loader.get_source(env, template_name)[0]
+        self.sig = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        self.fmt = fmt
+        self.store = store
+        self.day = day
+        self._cached: Dict[str, Tuple[str, str]] = store.fragments(day, fmt) if store is not None else {}
+        self._new: Dict[str, Tuple[str, str]] = {}
+        self.reused = 0
 
-    # HTML (default)
-    if want_html:
-        try:
-            html_tpl_path = Path(__file__).parent / "templates" / "digest.html.j2"
-            html_tpl = Template(html_tpl_path.read_text(encoding="utf-8"))
-            html_out = html_tpl.render(date=today, items=items, stats=stats)
-            html_path = reports_dir / f"digest-{today}.html"
-            html_path.write_text(html_out, encoding="utf-8")
-        except Exception as e:
-            print(f"[render_digest] HTML render failed: {e}")
-            html_path = None
+    def __call__(self, item) -> str:
+        key = item_key(item) if self.store is not None else None
+        hit = self._cached.get(key) if key is not None else None
+        if hit is not None and hit[0] == self.sig:
+            self.reused += 1
+            return hit[1]
+        body = self.template.render(item=item)
+        if key is not None:
+            self._new[key] = (self.sig, body)
+        return body
+
+    def save(self):
+        if self.store is not None:
+            self.store.put_fragments(self.day, self.fmt, self._new)
+            self._new = {}
 
-    # Apple Notes-friendly HTML (optional)
-    if want_notes:
+
+def stream_to_file(template: Template, path: Path, **context) -> Path:
+    """Render `template` chunk by chunk into `path` (atomically replaced)."""
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        stream = template.stream(**context)  # generate() under the hood
+        stream.enable_buffering(STREAM_BUFFER_CHUNKS)
+        with open(tmp, "w", encoding="utf-8", buffering=1 << 16) as fh:
+            stream.dump(fh)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+def render_digest(
+    items,
+    storage_dir: Path,
+    *,
+    formats: Sequence[str] = ("html",),
+    out_dir: Optional[Path] = None,
+    store: Optional[DigestStore] = None,
+    day: Optional[str] = None,
+) -> Tuple[Optional[Path], Optional[Path]]:
+    """Render the daily digest.
+
+    Parameters
+    ----------
+    items : list
+        Aggregated items with summaries.
+    storage_dir : Path
+        Project storage directory; defaults for outputs derive from here.
+    formats : sequence of {"html", "md", "notes"}
+        Which formats to generate. Defaults to ("html",). Each one is streamed
+        from the shared template environment straight to its file.
+    out_dir : Path or None
+        If provided, write outputs here; otherwise defaults to `storage_dir / "reports"`.
+    store : DigestStore or None
+        If provided, `items` are appended to today's stored items and the
+        digest covers everything stored for today (newest first), reusing
+        stored per-item fragments.
+    day : str or None
+        Digest date (YYYY-MM-DD); defaults to today.
+
+    Returns
+    -------
+    (md_path, html_path) : tuple[Optional[Path], Optional[Path]]
+        Paths to files that were actually written (None if not generated).
+    """
+    today = day or date.today().isoformat()
+    if store is not None:
+        store.add(today, items)
+        items = sorted(store.items(today), key=lambda it: published_ts(it["post"]), reverse=True)
+    stats = digest_stats(items)  # computed once, shared by every format
+
+    # Determine output directory
+    reports_dir = Path(out_dir) if out_dir else (storage_dir / "reports")
+    ensure_dir(reports_dir)
+    env = get_environment(storage_dir / "jinja_cache")
+
+    labels = {"md": "Markdown render skipped/failed", "html": "HTML render failed", "notes": "Notes HTML render failed"}
+    written = {}
+    fmtset = {f.lower() for f in formats}
+    for fmt, (template_name, item_template, file_pattern) in FORMATS.items():
+        if fmt not in fmtset:
+            continue
         try:
-            notes_tpl_path = Path(__file__).parent / "templates" / "digest_notes.html.j2"
-            notes_tpl = Template(notes_tpl_path.read_text(encoding="utf-8"))
-            notes_out = notes_tpl.render(date=today, items=items)
-            notes_path = reports_dir / f"digest-notes-{today}.html"
-            notes_path.write_text(notes_out, encoding="utf-8")
+            template = env.get_template(template_name)
+            fragment = FragmentRenderer(env, fmt, item_template, store, today)
+            path = reports_dir / file_pattern.format(date=today)
+            written[fmt] = stream_to_file(template, path, date=today, items=items, stats=stats, fragment=fragment)
+            fragment.save()
         except Exception as e:
-            print(f"[render_digest] Notes HTML render failed: {e}")
-            notes_path = None
+            print(f"[render_digest] {labels[fmt]}: {e}")
 
-    return md_path, html_path
+    return written.get("md"), written.get("html")
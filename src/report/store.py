@@ -0,0 +1,129 @@
+"""Per-day store of summarized digest items and their rendered fragments.
+
+Every run appends its newly summarized items to the day they were rendered
+on, and the digest is re-rendered from everything stored for that day, so a
+midday refresh keeps the morning's items without summarizing them again.
+Rendered per-item fragments are stored alongside, keyed by format and a
+signature of the item template, so only new (or re-templated) items are
+rendered. Backed by one SQLite file (``data/digest_store.sqlite``).
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.util.paths import ensure_dir
+
+DEFAULT_KEEP_DAYS = 14
+# Post fields the templates never read; the article body can be large.
+DROPPED_POST_FIELDS = ("text",)
+
+
+def item_key(item: dict) -> str:
+    """Stable identity of a digest item: its source and post id (or URL)."""
+    post = item.get("post", {})
+    return f"{post.get('source_key') or post.get('kind') or ''}:{post.get('id') or post.get('url') or post.get('title')}"
+
+
+class DigestStore:
+    """SQLite-backed items and fragment cache, partitioned by day (YYYY-MM-DD)."""
+
+    def __init__(self, path: Path, *, keep_days: int = DEFAULT_KEEP_DAYS):
+        ensure_dir(path.parent)
+        self.path = path
+        self.keep_days = int(keep_days)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                day TEXT NOT NULL,
+                key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                added REAL NOT NULL,
+                PRIMARY KEY (day, key)
+            );
+            CREATE TABLE IF NOT EXISTS fragments (
+                day TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fmt TEXT NOT NULL,
+                sig TEXT NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY (day, key, fmt)
+            );
+            """
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, storage_dir: Path, output_cfg: Optional[dict]) -> Optional["DigestStore"]:
+        """Open the store unless ``output.incremental`` is false."""
+        output_cfg = output_cfg or {}
+        if not output_cfg.get("incremental", True):
+            return None
+        return cls(storage_dir / "digest_store.sqlite", keep_days=output_cfg.get("keep_days", DEFAULT_KEEP_DAYS))
+
+    # -- items -----------------------------------------------------------
+    def add(self, day: str, items: Iterable[dict]) -> int:
+        """Append items not yet stored for `day`; returns how many were new."""
+        now = time.time()
+        with self._lock:
+            seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM items WHERE day = ?", (day,)).fetchone()[0]
+            added = 0
+            for item in items:
+                post = {k: v for k, v in item.get("post", {}).items() if k not in DROPPED_POST_FIELDS}
+                data = json.dumps(dict(item, post=post), ensure_ascii=False, default=str)
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO items (day, key, seq, data, added) VALUES (?, ?, ?, ?, ?)",
+                    (day, item_key(item), seq + added + 1, data, now),
+                )
+                added += cur.rowcount
+            self._db.commit()
+        return added
+
+    def items(self, day: str) -> List[dict]:
+        """All items stored for `day`, in the order they were added."""
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM items WHERE day = ? ORDER BY seq", (day,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # -- fragments -------------------------------------------------------
+    def fragments(self, day: str, fmt: str) -> Dict[str, Tuple[str, str]]:
+        """key -> (template signature, rendered fragment) for one day and format."""
+        with self._lock:
+            rows = self._db.execute("SELECT key, sig, body FROM fragments WHERE day = ? AND fmt = ?", (day, fmt))
+            return {key: (sig, body) for key, sig, body in rows}
+
+    def put_fragments(self, day: str, fmt: str, rendered: Dict[str, Tuple[str, str]]):
+        if not rendered:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO fragments (day, key, fmt, sig, body) VALUES (?, ?, ?, ?, ?)",
+                [(day, key, fmt, sig, body) for key, (sig, body) in rendered.items()],
+            )
+            self._db.commit()
+
+    # -- lifecycle -------------------------------------------------------
+    def evict(self, today: Optional[str] = None) -> int:
+        """Drop days older than `keep_days`; returns the number of items removed."""
+        if self.keep_days <= 0:
+            return 0
+        today_d = dt.date.fromisoformat(today) if today else dt.date.today()
+        cutoff = (today_d - dt.timedelta(days=self.keep_days)).isoformat()
+        with self._lock:
+            removed = self._db.execute("DELETE FROM items WHERE day < ?", (cutoff,)).rowcount
+            self._db.execute("DELETE FROM fragments WHERE day < ?", (cutoff,))
+            self._db.commit()
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
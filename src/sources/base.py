@@ -1,3 +1,6 @@
+import sys
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import TypedDict, Optional, Dict
 
 class Post(TypedDict, total=False):
@@ -6,7 +9,55 @@ class Post(TypedDict, total=False):
     source_key: str
     title: str
     url: str
-    published: str       # ISO8601-ish
+    published: str       # ISO 8601 UTC ("2025-01-31T09:30:00Z") once normalized; raw if unparseable
+    published_ts: float  # the same instant as a UTC epoch, the sort key (0.0 if unknown)
     author: Optional[str]
-    text: str
-    metadata: Dict
\ No newline at end of file
+    text: str            # may be "" until resolved if metadata["body"] holds a lazy body handle
+    metadata: Dict
+
+def parse_published(value) -> Optional[datetime]:
+    """Parse a feed/API date (ISO 8601, RFC 822, YYYY-MM-DD, ...) to an aware UTC datetime."""
+    if not value:
+        return None
+    value = str(value).strip()
+    dt = None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(value)  # RFC 822, as in most RSS feeds
+        except (TypeError, ValueError, IndexError):
+            try:
+                from dateutil import parser as dateparse  # rare formats only
+
+                dt = dateparse.parse(value)
+            except (ValueError, OverflowError):
+                return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # naive dates are taken as UTC
+    return dt.astimezone(timezone.utc)
+
+def normalize_post(post: Post) -> Post:
+    """Normalize a freshly fetched post in place, once, at ingest.
+
+    `published` becomes ISO 8601 UTC, so plain string order is chronological
+    across sources, and `published_ts` holds the epoch used as the sort key
+    (0.0, sorting last, when the date is missing or unparseable).
+    `kind` and `source_key` are interned: thousands of posts share a handful.
+    """
+    dt = parse_published(post.get("published"))
+    if dt is not None:
+        post["published"] = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    post["published_ts"] = dt.timestamp() if dt else 0.0
+    for field in ("kind", "source_key"):
+        if isinstance(post.get(field), str):
+            post[field] = sys.intern(post[field])
+    return post
+
+def published_ts(post: Post) -> float:
+    """Sort key: UTC epoch of `published` (parsed on the fly for posts stored before normalization)."""
+    ts = post.get("published_ts")
+    if ts is None:
+        dt = parse_published(post.get("published"))
+        ts = dt.timestamp() if dt else 0.0
+    return ts
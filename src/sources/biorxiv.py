@@ -1,14 +1,30 @@
 from __future__ import annotations
-from typing import List
+from typing import List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
 from datetime import date, timedelta
-from urllib.parse import quote
-import requests
+from urllib.parse import quote, urlparse
+import heapq
 import sys
 import re
 
+from src.util.http import transport
+from src.util.state import have_seen
 from .base import Post
+from .keywords import compile_keywords
 
 API_BASE = "https://api.biorxiv.org/details/biorxiv"
+PAGE_SIZE = 100                  # items per cursor page returned by the API
+DEFAULT_PAGE_CONCURRENCY = 4
+
+def source_host(config_entry: dict) -> str:
+    """Host this source will be fetched from (used for per-host concurrency caps)."""
+    return urlparse(config_entry.get("api_base") or API_BASE).netloc.lower()
+
+def max_posts(config_entry: dict) -> Optional[int]:
+    """Most posts one poll can return (`max_keep`), so a streaming run can bound what is still to come."""
+    max_keep = int(config_entry.get("max_keep", 10))
+    return max_keep if max_keep >= 0 else None
 
 def _daterange(days: int) -> tuple[str, str]:
     to = date.today()
@@ -16,28 +32,59 @@ def _daterange(days: int) -> tuple[str, str]:
     return frm.isoformat(), to.isoformat()
 
 def _fetch_json(url: str, ua: str) -> dict:
-    r = requests.get(url, headers={"User-Agent": ua, "Accept": "application/json"}, timeout=30)
+    r = transport().get(url, headers={"User-Agent": ua, "Accept": "application/json"})
     r.raise_for_status()
     return r.json()
 
-def _match_keywords(txt: str, keywords: list[str]) -> bool:
-    if not keywords:
-        return True
-    t = (txt or "").lower()
-    for kw in keywords:
-        if kw.strip() and kw.strip().lower() in t:
-            return True
-    return False
+def _page_url(base: str, frm: str, to: str, cursor: int) -> str:
+    return f"{base.rstrip('/')}/{frm}/{to}/{cursor}"
+
+def _total_count(data: dict) -> int:
+    """Total items in the window, from the first page's `messages` block."""
+    for msg in data.get("messages") or []:
+        try:
+            return int(msg.get("total"))
+        except (TypeError, ValueError):
+            continue
+    return len(data.get("collection") or [])
 
-def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
+def _newest_key(c: dict) -> tuple:
+    """Sort key, largest first: newest date, then the API's own order (cursor, position) on ties."""
+    cursor, pos = c["order"]
+    return c["published"], -cursor, -pos
+
+def _newest_certain(candidates: list[dict], max_keep: int, newest_possible: str, fetched: set, cursors: list) -> bool:
+    """True once the `max_keep` newest matches cannot be displaced by unseen pages.
+
+    Unfetched pages may hold items dated up to the end of the window, so we can
+    only stop once the max_keep-th newest match is itself dated `newest_possible`
+    and every page before it (which would win a same-day tie) has been `fetched`.
+    """
+    if max_keep <= 0 or len(candidates) < max_keep:
+        return False
+    kth = heapq.nlargest(max_keep, candidates, key=_newest_key)[-1]
+    if kth["published"] < newest_possible:
+        return False
+    return all(c in fetched for c in cursors if c < kth["order"][0])
+
+def fetch_new(config_entry: dict, state: dict, ua: str, meta: Optional[dict] = None) -> List[Post]:
     """
     config_entry:
       {
         key, enabled, keywords: [..], days?: int (default 3),
         max_results?: int (api fetch window cap, default 200),
         max_keep?: int (after filtering; default 10),
+        match_mode?: "substring" | "word" | "phrase" (default "substring"; see keywords.py),
+        page_concurrency?: int (cursor pages fetched at once, default 4),
+        api_base?: str (details endpoint, default API_BASE; e.g. a local mirror),
         display_name?, digest_mode?
       }
+    The first page gives the window's total; the remaining cursor pages (up to
+    `max_results` items) are fetched concurrently and keyword-filtered as they
+    arrive. Fetching stops early once the `max_keep` newest matches are certain,
+    in which case `matched_total` is a lower bound (`matched_partial` is set).
+    `meta` receives paging counters: pages fetched, window_total, examined,
+    matched and stopped_early.
     """
     key = config_entry["key"]
     if not config_entry.get("enabled", True):
@@ -45,42 +92,89 @@ def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
 
     days = int(config_entry.get("days", 3))
     frm, to = _daterange(days)
-    # API is paginated @ 100; we’ll just request the first chunk (max_results) for simplicity
     max_results = int(config_entry.get("max_results", 200))
-    url = f"{API_BASE}/{frm}/{to}/0"  # cursor=0
-    data = _fetch_json(url, ua)
-
-    all_items = data.get("collection", []) or []
-    if config_entry.get("debug"):
-        print(f"[biorxiv:{key}] API window {frm}..{to} returned {len(all_items)} items (first page)", file=sys.stderr)
-
-    # Local filter by keywords in title or abstract
+    max_keep = int(config_entry.get("max_keep", 10))
+    page_concurrency = max(1, int(config_entry.get("page_concurrency", DEFAULT_PAGE_CONCURRENCY)))
     keywords = config_entry.get("keywords", [])
-    seen_ids = set(state.get("seen_ids", {}).get(key, []))
-    posts: List[Post] = []
+    base = config_entry.get("api_base") or API_BASE
+    matcher = compile_keywords(keywords, config_entry.get("match_mode", "substring"))
 
     candidates = []
-    for it in all_items[:max_results]:
-        doi = it.get("doi")
-        if not doi or doi in seen_ids:
-            continue
-        title = it.get("title", "Untitled")
-        abstract = it.get("abstract", "") or ""
-        if not (_match_keywords(title, keywords) or _match_keywords(abstract, keywords)):
-            continue
-        url_abs = f"https://www.biorxiv.org/content/{doi}"
-        candidates.append({
-            "doi": doi,
-            "title": title,
-            "abstract": abstract.strip(),
-            "url": url_abs,
-            "published": it.get("date", ""),
-        })
+    examined = 0
+    fetched = set()
+
+    def take(cursor: int, data: dict):
+        nonlocal examined
+        items = (data.get("collection") or [])[: max(0, max_results - cursor)]
+        examined += len(items)
+        fetched.add(cursor)
+        # Local filter by keywords in title or abstract
+        for pos, it in enumerate(items):
+            doi = it.get("doi")
+            if not doi or have_seen(state, key, doi):
+                continue
+            title = it.get("title", "Untitled")
+            abstract = it.get("abstract", "") or ""
+            hits = matcher.search(title, abstract)
+            if matcher.keywords and not hits:
+                continue
+            url_abs = f"https://www.biorxiv.org/content/{doi}"
+            candidates.append({
+                "doi": doi,
+                "title": title,
+                "abstract": abstract.strip(),
+                "url": url_abs,
+                "published": it.get("date", ""),
+                "hits": hits,
+                "order": (cursor, pos),  # API order, which breaks same-day ties
+            })
+
+    first = _fetch_json(_page_url(base, frm, to, 0), ua)
+    take(0, first)
+    window_total = _total_count(first)
+    page_size = len(first.get("collection") or []) or PAGE_SIZE
+    cursors = list(range(page_size, min(window_total, max_results), page_size))
+    pages = 1
+    stopped_early = False
+
+    if cursors and _newest_certain(candidates, max_keep, to, fetched, cursors):
+        stopped_early = True
+    elif cursors:
+        pending = iter(cursors)
+        running = {}
+        pool = ThreadPoolExecutor(max_workers=page_concurrency, thread_name_prefix=f"biorxiv-{key}")
+        try:
+            def fill():
+                while len(running) < page_concurrency:
+                    cursor = next(pending, None)
+                    if cursor is None:
+                        return
+                    # copied context: page fetches spend this source's retry budget
+                    running[pool.submit(copy_context().run, _fetch_json, _page_url(base, frm, to, cursor), ua)] = cursor
+
+            fill()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    take(running.pop(fut), fut.result())
+                    pages += 1
+                if _newest_certain(candidates, max_keep, to, fetched, cursors):
+                    stopped_early = bool(running) or next(pending, None) is not None
+                    break
+                fill()
+        finally:
+            # Don't wait on pages we no longer need.
+            pool.shutdown(wait=False, cancel_futures=True)
 
+    if config_entry.get("debug"):
+        print(f"[biorxiv:{key}] API window {frm}..{to} has {window_total} items; "
+              f"examined {examined} over {pages} page(s){' (stopped early)' if stopped_early else ''}", file=sys.stderr)
     matched_total = len(candidates)
-    max_keep = int(config_entry.get("max_keep", 10))
-    # newest first
-    candidates.sort(key=lambda x: x.get("published", ""), reverse=True)
+    if meta is not None:
+        meta.update(pages=pages, window_total=window_total, examined=examined,
+                    matched=matched_total, stopped_early=stopped_early)
+    # newest first; pages finish in any order, so ties follow the API order
+    candidates.sort(key=_newest_key, reverse=True)
     kept = candidates[:max_keep]
 
     posts: List[Post] = []
@@ -98,7 +192,9 @@ def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
                 "display_name": config_entry.get("display_name", key),
                 "digest_mode": config_entry.get("digest_mode", "abstract_only"),
                 "query": " ".join(keywords),
+                "matched_keywords": c["hits"],   # which keywords hit title/abstract
                 "matched_total": matched_total,  # how many matched in window
+                "matched_partial": stopped_early,  # matched_total is a lower bound
                 "kept_index": idx,               # 1-based index among kept
                 "kept_total": len(kept),         # how many kept (<= max_keep)
                 "max_keep": max_keep,            # the cap
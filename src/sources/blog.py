@@ -1,84 +1,121 @@
 from __future__ import annotations
+import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from urllib.parse import urlparse
 import time
-import feedparser
-import requests
 from bs4 import BeautifulSoup
-from dateutil import parser as dateparse
-import trafilatura
 
+from src.util.http import decode_html, transport
+from src.util.state import get_feed_validators, have_seen
 from .base import Post
+from .feeds import fetch_feed
+from .extract import Extractor, fetch_html, html_to_markdown
+
+logger = logging.getLogger(__name__)
 
 def _discover_feed(homepage_url, headers):
-    try:
-        r = requests.get(homepage_url, headers=headers, timeout=20)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for link in soup.find_all("link"):
-            if link.get("rel") and "alternate" in [x.lower() for x in link.get("rel")]:
-                t = (link.get("type") or "").lower()
-                if "rss" in t or "xml" in t or "atom" in t:
-                    href = link.get("href")
-                    if href:
-                        from urllib.parse import urljoin
-                        return urljoin(homepage_url, href)
-    except Exception:
-        pass
+    # Network and HTTP errors propagate so the source's health records them
+    if not homepage_url:
+        return None
+    r = transport().get(homepage_url, headers=headers)
+    r.raise_for_status()
+    soup = BeautifulSoup(decode_html(r), "html.parser")
+    for link in soup.find_all("link"):
+        if link.get("rel") and "alternate" in [x.lower() for x in link.get("rel")]:
+            t = (link.get("type") or "").lower()
+            if "rss" in t or "xml" in t or "atom" in t:
+                href = link.get("href")
+                if href:
+                    from urllib.parse import urljoin
+                    return urljoin(homepage_url, href)
+    logger.warning("No feed link found on %s", homepage_url)
     return None
 
 def _extract_markdown(url: str) -> str | None:
-    html = trafilatura.fetch_url(url)
+    html = fetch_html(url)
     if not html:
         return None
-    md = trafilatura.extract(html, output_format="markdown") or trafilatura.extract(html)
-    return md
+    return html_to_markdown(html) or None
+
+def _configured_feed_url(config_entry: dict) -> str | None:
+    feed_url = config_entry.get("feed")
+    if not feed_url:
+        substack_home = config_entry.get("substack")
+        if substack_home:
+            feed_url = substack_home.rstrip("/") + "/feed"
+    if not feed_url:
+        homepage = config_entry.get("homepage", "")
+        if homepage and ".substack.com" in homepage:
+            feed_url = homepage.rstrip("/") + "/feed"
+    return feed_url
+
+def _entry_teaser(entry, limit: int = 1000) -> str:
+    raw = getattr(entry, "summary", None) or ""
+    if not raw:
+        return ""
+    return BeautifulSoup(raw, "html.parser").get_text(" ", strip=True)[:limit]
+
+def source_host(config_entry: dict) -> str:
+    """Host this source will be fetched from (used for per-host concurrency caps)."""
+    url = _configured_feed_url(config_entry) or config_entry.get("homepage", "")
+    return urlparse(url).netloc.lower()
 
-def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
+def fetch_new(config_entry: dict, state: dict, ua: str, meta: Optional[dict] = None) -> List[Post]:
     """
     config_entry: {key, feed?, homepage?, substack?, enabled?}
     - If `feed` is provided, it is used as-is.
     - Else if `substack` is provided (e.g., "https://coolai.substack.com"), the feed URL is computed as `<substack>/feed`.
     - Else if `homepage` looks like a Substack (e.g., contains ".substack.com"), the feed URL is computed as `<homepage>/feed`.
     - Else fallback to auto-discovery via `_discover_feed`.
+
+    The feed is polled with the ETag/Last-Modified stored in `state`; on a 304 nothing
+    is parsed and `meta["unchanged"]` is set. Fresh validators are reported in
+    `meta["validators"]` for the caller to persist.
     """
     key = config_entry["key"]
     if not config_entry.get("enabled", True):
         return []
 
     headers = {"User-Agent": ua, "Accept": "application/xml, text/html;q=0.9,*/*;q=0.8"}
-    feed_url = config_entry.get("feed")
-    if not feed_url:
-        substack_home = config_entry.get("substack")
-        if substack_home:
-            feed_url = substack_home.rstrip("/") + "/feed"
-    if not feed_url:
-        homepage = config_entry.get("homepage", "")
-        if homepage and ".substack.com" in homepage:
-            feed_url = homepage.rstrip("/") + "/feed"
+    feed_url = _configured_feed_url(config_entry)
     if not feed_url:
         # Fallback: try to discover from homepage links
         feed_url = _discover_feed(config_entry.get("homepage", ""), headers)
     if not feed_url:
         return []
 
-    d = feedparser.parse(feed_url, request_headers=headers)
+    d, validators = fetch_feed(feed_url, headers, get_feed_validators(state, key))
+    if d is None:
+        if meta is not None:
+            meta["unchanged"] = True
+        return []
+    if meta is not None:
+        meta["validators"] = validators
     entries = d.entries or []
     # oldest→newest so content is saved chronologically
-    entries.sort(key=lambda e: dateparse.parse(getattr(e, "published", getattr(e, "updated", "1970-01-01")))
-                if getattr(e, "published", None) or getattr(e, "updated", None) else time.gmtime(0))
+    # (feedparser has already parsed the dates to UTC struct_times)
+    entries.sort(key=lambda e: getattr(e, "published_parsed", None) or getattr(e, "updated_parsed", None) or time.gmtime(0))
 
-    seen_ids = set(state.get("seen_ids", {}).get(key, []))
     new_posts: List[Post] = []
     for e in entries:
         eid = getattr(e, "id", None) or getattr(e, "link", None)
-        if not eid or eid in seen_ids:
+        if not eid or have_seen(state, key, eid):
             continue
         title = getattr(e, "title", "Untitled")
         url = getattr(e, "link", None) or ""
         published = getattr(e, "published", getattr(e, "updated", "")) or ""
-        md = _extract_markdown(url) if url else None
-        text = md or ""
+        metadata = {
+            "display_name": config_entry.get("display_name", key)
+        }
+        teaser = _entry_teaser(e)
+        if teaser:
+            # Feed-provided summary; lets ranking score posts before extraction.
+            metadata["teaser"] = teaser
+        if url:
+            # Article extraction is deferred: most entries are dropped by the
+            # caps in main.py, so only survivors get fetched (see `load_body`).
+            metadata["body"] = {"loader": "blog", "url": url}
         new_posts.append(Post(
             id=eid, 
             kind="blog", 
@@ -87,9 +124,22 @@ def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
             url=url,
             published=published, 
             author=None, 
-            text=text, 
-            metadata={
-                "display_name": config_entry.get("display_name", key)
-            }
+            text="", 
+            metadata=metadata
         ))
-    return new_posts
\ No newline at end of file
+    return new_posts
+
+def load_body(handle: dict, extractor: Optional[Extractor] = None) -> str:
+    """Resolve a lazy body handle created by `fetch_new` into article markdown.
+
+    With an `Extractor`, extraction runs on its process pool and is cached on disk.
+    A failed download or extraction is logged and leaves the body empty.
+    """
+    url = handle["url"]
+    try:
+        if extractor is not None:
+            return extractor.extract(url) or ""
+        return _extract_markdown(url) or ""
+    except Exception:  # noqa: BLE001 - one bad page must not sink the digest
+        logger.warning("Could not load the article body of %s; summarizing without it", url, exc_info=True)
+        return ""
\ No newline at end of file
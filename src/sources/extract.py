@@ -0,0 +1,191 @@
+"""Article extraction (HTML → markdown) on a process pool with an on-disk cache.
+
+Trafilatura extraction is CPU-bound, so it runs in worker processes (one per
+core by default) while downloads stay on the caller's threads. Results are
+cached on disk twice:
+
+- ``urls/<sha256(url)>.json`` maps a URL to the hash of the HTML it served;
+- ``content/<sha256(html)>.md`` holds the markdown extracted from that HTML.
+
+A URL seen within the TTL is answered without any network access, and the
+same page reached through another URL (e.g. listed in two feeds) is never
+re-extracted. Entries older than the TTL are evicted by ``evict()``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from src.util.http import decode_html, transport
+from src.util.paths import ensure_dir
+
+DEFAULT_TTL_DAYS = 30
+# Workers start from a fresh interpreter, never a fork of the threaded parent
+# (which holds SQLite connections, HTTP pacer locks and the requests pool)
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def html_to_markdown(html: str) -> str:
+    """Extract the main article from ``html`` (runs inside worker processes)."""
+    import trafilatura  # heavy (pulls in dateparser/htmldate); only needed on a cache miss
+
+    return trafilatura.extract(html, output_format="markdown") or trafilatura.extract(html) or ""
+
+
+def fetch_html(url: str) -> Optional[str]:
+    """Download a page over the shared transport.
+
+    Network errors and non-2xx answers raise ``requests.RequestException``;
+    callers decide whether a missing page is fatal (see ``blog.load_body``).
+    """
+    resp = transport().get(url, headers={"Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8"})
+    resp.raise_for_status()
+    return decode_html(resp)
+
+
+def _sha256(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ExtractCache:
+    """URL- and content-addressed markdown cache stored as plain files."""
+
+    def __init__(self, root: Path, *, ttl_days: float = DEFAULT_TTL_DAYS):
+        self.root = root
+        self.ttl = float(ttl_days) * 86400
+        self._urls = root / "urls"
+        self._content = root / "content"
+        ensure_dir(self._urls)
+        ensure_dir(self._content)
+
+    def _fresh(self, path: Path) -> bool:
+        try:
+            return self.ttl <= 0 or time.time() - path.stat().st_mtime <= self.ttl
+        except FileNotFoundError:
+            return False
+
+    def lookup_url(self, url: str) -> Optional[str]:
+        ref = self._urls / f"{_sha256(url)}.json"
+        if not self._fresh(ref):
+            return None
+        try:
+            content_hash = json.loads(ref.read_text(encoding="utf-8"))["content_hash"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return self.lookup_content(content_hash)
+
+    def lookup_content(self, content_hash: str) -> Optional[str]:
+        path = self._content / f"{content_hash}.md"
+        if not self._fresh(path):
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def store(self, url: str, content_hash: str, markdown: str):
+        # Write-then-rename so concurrent readers never see partial files.
+        for path, data in (
+            (self._content / f"{content_hash}.md", markdown),
+            (self._urls / f"{_sha256(url)}.json", json.dumps({"url": url, "content_hash": content_hash})),
+        ):
+            tmp = path.with_suffix(f".tmp{os.getpid()}-{threading.get_ident()}")
+            tmp.write_text(data, encoding="utf-8")
+            tmp.replace(path)
+
+    def evict(self) -> int:
+        """Delete cache files older than the TTL; returns how many were removed."""
+        if self.ttl <= 0:
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for folder in (self._urls, self._content):
+            for path in folder.iterdir():
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class Extractor:
+    """Download articles on the calling thread, extract them on a process pool.
+
+    Thread-safe: ``extract`` may be called concurrently (e.g. from the body
+    resolution thread pool). Call ``start()`` on the thread that will start
+    the fetch threads, before it does: the process pool is then created
+    there, and its workers (``MP_START_METHOD``) start on the first cache miss.
+    """
+
+    def __init__(self, cache: ExtractCache, *, workers: Optional[int] = None):
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.hits = 0
+        self.misses = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, storage_dir: Path, extract_cfg: Optional[dict]) -> "Extractor":
+        extract_cfg = extract_cfg or {}
+        cache = ExtractCache(storage_dir / "extract_cache", ttl_days=extract_cfg.get("cache_ttl_days", DEFAULT_TTL_DAYS))
+        return cls(cache, workers=extract_cfg.get("workers"))
+
+    def start(self) -> "Extractor":
+        """Create the process pool now (it also starts multiprocessing's resource tracker)."""
+        self._executor()
+        return self
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(MP_START_METHOD)
+                if MP_START_METHOD == "forkserver":
+                    # Workers fork from a server that has trafilatura imported already
+                    context.set_forkserver_preload([__name__, "trafilatura"])
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def _count(self, *, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def extract(self, url: str) -> Optional[str]:
+        md = self.cache.lookup_url(url)
+        if md is not None:
+            self._count(hit=True)
+            return md
+        html = fetch_html(url)
+        if not html:
+            return None
+        content_hash = _sha256(html)
+        md = self.cache.lookup_content(content_hash)
+        self._count(hit=md is not None)
+        if md is None:
+            md = self._executor().submit(html_to_markdown, html).result()
+        self.cache.store(url, content_hash, md)
+        return md
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def __enter__(self) -> "Extractor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,31 @@
+"""Conditional feed fetching over the shared HTTP transport.
+
+Blog and YouTube feeds are downloaded with ``src.util.http`` (pooled,
+retried, compressed) and the bytes handed to feedparser, instead of letting
+feedparser open its own urllib connection per feed.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import feedparser
+
+from src.util.http import transport
+
+
+def fetch_feed(url: str, headers: dict, validators: Optional[dict] = None) -> Tuple[Optional[feedparser.FeedParserDict], Optional[dict]]:
+    """Fetch and parse `url` with the stored ETag/Last-Modified `validators`.
+
+    Returns ``(feed, new_validators)``; `feed` is None when the server answered
+    304 Not Modified. Network errors and HTTP errors are raised, so the poll
+    counts as failed in the source's health (see ``collect_posts``).
+    """
+    validators = validators or {}
+    resp = transport().get(url, headers=headers, etag=validators.get("etag"), modified=validators.get("modified"))
+    if resp.status_code == 304:
+        return None, None
+    resp.raise_for_status()
+    response_headers = {k.lower(): v for k, v in resp.headers.items()}
+    response_headers["content-location"] = resp.url  # base for relative links
+    feed = feedparser.parse(resp.content, response_headers=response_headers)
+    return feed, {"etag": resp.headers.get("ETag"), "modified": resp.headers.get("Last-Modified")}
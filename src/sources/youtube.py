@@ -1,8 +1,9 @@
 from __future__ import annotations
-from typing import List
-import feedparser
-from dateutil import parser as dateparse
+from typing import List, Optional
+from urllib.parse import urlparse
+from src.util.state import get_feed_validators, have_seen
 from .base import Post
+from .feeds import fetch_feed
 
 def _get_media_description(entry) -> str:
     # YouTube places description under media:group/media:description
@@ -18,12 +19,22 @@ def _get_media_description(entry) -> str:
 def _entry_id(entry):
     return getattr(entry, "yt_videoid", None) or getattr(entry, "id", None) or getattr(entry, "link", None)
 
-def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
+def source_host(config_entry: dict) -> str:
+    """Host this source will be fetched from (used for per-host concurrency caps)."""
+    feed_url = config_entry.get("feed")
+    if feed_url:
+        return urlparse(feed_url).netloc.lower()
+    return "www.youtube.com"
+
+def fetch_new(config_entry: dict, state: dict, ua: str, meta: Optional[dict] = None) -> List[Post]:
     """
     config_entry: {key, feed?, id?, enabled?, digest_mode?, display_name?}
     - If `feed` is provided, it is used as-is.
     - Else if `id` (YouTube channel_id, e.g. "UCawZsQWqfGSbCI5yjkdVkTA") is provided, the feed URL is computed as:
       https://www.youtube.com/feeds/videos.xml?channel_id=<id>
+
+    Conditional GET works as in `blog.fetch_new`: a 304 sets `meta["unchanged"]`,
+    fresh validators are reported in `meta["validators"]`.
     """
     key = config_entry["key"]
     if not config_entry.get("enabled", True):
@@ -40,13 +51,18 @@ def fetch_new(config_entry: dict, state: dict, ua: str) -> List[Post]:
         return []
 
     headers = {"User-Agent": ua, "Accept": "application/atom+xml, application/xml;q=0.9,*/*;q=0.8"}
-    d = feedparser.parse(feed_url, request_headers=headers)
+    d, validators = fetch_feed(feed_url, headers, get_feed_validators(state, key))
+    if d is None:
+        if meta is not None:
+            meta["unchanged"] = True
+        return []
+    if meta is not None:
+        meta["validators"] = validators
 
-    seen_ids = set(state.get("seen_ids", {}).get(key, []))
     posts: List[Post] = []
     for e in d.entries or []:
         vid = _entry_id(e)
-        if not vid or vid in seen_ids:
+        if not vid or have_seen(state, key, vid):
             continue
         title = getattr(e, "title", "Untitled")
         url = getattr(e, "link", "")
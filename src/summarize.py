@@ -0,0 +1,296 @@
+"""Selection, summarization and bookkeeping shared by the CLI, the daemon and the stream.
+
+``src.main`` (one run), ``src.daemon`` (``--daemon``) and ``src.pipeline``
+(streaming) all cap, select and summarize posts, then mark them seen, the
+same way; the helpers live here so none of them imports the CLI module.
+"""
+from __future__ import annotations
+
+import heapq
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import yaml
+
+from src.aggregator.aggregator import ADAPTERS, commit_feed_validators, resolve_bodies
+from src.aggregator.dedup import Deduplicator
+from src.agent.cache import SummaryCache
+from src.agent.client import LazyClient
+from src.agent.prompts import PromptRegistry
+from src.agent.router import plan_batches, summarize_batch
+from src.agent.scheduler import SummaryScheduler
+from src.sources.base import Post, published_ts
+from src.util.metrics import RunMetrics
+from src.util.paths import resolve_storage_dir
+
+
+def _when(ts: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "never"
+
+
+def report_source_health(sources: Optional[dict]):
+    """Print the sources that failed or were skipped by the circuit breaker this poll."""
+    for key, s in (sources or {}).items():
+        if s.get("skipped"):
+            print(f"[update_agent] Skipping {key} until {_when(s.get('open_until'))} "
+                  f"after {s.get('failures')} failed poll(s); last error: {s.get('last_error')}")
+        elif s.get("error"):
+            opened = f"; skipped until {_when(s['open_until'])}" if s.get("open_until") else ""
+            print(f"[update_agent] Source {key} failed ({s.get('failures')} in a row{opened}): {s['error']}")
+
+
+def print_source_health(config_path: Path) -> int:
+    """`--health`: one line per enabled source from the state store."""
+    from src.util.state import load_state
+
+    cfg = yaml.safe_load(config_path.read_text(encoding="utf-8"))
+    state = load_state(resolve_storage_dir(cfg.get("storage_dir", "./data")) / "state.sqlite")
+    try:
+        health = state.all_source_health()
+    finally:
+        state.close()
+    src_cfg = cfg.get("sources", {}) or {}
+    now = time.time()
+    for section, _ in ADAPTERS:
+        for entry in src_cfg.get(section, []) or []:
+            if not entry.get("enabled", True) or not entry.get("key"):
+                continue
+            h = health.get(entry["key"], {})
+            if not h:
+                status = "not polled yet"
+            elif (h.get("open_until") or 0) > now:
+                status = f"OPEN until {_when(h['open_until'])} ({h['failures']} failures; {h.get('last_error')})"
+            elif h.get("failures"):
+                status = f"failing ({h['failures']} in a row; {h.get('last_error')})"
+            else:
+                status = "ok"
+            print(f"{section:<8} {entry['key']:<32} last ok {_when(h.get('last_success')):<16}  {status}")
+    return 0
+
+
+def source_caps(cfg: dict, args) -> tuple[int, int]:
+    """(videos per YouTube channel, posts per blog) kept before the global limit; <= 0 means uncapped."""
+    src_cfg = (cfg.get("sources", {}) or {})
+    yt_cap = args.yt_per_channel if args.yt_per_channel is not None else int(src_cfg.get("youtube_per_channel_limit", 5))
+    blog_cap = args.blog_per_source if args.blog_per_source is not None else int(src_cfg.get("blog_per_source_limit", 2))
+    return yt_cap, blog_cap
+
+
+def cap_per_source(posts: List[Post], yt_cap: int, blog_cap: int) -> List[Post]:
+    """Keep the newest `yt_cap` videos per channel and `blog_cap` posts per blog; other posts pass."""
+    if not ((yt_cap and yt_cap > 0) or (blog_cap and blog_cap > 0)):
+        return posts
+    videos_by_key = {}
+    blogs_by_key = {}
+    others = []
+    for p in posts:
+        kind = p.get("kind")
+        key = p.get("source_key")
+        if kind == "video" and key:
+            videos_by_key.setdefault(key, []).append(p)
+        elif kind == "blog" and key:
+            blogs_by_key.setdefault(key, []).append(p)
+        else:
+            others.append(p)
+
+    capped = []
+    if yt_cap and yt_cap > 0:
+        for key, lst in videos_by_key.items():
+            capped.extend(heapq.nlargest(yt_cap, lst, key=published_ts))
+    else:
+        for lst in videos_by_key.values():
+            capped.extend(lst)
+
+    if blog_cap and blog_cap > 0:
+        for key, lst in blogs_by_key.items():
+            capped.extend(heapq.nlargest(blog_cap, lst, key=published_ts))
+    else:
+        for lst in blogs_by_key.values():
+            capped.extend(lst)
+
+    return others + capped
+
+
+def cap_room(capped: List[Post], yt_cap: int, blog_cap: int) -> Callable[[Post], bool]:
+    """`take(post)`: True, and counted, if `post` still fits its source's cap next to `capped`."""
+    caps = {"video": yt_cap, "blog": blog_cap}
+    used = Counter((p.get("kind"), p.get("source_key")) for p in capped)
+
+    def take(post: Post) -> bool:
+        slot = (post.get("kind"), post.get("source_key"))
+        cap = caps.get(slot[0])
+        if cap and cap > 0 and slot[1] and used[slot] >= cap:
+            return False
+        used[slot] += 1
+        return True
+    return take
+
+
+def promote_copies(posts: List[Post], capped: List[Post], dedup: Deduplicator, yt_cap: int, blog_cap: int) -> List[Post]:
+    """`capped` plus, for each representative the caps left out, its first copy with room under its own cap.
+
+    Copies were dropped before capping; without this a story whose first copy
+    lost its source's cap would vanish although another copy was eligible.
+    """
+    kept = {id(p) for p in capped}
+    take = cap_room(capped, yt_cap, blog_cap)
+    promoted = []
+    for rep in posts:
+        if id(rep) in kept:
+            continue
+        copy = next((c for c in dedup.copies(rep) if take(c)), None)
+        if copy is not None:
+            dedup.promote(copy)
+            promoted.append(copy)
+    return capped + promoted
+
+
+def ranking_enabled(cfg: dict, args) -> bool:
+    rank_cfg = cfg.get("ranking", {}) or {}
+    return args.rank if args.rank is not None else bool(rank_cfg.get("enabled", False))
+
+
+def select_posts(posts: List[Post], cfg: dict, args, dedup: Optional[Deduplicator] = None) -> List[Post]:
+    """Apply per-source caps, then ranking or newest-first, then the global limit.
+
+    With `dedup` (which already filtered `posts`), a cluster whose
+    representative is capped out is handed to a copy that fits its own cap.
+    """
+    # Apply optional per-source caps before global cap
+    caps = source_caps(cfg, args)
+    capped = cap_per_source(posts, *caps)
+    posts = promote_copies(posts, capped, dedup, *caps) if dedup is not None else capped
+
+    # Optional local relevance ranking: the most relevant posts win the global
+    # limit instead of the newest ones.
+    rank_cfg = cfg.get("ranking", {}) or {}
+    rank_enabled = ranking_enabled(cfg, args)
+    interests = cfg.get("interests", "") or ""
+    if rank_enabled and interests.strip():
+        from src.aggregator.rank import rank_posts  # numpy, only when ranking
+
+        top_n = args.top_n if args.top_n is not None else rank_cfg.get("top_n")
+        top_n = min(args.limit, int(top_n)) if top_n else args.limit
+        posts = rank_posts(posts, interests, top_n)
+    else:
+        if rank_enabled:
+            print("[update_agent] Ranking requested but `interests` is empty; keeping newest posts.")
+        # newest first, up to the global limit (top-k, not a full sort)
+        posts = heapq.nlargest(max(0, args.limit), posts, key=published_ts)
+    return posts
+
+
+def plan_units(posts: List[Post], llm_cfg: dict) -> List[List[Post]]:
+    """Group posts into summarization requests: packed batches when `llm.batch` is on, else one each."""
+    batch_cfg = llm_cfg.get("batch", {}) or {}
+    if batch_cfg.get("enabled", False):
+        # Pack short posts into shared requests (one system prompt, one round-trip)
+        return plan_batches(
+            posts,
+            short_tokens=int(batch_cfg.get("short_tokens", 800)),
+            budget_tokens=int(batch_cfg.get("budget_tokens", 6000)),
+            max_items=int(batch_cfg.get("max_items", 8)),
+        )
+    return [[p] for p in posts]
+
+
+def summary_limits(llm_cfg: dict) -> dict:
+    return {
+        "max_input_tokens": int(llm_cfg.get("max_input_tokens", 16000)),
+        "max_chunks": int(llm_cfg.get("max_chunks", 8)),
+    }
+
+
+def summarize_posts(posts: List[Post], cfg: dict, storage_dir: Path, args, client, prompts: PromptRegistry, cache: Optional[SummaryCache], metrics: Optional[RunMetrics] = None) -> List[dict]:
+    """Resolve bodies and summarize `posts`; returns digest items in the same order."""
+    metrics = metrics or RunMetrics()
+    # Fetch article bodies only for the posts that survived capping
+    extract_stats = {}
+    with metrics.stage("extract"):
+        resolve_bodies(posts, cfg, storage_dir, stats=extract_stats)
+    for name, value in extract_stats.items():
+        metrics.count(name, value)
+
+    # Summarize concurrently under the configured rate limits; order is preserved
+    llm_cfg = cfg.get("llm", {}) or {}
+    units = plan_units(posts, llm_cfg)
+    with metrics.stage("summarize"), SummaryScheduler.from_config(client, llm_cfg, max_concurrency=args.llm_concurrency) as scheduler:
+        results = scheduler.map(summarize_batch, units, prompts, cache=cache, **summary_limits(llm_cfg))
+    # Units may regroup posts; restore the digest order
+    by_post = {id(it["post"]): it for unit_items in results for it in unit_items}
+    items = [by_post[id(p)] for p in posts]
+    metrics.add_items(items)
+    report_usage(items)
+    return items
+
+
+def report_usage(items: List[dict]):
+    """Print the run's token spend: the total plus the most expensive posts."""
+    spend = [it for it in items if it.get("usage", {}).get("calls")]
+    if spend:
+        total_in = sum(it["usage"]["input_tokens"] for it in spend)
+        total_out = sum(it["usage"]["output_tokens"] for it in spend)
+        total_cached = sum(it["usage"].get("cached_tokens", 0) for it in spend)
+        calls = sum(it["usage"]["calls"] for it in spend)
+        print(
+            f"[update_agent] LLM usage: {total_in:,.0f} input ({total_cached:,.0f} from prompt cache) "
+            f"+ {total_out:,.0f} output tokens over {calls:.0f} call(s)"
+        )
+        top = sorted(spend, key=lambda it: it["usage"]["input_tokens"] + it["usage"]["output_tokens"], reverse=True)[:3]
+        for it in (top if total_in + total_out else []):
+            u = it["usage"]
+            print(f"  - {u['input_tokens'] + u['output_tokens']:,.0f} tokens ({u['calls']:.0f} call(s)): {it['post'].get('title', '')[:70]}")
+
+
+def report_duplicates(dedup: Deduplicator, metrics: RunMetrics):
+    """Print and count the copies dedup removed from this run."""
+    metrics.count("duplicates", dedup.duplicates)
+    metrics.count("duplicates_covered", len(dedup.covered))
+    if dedup.duplicates or dedup.covered:
+        print(f"[update_agent] Dedup: {dedup.duplicates} duplicate(s) linked as 'also at' to the first copy; "
+              f"{len(dedup.covered)} already summarized in an earlier run.")
+
+
+def mark_summarized(items: List[dict], storage_dir: Path, pending_validators: Optional[dict], also_seen: Iterable[Post] = ()):
+    """Mark exactly the summarized items as seen and persist ready feed validators.
+
+    Their near-duplicates (``metadata["also_at"]``) and the posts in `also_seen`
+    (copies of posts summarized in earlier runs) are marked seen too.
+    """
+    try:
+        from src.util.state import load_state, save_state, mark_seen
+        state_path = storage_dir / "state.sqlite"
+        state = load_state(state_path)
+        # mark seen per source_key for exactly the items we summarized
+        by_key = {}
+        for post in [it.get("post", {}) for it in items] + list(also_seen):
+            for p in [post, *(post.get("metadata") or {}).get("also_at", [])]:
+                key = p.get("source_key")
+                pid = p.get("id")
+                if key and pid:
+                    by_key.setdefault(key, []).append(pid)
+        for k, ids in by_key.items():
+            mark_seen(state, k, ids)
+        commit_feed_validators(state, pending_validators)
+        save_state(state_path, state)
+        state.close()
+    except Exception:
+        pass
+
+
+def client_factory(client=None) -> Callable[[], object]:
+    """Zero-argument callable returning `client`, or a `LazyClient` made on the first call.
+
+    Making it checks the API key, so runs with nothing to summarize need none,
+    while a run with posts still fails before its first summary. openai itself
+    is imported on the first request that misses the summary cache.
+    """
+    made = []
+
+    def get():
+        if not made:
+            made.append(client if client is not None else LazyClient(Path(__file__).resolve().parents[1]))
+        return made[0]
+    return get
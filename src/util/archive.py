@@ -0,0 +1,272 @@
+"""Compressed, content-addressed archive of post bodies (``data/posts/``).
+
+Every body that is summarized (extracted article markdown, bioRxiv abstract,
+video description) is stored once, so reprocessing a post reads it from disk
+instead of downloading and extracting it again:
+
+- ``seg-00000.dat``, ``seg-00001.dat``, ...: append-only segment files of
+  individually compressed records (zstd when ``zstandard`` is installed,
+  else gzip), so one record is read and decompressed without touching the
+  rest. A new segment starts once the current one passes ``segment_mb``.
+- ``index.bin``: a memory-mapped open-addressing hash table of fixed-size
+  slots mapping a 16-byte key to ``(segment, offset, length, codec)``. Each
+  body has two keys, one for its post id (``source_key:id``) and one for the
+  SHA-256 of its text, so lookups by either are O(1) and identical bodies
+  share a record. The table doubles (rewritten, then swapped in atomically)
+  when it is 70% full.
+
+Records are written before their index slot, and a slot's key last, so a
+crash can only leave unreferenced bytes behind. One process should write an
+archive at a time; threads may share a ``PostArchive``.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from .paths import ensure_dir
+
+DEFAULT_SEGMENT_MB = 64
+DEFAULT_CAPACITY = 1024       # index slots; a power of two
+MAX_LOAD = 0.7
+
+MAGIC = b"UAPOSTS1"
+_HEADER = struct.Struct("<8sQQ")       # magic, capacity, used slots
+_SLOT = struct.Struct("<16sIQII B3x")  # key, segment, offset, length, raw length, codec
+_EMPTY = bytes(16)
+
+CODEC_NONE, CODEC_GZIP, CODEC_ZSTD = 0, 1, 2
+CODEC_NAMES = {"none": CODEC_NONE, "gzip": CODEC_GZIP, "zstd": CODEC_ZSTD}
+
+
+def _key(kind: str, value: str) -> bytes:
+    return hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=16).digest()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class PostArchive:
+    """Segment files plus an mmap'd hash index; see the module docstring."""
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        compression: str = "auto",
+        level: Optional[int] = None,
+        segment_mb: float = DEFAULT_SEGMENT_MB,
+    ):
+        ensure_dir(root)
+        self.root = root
+        self.segment_bytes = int(float(segment_mb) * 1024 * 1024)
+        zstd = _zstd()
+        if compression == "auto":
+            compression = "zstd" if zstd is not None else "gzip"
+        if compression not in CODEC_NAMES:
+            raise ValueError(f"archive: unknown compression {compression!r} (zstd, gzip, none or auto)")
+        if compression == "zstd" and zstd is None:
+            raise ValueError("archive: compression 'zstd' needs the zstandard package (or use gzip/auto)")
+        self.codec = CODEC_NAMES[compression]
+        self.level = level
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._compressor = zstd.ZstdCompressor(level=level or 3, write_checksum=True) if self.codec == CODEC_ZSTD else None
+        self._decompressor = zstd.ZstdDecompressor() if zstd is not None else None
+        self._readers: Dict[int, BinaryIO] = {}
+        self._writer: Optional[BinaryIO] = None
+        self._segment = max((int(p.stem[4:]) for p in root.glob("seg-*.dat")), default=0)
+        self._index_path = root / "index.bin"
+        if not self._index_path.exists():
+            self._write_table(self._index_path, DEFAULT_CAPACITY, [])
+        self._open_index()
+
+    @classmethod
+    def from_config(cls, storage_dir: Path, archive_cfg: Optional[dict]) -> Optional["PostArchive"]:
+        """Open the archive described by the ``archive:`` config section (None if disabled)."""
+        archive_cfg = archive_cfg or {}
+        if not archive_cfg.get("enabled", True):
+            return None
+        return cls(
+            storage_dir / archive_cfg.get("dirname", "posts"),
+            compression=archive_cfg.get("compression", "auto"),
+            level=archive_cfg.get("level"),
+            segment_mb=archive_cfg.get("segment_mb", DEFAULT_SEGMENT_MB),
+        )
+
+    # -- index -----------------------------------------------------------
+    def _open_index(self):
+        self._index_file = open(self._index_path, "r+b")
+        self._mm = mmap.mmap(self._index_file.fileno(), 0)
+        magic, self._capacity, self._used = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self._index_path} is not a post archive index")
+
+    @staticmethod
+    def _write_table(path: Path, capacity: int, slots):
+        """Write a fresh index of `capacity` slots holding `slots` (packed slot bytes)."""
+        table = bytearray(_HEADER.size + capacity * _SLOT.size)
+        mask = capacity - 1
+        for raw in slots:
+            i = int.from_bytes(raw[:8], "little") & mask
+            while table[_HEADER.size + i * _SLOT.size:_HEADER.size + i * _SLOT.size + 16] != _EMPTY:
+                i = (i + 1) & mask
+            table[_HEADER.size + i * _SLOT.size:_HEADER.size + (i + 1) * _SLOT.size] = raw
+        _HEADER.pack_into(table, 0, MAGIC, capacity, len(slots))
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(table)
+        os.replace(tmp, path)
+
+    def _find(self, key: bytes) -> Tuple[int, bool]:
+        """(slot offset, found) for `key`: its slot, or the empty slot it would go in."""
+        mask = self._capacity - 1
+        i = int.from_bytes(key[:8], "little") & mask
+        while True:
+            off = _HEADER.size + i * _SLOT.size
+            k = self._mm[off:off + 16]
+            if k == key:
+                return off, True
+            if k == _EMPTY:
+                return off, False
+            i = (i + 1) & mask
+
+    def _lookup(self, key: bytes) -> Optional[Tuple[int, int, int, int, int]]:
+        off, found = self._find(key)
+        return _SLOT.unpack_from(self._mm, off)[1:] if found else None
+
+    def _insert(self, key: bytes, location: Tuple[int, int, int, int, int]):
+        if (self._used + 1) > self._capacity * MAX_LOAD:
+            self._grow()
+        off, found = self._find(key)
+        if found:
+            return
+        # Fields first, key last: a slot only becomes visible once complete
+        self._mm[off + 16:off + _SLOT.size] = _SLOT.pack(_EMPTY, *location)[16:]
+        self._mm[off:off + 16] = key
+        self._used += 1
+        _HEADER.pack_into(self._mm, 0, MAGIC, self._capacity, self._used)
+
+    def _grow(self):
+        slots = []
+        for i in range(self._capacity):
+            off = _HEADER.size + i * _SLOT.size
+            raw = self._mm[off:off + _SLOT.size]
+            if raw[:16] != _EMPTY:
+                slots.append(raw)
+        self._mm.close()
+        self._index_file.close()
+        self._write_table(self._index_path, self._capacity * 2, slots)
+        self._open_index()
+
+    # -- records ---------------------------------------------------------
+    def _segment_path(self, n: int) -> Path:
+        return self.root / f"seg-{n:05d}.dat"
+
+    def _append(self, data: bytes) -> Tuple[int, int]:
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._segment), "ab")
+        offset = self._writer.seek(0, os.SEEK_END)
+        if offset and offset + len(data) > self.segment_bytes:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_path(self._segment), "ab")
+            offset = 0
+        self._writer.write(data)
+        self._writer.flush()
+        return self._segment, offset
+
+    def _read(self, segment: int, offset: int, length: int, codec: int) -> str:
+        f = self._readers.get(segment)
+        if f is None:
+            f = self._readers[segment] = open(self._segment_path(segment), "rb")
+        f.seek(offset)
+        data = f.read(length)
+        if codec == CODEC_GZIP:
+            data = gzip.decompress(data)
+        elif codec == CODEC_ZSTD:
+            if self._decompressor is None:
+                raise RuntimeError("archive record is zstd-compressed; install zstandard to read it")
+            data = self._decompressor.decompress(data)
+        return data.decode("utf-8")
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == CODEC_ZSTD:
+            return self._compressor.compress(raw)
+        if self.codec == CODEC_GZIP:
+            return gzip.compress(raw, compresslevel=self.level or 6, mtime=0)
+        return raw
+
+    # -- API -------------------------------------------------------------
+    def put(self, source_key: str, post_id: str, text: str) -> str:
+        """Store `text` as the body of post `source_key:post_id`; returns its content hash."""
+        digest = content_hash(text)
+        with self._lock:
+            hash_key = _key("sha", digest)
+            location = self._lookup(hash_key)
+            if location is None:
+                raw = text.encode("utf-8")
+                data = self._compress(raw)
+                segment, offset = self._append(data)
+                location = (segment, offset, len(data), len(raw), self.codec)
+                self._insert(hash_key, location)
+            self._insert(_key("id", f"{source_key}:{post_id}"), location)
+        return digest
+
+    def get(self, source_key: str, post_id: str) -> Optional[str]:
+        """The archived body of post `source_key:post_id`, or None."""
+        return self._get(_key("id", f"{source_key}:{post_id}"))
+
+    def get_by_hash(self, digest: str) -> Optional[str]:
+        """The archived body whose SHA-256 hex digest is `digest`, or None."""
+        return self._get(_key("sha", digest))
+
+    def _get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            location = self._lookup(key)
+            if location is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            segment, offset, length, _raw_length, codec = location
+            return self._read(segment, offset, length, codec)
+
+    def __len__(self) -> int:
+        """Index entries (post ids and content hashes)."""
+        with self._lock:
+            return self._used
+
+    def close(self):
+        with self._lock:
+            for f in self._readers.values():
+                f.close()
+            self._readers.clear()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._mm is not None:
+                self._mm.close()
+                self._index_file.close()
+                self._mm = None
+
+    def __enter__(self) -> "PostArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,257 @@
+"""One pooled HTTP transport shared by every adapter.
+
+Feeds, the bioRxiv API, feed discovery and article downloads all go through
+``transport()``: a single ``requests.Session`` whose adapter keeps a pool of
+keep-alive connections per host, advertises every content encoding urllib3
+can decode (gzip/deflate and brotli from the required ``brotli`` package, plus
+zstd when the optional ``zstandard`` is installed) and applies the configured
+connect and read timeouts. Callers parse the bytes it returns (feedparser, trafilatura)
+instead of letting those libraries fetch on their own.
+
+Politeness and retries:
+
+- requests to one host start at least ``min_host_interval_seconds`` apart
+  (``host_intervals`` overrides it per host), whichever thread sends them;
+- connection errors, timeouts and 429/5xx answers are retried with
+  exponential backoff and full jitter, or after ``Retry-After`` when the
+  server sends one (capped at ``max_backoff_seconds``);
+- inside ``with retry_budget(n):`` all those retries, across every request
+  the block makes (threads started with a copied context included), share a
+  budget of ``n``; once it is spent, failures are returned or raised at once,
+  so one dead source cannot stall a run.
+
+``configure()`` is called with the ``http:`` section of config.yml before
+polling; requests is only imported when the first fetch needs the session.
+"""
+from __future__ import annotations
+
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_POOL_MAXSIZE = 8     # keep-alive connections kept per host
+DEFAULT_POOL_HOSTS = 64      # hosts whose pools are kept open
+DEFAULT_MIN_HOST_INTERVAL = 0.0
+DEFAULT_MAX_BACKOFF_SECONDS = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryBudget:
+    """Retries left for one unit of work (e.g. one source's poll); thread-safe."""
+
+    def __init__(self, retries: int):
+        self.left = max(0, int(retries))
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            self.used += 1
+            return True
+
+
+_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("http_retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(retries: int):
+    """Share `retries` across every request made inside the block; yields the budget."""
+    budget = RetryBudget(retries)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def _retry_after(resp) -> Optional[float]:
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostPacer:
+    """Spaces request starts per host by a minimum interval."""
+
+    def __init__(self, default_interval: float, intervals: Optional[Dict[str, float]] = None):
+        self.default = float(default_interval)
+        self.intervals = {h.lower(): float(v) for h, v in (intervals or {}).items()}
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        interval = self.intervals.get(host, self.default)
+        if interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class HttpTransport:
+    """A pooled, retrying `requests.Session` with default timeouts. Thread-safe for GETs."""
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_hosts: int = DEFAULT_POOL_HOSTS,
+        min_host_interval_seconds: float = DEFAULT_MIN_HOST_INTERVAL,
+        host_intervals: Optional[Dict[str, float]] = None,
+        max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS,
+        user_agent: Optional[str] = None,
+        sleep=time.sleep,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.request import ACCEPT_ENCODING
+
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff_seconds)
+        self.max_backoff = float(max_backoff_seconds)
+        self._sleep = sleep
+        self._pacer = _HostPacer(min_host_interval_seconds, host_intervals)
+        self._retryable = (requests.ConnectionError, requests.Timeout)
+        # Retries are ours (budgeted, jittered), so urllib3 makes a single attempt
+        adapter = HTTPAdapter(pool_connections=int(pool_hosts), pool_maxsize=int(pool_maxsize), max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+    @classmethod
+    def from_config(cls, http_cfg: Optional[dict], *, user_agent: Optional[str] = None) -> "HttpTransport":
+        return cls(**_settings(http_cfg, user_agent))
+
+    def get(
+        self,
+        url: str,
+        *,
+        headers: Optional[dict] = None,
+        etag: Optional[str] = None,
+        modified: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> "requests.Response":
+        """GET `url`; `etag` / `modified` make it conditional (a 304 is returned as is).
+
+        Retryable failures are retried while attempts and the active retry
+        budget last; after that the last 429/5xx response is returned, or the
+        last connection error / timeout raised.
+        """
+        headers = dict(headers or {})
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        host = urlparse(url).netloc.lower()
+        budget = _budget.get()
+        attempt = 0
+        while True:
+            self._pacer.wait(host)
+            resp, error = None, None
+            try:
+                resp = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+            except self._retryable as exc:
+                error = exc
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                return resp
+            if attempt >= self.retries or (budget is not None and not budget.take()):
+                if resp is not None:
+                    return resp
+                raise error
+            delay = _retry_after(resp)
+            if resp is not None:
+                resp.close()  # hand the connection back to the pool
+            if delay is None:
+                delay = random.uniform(0, self.backoff * 2 ** attempt)  # full jitter
+            self._sleep(min(delay, self.max_backoff))
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+
+def decode_html(resp: "requests.Response") -> str:
+    """Response text, sniffing the charset when the server does not declare one.
+
+    requests falls back to ISO-8859-1 for any text/* response without a
+    charset, which mangles most modern pages.
+    """
+    if "charset" in resp.headers.get("Content-Type", "").lower():
+        return resp.text
+    try:
+        return resp.content.decode("utf-8")
+    except UnicodeDecodeError:
+        return resp.content.decode(resp.apparent_encoding or "latin-1", errors="replace")
+
+
+_SETTING_KEYS = (
+    "connect_timeout", "read_timeout", "retries", "backoff_seconds", "max_backoff_seconds",
+    "pool_maxsize", "pool_hosts", "min_host_interval_seconds", "host_intervals",
+)
+_lock = threading.Lock()
+_settings_in_use: dict = {}
+_shared: Optional[HttpTransport] = None
+
+
+def _settings(http_cfg: Optional[dict], user_agent: Optional[str] = None) -> dict:
+    http_cfg = http_cfg or {}
+    settings = {k: http_cfg[k] for k in _SETTING_KEYS if http_cfg.get(k) is not None}
+    if user_agent:
+        settings["user_agent"] = user_agent
+    return settings
+
+
+def configure(http_cfg: Optional[dict], *, user_agent: Optional[str] = None):
+    """Apply the ``http:`` config (and the default User-Agent); the shared session is rebuilt only if it changed."""
+    global _shared, _settings_in_use
+    settings = _settings(http_cfg, user_agent)
+    with _lock:
+        if settings == _settings_in_use:
+            return
+        _settings_in_use = settings
+        if _shared is not None:
+            _shared.close()
+            _shared = None
+
+
+def transport() -> HttpTransport:
+    """The process-wide transport, created on first use."""
+    global _shared
+    with _lock:
+        if _shared is None:
+            _shared = HttpTransport(**_settings_in_use)
+        return _shared
@@ -0,0 +1,152 @@
+"""Per-run timing and usage metrics.
+
+``RunMetrics`` collects stage wall times (collect, extract, summarize, render,
+deliver), per-source poll results and per-post LLM figures during a run, then
+writes them as ``metrics-<date>-<time>.json`` next to the digest and,
+optionally, as a Prometheus textfile-collector file (``*.prom``, replaced
+atomically so node_exporter never reads a partial file).
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .paths import ensure_dir
+
+PROM_PREFIX = "update_agent"
+STAGES = ("collect", "extract", "summarize", "render", "deliver")
+
+
+def _write_atomic(path: Path, text: str):
+    ensure_dir(path.parent)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class RunMetrics:
+    def __init__(self, *, clock=time.perf_counter):
+        self._clock = clock
+        self.started_at = datetime.now()
+        self._t0 = clock()
+        self.stages: Dict[str, float] = {}
+        self.sources: Dict[str, dict] = {}
+        self.posts: List[dict] = []
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages accumulate."""
+        t0 = self._clock()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + self._clock() - t0
+
+    def add_span(self, name: str, start: float, end: float):
+        """Add a stage span timed elsewhere (e.g. first to last event across worker threads)."""
+        self.stages[name] = self.stages.get(name, 0.0) + max(0.0, end - start)
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_sources(self, sources: Optional[Dict[str, dict]]):
+        """Per-source poll figures from ``collect_posts(stats=...)["sources"]``."""
+        for key, src in (sources or {}).items():
+            self.sources[key] = dict(src, seconds=round(src.get("seconds", 0.0), 4))
+
+    def add_items(self, items: Iterable[dict]):
+        """Per-post figures from summarized digest items."""
+        for it in items:
+            post = it.get("post", {})
+            usage = it.get("usage") or {}
+            self.posts.append({
+                "id": post.get("id"),
+                "source_key": post.get("source_key"),
+                "kind": post.get("kind"),
+                "title": post.get("title"),
+                "seconds": round(it.get("seconds", 0.0), 4),
+                "llm_calls": usage.get("calls", 0),
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "cached_input_tokens": usage.get("cached_tokens", 0),
+                "summary_cached": bool(it.get("cached")),
+                "batched": bool(it.get("batched")),
+                "fallback": bool(it.get("fallback")),
+            })
+
+    def totals(self) -> dict:
+        posts = self.posts
+        return {
+            "posts": len(posts),
+            "llm_calls": sum(p["llm_calls"] for p in posts),
+            "input_tokens": sum(p["input_tokens"] for p in posts),
+            "output_tokens": sum(p["output_tokens"] for p in posts),
+            "cached_input_tokens": sum(p["cached_input_tokens"] for p in posts),
+            "summary_cache_hits": sum(p["summary_cached"] for p in posts),
+            "fallbacks": sum(p["fallback"] for p in posts),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(self._clock() - self._t0, 4),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "totals": self.totals(),
+            "counters": self.counters,
+            "sources": self.sources,
+            "posts": self.posts,
+        }
+
+    def write_json(self, out_dir: Path) -> Path:
+        stem = f"metrics-{self.started_at:%Y-%m-%d-%H%M%S}"
+        path, n = out_dir / f"{stem}.json", 1
+        while path.exists():  # daemon polls and emissions can share a second
+            path, n = out_dir / f"{stem}-{n}.json", n + 1
+        _write_atomic(path, json.dumps(self.as_dict(), indent=2, ensure_ascii=False, default=str))
+        return path
+
+    def write_prometheus(self, path: Path) -> Path:
+        """Textfile-collector output: run totals, stage and per-source gauges."""
+        data = self.as_dict()
+        p = PROM_PREFIX
+        lines = [
+            f"# HELP {p}_last_run_timestamp_seconds Unix time the last run started.",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {self.started_at.timestamp():.0f}",
+            f"# HELP {p}_run_seconds Wall time of the last run.",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {data['wall_seconds']}",
+            f"# HELP {p}_stage_seconds Wall time per pipeline stage in the last run.",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+        for stage, secs in data["stages"].items():
+            lines.append(f'{p}_stage_seconds{{stage="{_label(stage)}"}} {secs}')
+        lines += [
+            f"# HELP {p}_source_seconds Poll time per source in the last run.",
+            f"# TYPE {p}_source_seconds gauge",
+        ]
+        for key, src in data["sources"].items():
+            lines.append(f'{p}_source_seconds{{source="{_label(key)}"}} {src.get("seconds", 0)}')
+        lines += [
+            f"# HELP {p}_source_new_posts New posts found per source in the last run.",
+            f"# TYPE {p}_source_new_posts gauge",
+        ]
+        for key, src in data["sources"].items():
+            lines.append(f'{p}_source_new_posts{{source="{_label(key)}"}} {src.get("posts", 0)}')
+        for name, value in data["totals"].items():
+            lines += [
+                f"# TYPE {p}_last_run_{name} gauge",
+                f"{p}_last_run_{name} {value}",
+            ]
+        _write_atomic(path, "\n".join(lines) + "\n")
+        return path
@@ -1,22 +1,230 @@
+"""Persistent run state: seen post ids per source bucket and feed validators.
+
+State lives in a small SQLite database (``data/state.sqlite``):
+
+- membership checks hit an in-memory set per bucket (loaded on first use),
+  so ``have_seen`` is O(1);
+- ``mark_seen`` inserts only the new ids, stamped with their insertion
+  order, and evicts the *oldest* ids once a bucket exceeds its bound;
+- per-source health (consecutive failed polls, last error, circuit-breaker
+  cool-down) is kept for ``src.aggregator`` to skip dead sources;
+- a legacy ``state.json`` next to the database is imported once on first open
+  and renamed to ``state.json.migrated``.
+
+The module-level helpers (``load_state``, ``mark_seen``, ...) are the API used
+by the adapters and ``main.py``; they operate on a ``StateStore``.
+"""
 import json
+import sqlite3
+import threading
+import time
 from pathlib import Path
+from typing import Iterable, Optional
+
 from .paths import ensure_dir
 
-def load_state(state_path: Path) -> dict:
-    if state_path.exists():
-        return json.loads(state_path.read_text(encoding="utf-8"))
-    return {"seen_ids": {}, "summarized_ids": {}}
+MAX_IDS_PER_BUCKET = 2000
+LEGACY_STATE_NAME = "state.json"
+
+
+class StateStore:
+    def __init__(self, path: Path, *, max_per_bucket: int = MAX_IDS_PER_BUCKET):
+        ensure_dir(path.parent)
+        self.path = path
+        self.max_per_bucket = int(max_per_bucket)
+        self._lock = threading.RLock()
+        self._seen: dict = {}
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen (
+                bucket TEXT NOT NULL,
+                id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (bucket, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS seen_bucket_seq ON seen(bucket, seq);
+            CREATE TABLE IF NOT EXISTS feed_validators (
+                bucket TEXT PRIMARY KEY,
+                etag TEXT,
+                modified TEXT
+            );
+            CREATE TABLE IF NOT EXISTS source_health (
+                bucket TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                last_failure REAL,
+                last_success REAL,
+                open_until REAL
+            );
+            """
+        )
+        self._db.commit()
+        self._seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM seen").fetchone()[0]
+
+    # -- seen ids --------------------------------------------------------
+    def _bucket(self, bucket: str) -> set:
+        ids = self._seen.get(bucket)
+        if ids is None:
+            with self._lock:
+                ids = self._seen.get(bucket)
+                if ids is None:
+                    rows = self._db.execute("SELECT id FROM seen WHERE bucket = ?", (bucket,))
+                    ids = {r[0] for r in rows}
+                    self._seen[bucket] = ids
+        return ids
+
+    def have_seen(self, bucket: str, _id: str) -> bool:
+        return _id in self._bucket(bucket)
+
+    def mark_seen(self, bucket: str, ids: Iterable[str], *, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            seen = self._bucket(bucket)
+            rows = []
+            for _id in ids:
+                if _id in seen:
+                    continue
+                seen.add(_id)
+                self._seq += 1
+                rows.append((bucket, _id, self._seq, now))
+            if not rows:
+                return
+            self._db.executemany("INSERT OR IGNORE INTO seen (bucket, id, seq, seen_at) VALUES (?, ?, ?, ?)", rows)
+            overflow = len(seen) - self.max_per_bucket
+            if self.max_per_bucket > 0 and overflow > 0:
+                oldest = [r[0] for r in self._db.execute(
+                    "SELECT id FROM seen WHERE bucket = ? ORDER BY seq LIMIT ?", (bucket, overflow)
+                )]
+                self._db.executemany("DELETE FROM seen WHERE bucket = ? AND id = ?", [(bucket, i) for i in oldest])
+                seen.difference_update(oldest)
+            self._db.commit()
+
+    # -- feed validators -------------------------------------------------
+    def feed_validators(self, bucket: str) -> dict:
+        with self._lock:
+            row = self._db.execute("SELECT etag, modified FROM feed_validators WHERE bucket = ?", (bucket,)).fetchone()
+        if not row:
+            return {}
+        return {k: v for k, v in zip(("etag", "modified"), row) if v}
+
+    def set_feed_validators(self, bucket: str, validators: dict):
+        etag = (validators or {}).get("etag") or None
+        modified = (validators or {}).get("modified") or None
+        with self._lock:
+            if etag or modified:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO feed_validators (bucket, etag, modified) VALUES (?, ?, ?)",
+                    (bucket, etag, modified),
+                )
+            else:
+                self._db.execute("DELETE FROM feed_validators WHERE bucket = ?", (bucket,))
+            self._db.commit()
+
+    # -- source health ---------------------------------------------------
+    _HEALTH_FIELDS = ("failures", "last_error", "last_failure", "last_success", "open_until")
+
+    def source_health(self, bucket: str) -> dict:
+        """{failures, last_error, last_failure, last_success, open_until}; empty if never polled."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT failures, last_error, last_failure, last_success, open_until FROM source_health WHERE bucket = ?",
+                (bucket,),
+            ).fetchone()
+        return dict(zip(self._HEALTH_FIELDS, row)) if row else {}
+
+    def all_source_health(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT bucket, failures, last_error, last_failure, last_success, open_until FROM source_health ORDER BY bucket"
+            ).fetchall()
+        return {r[0]: dict(zip(self._HEALTH_FIELDS, r[1:])) for r in rows}
+
+    def record_source_result(
+        self,
+        bucket: str,
+        *,
+        error: Optional[str] = None,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        now: Optional[float] = None,
+    ) -> dict:
+        """Record one poll; `failure_threshold` failures in a row open the breaker for `cooldown_seconds`.
+
+        A success resets the count. A failure while the count is already at the
+        threshold (the trial poll after a cool-down) re-opens it straight away.
+        """
+        now = time.time() if now is None else now
+        health = self.source_health(bucket)
+        if error is None:
+            health.update(failures=0, last_success=now, open_until=None)
+        else:
+            failures = (health.get("failures") or 0) + 1
+            open_until = now + cooldown_seconds if failure_threshold > 0 and failures >= failure_threshold else None
+            health.update(failures=failures, last_error=error[:500], last_failure=now, open_until=open_until)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO source_health (bucket, failures, last_error, last_failure, last_success, open_until) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket, *(health.get(k) for k in self._HEALTH_FIELDS)),
+            )
+            self._db.commit()
+        return health
+
+    # -- lifecycle -------------------------------------------------------
+    def migrate_json(self, json_path: Path):
+        """Import a legacy ``state.json`` (ids keep their listed order as age)."""
+        legacy = json.loads(json_path.read_text(encoding="utf-8"))
+        stamp = json_path.stat().st_mtime
+        for bucket, ids in (legacy.get("seen_ids") or {}).items():
+            self.mark_seen(bucket, ids, now=stamp)
+        for bucket, validators in (legacy.get("feed_validators") or {}).items():
+            self.set_feed_validators(bucket, validators)
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_state(state_path: Path) -> StateStore:
+    """Open the state database, importing a sibling legacy state.json once."""
+    is_new = not state_path.exists()
+    state = StateStore(state_path)
+    legacy = state_path.with_name(LEGACY_STATE_NAME)
+    if is_new and legacy.exists() and legacy != state_path:
+        state.migrate_json(legacy)
+        legacy.replace(legacy.with_name(LEGACY_STATE_NAME + ".migrated"))
+    return state
+
+def save_state(state_path: Path, state: StateStore):
+    # Writes are incremental; this only makes sure everything is committed.
+    state.commit()
+
+def mark_seen(state: StateStore, bucket: str, ids):
+    state.mark_seen(bucket, ids)
+
+def have_seen(state: StateStore, bucket: str, _id: str) -> bool:
+    return state.have_seen(bucket, _id)
 
-def save_state(state_path: Path, state: dict):
-    ensure_dir(state_path.parent)
-    tmp = state_path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
-    tmp.replace(state_path)
+def get_feed_validators(state: StateStore, bucket: str) -> dict:
+    """Last ETag/Last-Modified seen for a feed (empty dict if none)."""
+    return state.feed_validators(bucket)
 
-def mark_seen(state: dict, bucket: str, ids):
-    seen = set(state["seen_ids"].get(bucket, []))
-    seen.update(ids)
-    state["seen_ids"][bucket] = sorted(list(seen))[-2000:]
+def set_feed_validators(state: StateStore, bucket: str, validators: dict):
+    state.set_feed_validators(bucket, validators)
 
-def have_seen(state: dict, bucket: str, _id: str) -> bool:
-    return _id in set(state["seen_ids"].get(bucket, []))
\ No newline at end of file
+def get_source_health(state: StateStore, bucket: str) -> dict:
+    """Consecutive failures, last error and breaker cool-down of a source (empty if unknown)."""
+    return state.source_health(bucket)
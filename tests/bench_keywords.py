@@ -0,0 +1,148 @@
+"""
+Benchmark the compiled bioRxiv keyword matcher against the original
+per-keyword scan (`_match_keywords`, reproduced below as the baseline).
+
+Usage:
+
+    python -m tests.bench_keywords [--items 5000] [--keywords 40] [--repeat 3]
+
+Builds a synthetic window of titles/abstracts, checks that the compiled matcher
+selects exactly the same items as the baseline (substring mode) and as a naive
+per-keyword regex loop (word mode), and prints timings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.sources.keywords import KeywordMatcher
+
+
+def _match_keywords(txt: str, keywords: list[str]) -> bool:
+    # Baseline: the implementation biorxiv.py used before the compiled matcher.
+    if not keywords:
+        return True
+    t = (txt or "").lower()
+    for kw in keywords:
+        if kw.strip() and kw.strip().lower() in t:
+            return True
+    return False
+
+
+def _match_keywords_word(txt: str, keywords: list[str]) -> bool:
+    # Naive word-boundary variant: one regex search per keyword per text.
+    t = (txt or "").lower()
+    for kw in keywords:
+        kw = " ".join(kw.split()).lower()
+        if kw and re.search(rf"(?<!\w){re.escape(kw)}(?!\w)", t):
+            return True
+    return False
+
+
+# Filler words chosen not to contain any keyword, so ~20% of items match.
+VOCAB = (
+    "cell gene expression assay mouse human tissue pathway signaling receptor "
+    "variant mutation clinical cohort imaging microscopy evolution population "
+    "we show that these results suggest a novel mechanism underlying regulation "
+    "in vivo vitro response growth development neurons synaptic plasticity"
+).split()
+KEYWORD_POOL = [
+    "machine learning", "deep learning", "protein", "structure", "folding", "ligand",
+    "RNA", "DNA", "drug discovery", "QSAR", "ADMET", "docking", "molecular dynamics",
+    "transformer", "language model", "diffusion model", "graph neural network",
+    "cryo-EM", "AlphaFold", "binding affinity", "virtual screening", "enzyme design",
+    "antibody", "kinase inhibitor", "generative model", "foundation model", "embedding",
+    "active learning", "Bayesian optimization", "reinforcement learning", "CRISPR",
+    "single-cell", "spatial transcriptomics", "proteomics", "metabolomics", "toxicity",
+    "pharmacokinetics", "de novo design", "peptide", "small molecule", "lead optimization",
+]
+
+
+def _synthetic_window(n: int, rng: random.Random) -> list[tuple[str, str]]:
+    items = []
+    for _ in range(n):
+        title = " ".join(rng.choice(VOCAB) for _ in range(10)).capitalize()
+        words = [rng.choice(VOCAB) for _ in range(220)]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(KEYWORD_POOL))
+        items.append((title, " ".join(words)))
+    return items
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_benchmark(n_items: int = 5000, n_keywords: int = 40, repeat: int = 3, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    keywords = KEYWORD_POOL[:n_keywords]
+    window = _synthetic_window(n_items, rng)
+
+    def baseline():
+        return [_match_keywords(t, keywords) or _match_keywords(a, keywords) for t, a in window]
+
+    def naive_word():
+        return [_match_keywords_word(t, keywords) or _match_keywords_word(a, keywords) for t, a in window]
+
+    def compiled(mode: str, hits: bool, automaton: bool = True):
+        def run():
+            # Built inside the timed region: construction is part of the per-entry cost.
+            m = KeywordMatcher(keywords, mode)
+            if not automaton:
+                m._automaton = None  # the per-keyword scan used without pyahocorasick
+            if hits:
+                return [bool(m.search(t, a)) for t, a in window]
+            return [m.matches(t, a) for t, a in window]
+        return run
+
+    expected = baseline()
+    assert compiled("substring", False)() == expected, "compiled matcher disagrees with baseline"
+    assert compiled("substring", True)() == expected, "compiled search() disagrees with baseline"
+    assert compiled("substring", True, automaton=False)() == expected, "fallback search() disagrees with baseline"
+    expected_word = naive_word()
+    assert compiled("word", False)() == expected_word, "word mode disagrees with naive regex"
+    assert compiled("word", True)() == expected_word, "word-mode search() disagrees with naive regex"
+
+    return {
+        "items": n_items,
+        "keywords": len(keywords),
+        "matched": sum(expected),
+        "timings": [
+            ("baseline _match_keywords", _time(baseline, repeat)),
+            ("substring matches()", _time(compiled("substring", False), repeat)),
+            ("substring search()", _time(compiled("substring", True), repeat)),
+            ("substring scan fallback", _time(compiled("substring", True, automaton=False), repeat)),
+            ("naive word regex loop", _time(naive_word, repeat)),
+            ("word matches()", _time(compiled("word", False), repeat)),
+            ("word search()", _time(compiled("word", True), repeat)),
+            ("phrase search()", _time(compiled("phrase", True), repeat)),
+        ],
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=5000)
+    ap.add_argument("--keywords", type=int, default=40)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    r = run_benchmark(args.items, args.keywords, args.repeat)
+    print(f"{r['items']} items × {r['keywords']} keywords ({r['matched']} matched)")
+    for name, secs in r["timings"]:
+        print(f"  {name:<26}: {secs * 1000:8.1f} ms")
@@ -0,0 +1,292 @@
+"""
+Offline end-to-end benchmark of the full `src.main` pipeline.
+
+Usage:
+
+    python -m tests.bench_pipeline [--sources 10,100,1000] [--llm-latency-ms 50]
+                                   [--http-latency-ms 5] [--json results.json]
+
+A local HTTP server (in this process) stands in for the internet: blog Atom
+feeds, YouTube channel feeds, the bioRxiv details API (through the entries'
+``api_base``) and article HTML, all synthetic and deterministic. Each scale
+runs ``main()`` in a fresh interpreter against a new storage dir, with a fake
+LLM client that sleeps ``--llm-latency-ms`` per request and reports token
+usage, so collect, extraction, the summary scheduler, rendering and metrics
+run exactly as in production.
+
+Sources are 70% blogs, 20% YouTube channels and 10% bioRxiv queries; all share
+one host here, so the per-host cap is disabled for the run. Per scale it
+prints wall time, throughput (summarized posts per second), stage times from
+the run's metrics file, summarization and per-source poll latency
+percentiles, and the worker's peak RSS. ``--json`` saves the rows for
+comparison between commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+ENTRIES_PER_FEED = 5
+BIORXIV_WINDOW = 250
+WORDS = ("protein", "folding", "language", "model", "reasoning", "structure", "ligand", "benchmark", "latency", "cache")
+
+
+# -- synthetic internet ---------------------------------------------------
+
+def _words(seed: int, n: int) -> str:
+    return " ".join(WORDS[(seed * 7 + k * 3) % len(WORDS)] for k in range(n))
+
+
+def _blog_feed(base: str, j: int) -> str:
+    entries = "".join(
+        f"<entry><id>blog{j}-{i}</id><title>Blog {j} post {i}: {_words(j + i, 5)}</title>"
+        f"<link href='{base}/article/{j}/{i}'/><updated>2025-01-{1 + i:02d}T10:00:00Z</updated>"
+        f"<summary>{_words(j * i, 30)}</summary></entry>"
+        for i in range(ENTRIES_PER_FEED)
+    )
+    return f"<?xml version='1.0'?><feed xmlns='http://www.w3.org/2005/Atom'><title>Blog {j}</title>{entries}</feed>"
+
+
+def _article(j: int, i: int) -> str:
+    paragraphs = "".join(f"<p>{_words(j + i + k, 60)}.</p>" for k in range(12))
+    return (
+        f"<html><head><title>Post {j}/{i}</title></head><body><nav>Home | About</nav>"
+        f"<article><h1>Blog {j} post {i}</h1>{paragraphs}</article><footer>(c) blog {j}</footer></body></html>"
+    )
+
+
+def _youtube_feed(j: int) -> str:
+    entries = "".join(
+        f"<entry><id>yt:video:c{j}v{i}</id><yt:videoId>c{j}v{i}</yt:videoId><title>Channel {j} video {i}</title>"
+        f"<link rel='alternate' href='https://www.youtube.com/watch?v=c{j}v{i}'/>"
+        f"<published>2025-01-{1 + i:02d}T10:00:00Z</published>"
+        f"<media:group><media:description>{_words(j + i, 40)}</media:description></media:group></entry>"
+        for i in range(ENTRIES_PER_FEED)
+    )
+    return (
+        "<?xml version='1.0'?><feed xmlns='http://www.w3.org/2005/Atom' "
+        "xmlns:yt='http://www.youtube.com/xml/schemas/2015' xmlns:media='http://search.yahoo.com/mrss/'>"
+        f"{entries}</feed>"
+    )
+
+
+def _biorxiv_page(cursor: int) -> str:
+    today = date.today().isoformat()
+    collection = [
+        {"doi": f"10.1101/{i}", "title": f"Preprint {i}: {_words(i, 6)}", "abstract": _words(i + 1, 80), "date": today}
+        for i in range(cursor, min(BIORXIV_WINDOW, cursor + 100))
+    ]
+    return json.dumps({"messages": [{"status": "ok", "total": str(BIORXIV_WINDOW)}], "collection": collection})
+
+
+def start_server(latency: float = 0.0) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            base = f"http://{self.headers['Host']}"
+            if parts[0] == "blog":
+                body, ctype = _blog_feed(base, int(parts[1])), "application/atom+xml"
+            elif parts[0] == "article":
+                body, ctype = _article(int(parts[1]), int(parts[2])), "text/html"
+            elif parts[0] == "youtube":
+                body, ctype = _youtube_feed(int(parts[1])), "application/atom+xml"
+            elif parts[0] == "biorxiv":
+                body, ctype = _biorxiv_page(int(parts[-1])), "application/json"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if latency:
+                time.sleep(latency)
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_config(path: Path, base: str, n_sources: int, storage: Path) -> Path:
+    n_bio = max(1, n_sources // 10)
+    n_yt = max(1, n_sources // 5)
+    n_blog = max(1, n_sources - n_bio - n_yt)
+    lines = [
+        f'storage_dir: "{storage / "data"}"',
+        'interests: "protein folding, language model reasoning"',
+        "llm:",
+        "  max_concurrency: 8",
+        "cache:",
+        "  enabled: false",
+        "output:",
+        f'  save_dir: "{storage / "reports"}"',
+        '  formats: ["html", "md"]',
+        "  incremental: false",
+        "sources:",
+        "  max_concurrency: 8",
+        "  per_host_concurrency: 0   # every source is on the local server",
+        "  blogs:",
+        *(f"    - {{key: blog{j}, feed: '{base}/blog/{j}/feed'}}" for j in range(n_blog)),
+        "  youtube:",
+        *(f"    - {{key: yt{j}, feed: '{base}/youtube/{j}/feed', digest_mode: title_plus_description}}" for j in range(n_yt)),
+        "  biorxiv:",
+        *(
+            f"    - {{key: bio{j}, keywords: [{WORDS[j % len(WORDS)]}], days: 2, max_results: {BIORXIV_WINDOW}, "
+            f"max_keep: 3, api_base: '{base}/biorxiv'}}"
+            for j in range(n_bio)
+        ),
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+# -- fake LLM -------------------------------------------------------------
+
+class FakeResponses:
+    """`client.responses` stand-in: sleeps, then answers with a canned summary."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, *, model, input, text=None, **kwargs):
+        time.sleep(self.latency)
+        content = input[-1]["content"]
+        if text and text.get("format", {}).get("type") == "json_object":
+            n = content.count("### ITEM ")
+            output = json.dumps({"items": [{"n": k, "summary": f"- summary of item {k}"} for k in range(1, n + 1)]})
+        else:
+            output = "- " + " ".join(content.split()[:30])
+        in_tokens = sum(len(m["content"]) for m in input) // 4
+        usage = SimpleNamespace(
+            input_tokens=in_tokens,
+            output_tokens=len(output) // 4,
+            input_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        return SimpleNamespace(output_text=output, usage=usage)
+
+
+class FakeClient:
+    def __init__(self, latency: float):
+        self.responses = FakeResponses(latency)
+
+
+# -- one scale, in a fresh interpreter ------------------------------------
+
+def _percentiles(values, qs=(50, 95, 99)) -> dict:
+    values = sorted(values)
+    if not values:
+        return {f"p{q}": 0.0 for q in qs}
+    return {f"p{q}": values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))] for q in qs}
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KiB elsewhere
+
+
+def run_worker(config: Path, llm_latency: float) -> dict:
+    from src.main import main
+
+    argv = ["--config", str(config), "--prompts", str(ROOT / "prompts"), "--limit", "1000000", "--no-open"]
+    log = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        rc = main(argv, client=FakeClient(llm_latency))
+    wall = time.perf_counter() - t0
+    if rc:
+        raise SystemExit(f"main() returned {rc}:\n{log.getvalue()}")
+
+    reports = config.parent / "reports"
+    metrics = json.loads(max(reports.glob("metrics-*.json")).read_text(encoding="utf-8"))
+    llm_posts = [p for p in metrics["posts"] if p["llm_calls"]]
+    return {
+        "sources": len(metrics["sources"]),
+        "posts": metrics["totals"]["posts"],
+        "llm_calls": metrics["totals"]["llm_calls"],
+        "wall_s": wall,
+        "posts_per_s": metrics["totals"]["posts"] / wall if wall else 0.0,
+        "stages": metrics["stages"],
+        "summarize_ms": {k: v * 1000 for k, v in _percentiles([p["seconds"] for p in llm_posts]).items()},
+        "poll_ms": {k: v * 1000 for k, v in _percentiles([s["seconds"] for s in metrics["sources"].values()]).items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_benchmark(scales=(10, 100, 1000), llm_latency_ms: float = 50.0, http_latency_ms: float = 5.0) -> list:
+    server = start_server(http_latency_ms / 1000)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    rows = []
+    try:
+        for n in scales:
+            with tempfile.TemporaryDirectory() as tmp:
+                config = write_config(Path(tmp) / "config.yml", base, n, Path(tmp))
+                proc = subprocess.run(
+                    [sys.executable, "-m", "tests.bench_pipeline", "--worker", str(config),
+                     "--llm-latency-ms", str(llm_latency_ms)],
+                    cwd=ROOT, capture_output=True, text=True,
+                )
+                if proc.returncode:
+                    raise RuntimeError(f"{n} sources: worker failed\n{proc.stdout}\n{proc.stderr}")
+                rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sources", default="10,100,1000", help="comma-separated source counts")
+    ap.add_argument("--llm-latency-ms", type=float, default=50.0, help="fake LLM latency per request")
+    ap.add_argument("--http-latency-ms", type=float, default=5.0, help="added latency per local HTTP response")
+    ap.add_argument("--json", default=None, help="also write the result rows to this file")
+    ap.add_argument("--worker", default=None, help=argparse.SUPPRESS)  # config path; internal
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(Path(args.worker), args.llm_latency_ms / 1000)))
+        sys.exit(0)
+
+    rows = run_benchmark(
+        tuple(int(s) for s in args.sources.split(",") if s.strip()),
+        llm_latency_ms=args.llm_latency_ms,
+        http_latency_ms=args.http_latency_ms,
+    )
+    print(f"LLM latency {args.llm_latency_ms:.0f} ms/request, HTTP latency {args.http_latency_ms:.0f} ms/response")
+    for r in rows:
+        st = r["stages"]
+        s, p = r["summarize_ms"], r["poll_ms"]
+        print(
+            f"{r['sources']:>5} sources: {r['posts']:>5} posts ({r['llm_calls']} LLM calls) in {r['wall_s']:7.2f} s"
+            f" = {r['posts_per_s']:7.1f} posts/s, peak RSS {r['peak_rss_mb']:6.1f} MB"
+        )
+        print("       stages  : " + ", ".join(f"{k} {v:.2f}s" for k, v in st.items()))
+        print(f"       summarize: p50 {s['p50']:.0f} / p95 {s['p95']:.0f} / p99 {s['p99']:.0f} ms per post")
+        print(f"       poll     : p50 {p['p50']:.0f} / p95 {p['p95']:.0f} / p99 {p['p99']:.0f} ms per source")
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
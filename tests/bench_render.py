@@ -0,0 +1,137 @@
+"""
+Benchmark digest rendering: the shared, precompiled Jinja environment with
+streamed output against the original per-call `jinja2.Template` + full-string
+write (reproduced below as the baseline), and a same-day re-render from the
+digest store, where every per-item fragment is already cached.
+
+Usage:
+
+    python -m tests.bench_render [--items 3000] [--repeat 5]
+
+Renders md, html and notes for a synthetic digest, checks that both paths
+write byte-identical files, and prints timings and peak traced memory. With
+thousands of items the render loop itself dominates, so the wall-clock gain is
+mostly the per-call compile; streaming shows up in the peak memory column.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from jinja2 import Template
+
+from src.report.render import FORMATS, TEMPLATES_DIR, digest_stats, render_digest
+from src.report.store import DigestStore
+
+
+def _render_baseline(items, reports_dir: Path):
+    # Baseline: what render_digest did before the shared environment.
+    today = date.today().isoformat()
+    stats = digest_stats(items)
+    for fmt, (template_name, item_template, file_pattern) in FORMATS.items():
+        tpl = Template((TEMPLATES_DIR / template_name).read_text(encoding="utf-8"))
+        item_tpl = Template((TEMPLATES_DIR / item_template).read_text(encoding="utf-8"))
+        out = tpl.render(date=today, items=items, stats=stats, fragment=lambda item: item_tpl.render(item=item))
+        (reports_dir / file_pattern.format(date=today)).write_text(out, encoding="utf-8")
+
+
+def _synthetic_items(n: int, rng: random.Random) -> list:
+    kinds = [("blog", "Example Blog"), ("video", "Some Channel"), ("paper", "bioRxiv")]
+    items = []
+    for i in range(n):
+        kind, name = kinds[i % len(kinds)]
+        md = {"display_name": f"{name} {i % 17}"}
+        if kind == "paper":
+            md.update({"matched_total": 40, "max_keep": 25, "matched_partial": i % 2 == 0})
+        if i % 3 == 0:
+            md["relevance"] = rng.random() * 10
+        post = {
+            "id": str(i),
+            "source_key": f"{kind}-{i % 17}",
+            "kind": kind,
+            "title": f"Post {i} about <protein> folding & friends",
+            "url": f"https://example.org/{kind}/{i}",
+            "published": f"2025-01-{1 + i % 28:02d}T00:00:00Z",
+            "metadata": md,
+        }
+        summary = "\n".join(f"- point {j}: " + " ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(12)) for j in range(5))
+        items.append({"post": post, "summary": summary})
+    return items
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(n_items: int = 3000, repeat: int = 5, seed: int = 0) -> dict:
+    items = _synthetic_items(n_items, random.Random(seed))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Path(tmp)
+        base_dir, new_dir = storage / "baseline", storage / "reports"
+        base_dir.mkdir()
+
+        def baseline():
+            _render_baseline(items, base_dir)
+
+        def shared():
+            render_digest(items, storage, formats=tuple(FORMATS), out_dir=new_dir)
+
+        store = DigestStore(storage / "digest_store.sqlite")
+        store_dir = storage / "incremental"
+
+        def incremental():
+            render_digest(items, storage, formats=tuple(FORMATS), out_dir=store_dir, store=store)
+
+        baseline()
+        shared()
+        incremental()  # fills the store and its fragment cache
+        for path in sorted(base_dir.iterdir()):
+            assert path.read_bytes() == (new_dir / path.name).read_bytes(), f"{path.name} differs from baseline"
+
+        return {
+            "items": n_items,
+            "bytes": sum(p.stat().st_size for p in new_dir.iterdir()),
+            "timings": [
+                ("baseline Template per call", _time(baseline, repeat), _peak(baseline)),
+                ("shared env + generate()", _time(shared, repeat), _peak(shared)),
+                ("store, fragments cached", _time(incremental, repeat), _peak(incremental)),
+            ],
+        }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=3000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    r = run_benchmark(args.items, args.repeat)
+    print(f"{r['items']} items, 3 formats ({r['bytes'] / 1e6:.1f} MB written)")
+    for name, secs, peak in r["timings"]:
+        print(f"  {name:<28}: {secs * 1000:8.1f} ms   peak {peak / 1e6:6.1f} MB")
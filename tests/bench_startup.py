@@ -0,0 +1,119 @@
+"""
+Startup-time regression check for the CLI.
+
+Usage:
+
+    python -m tests.bench_startup [--repeat 5] [--budget-ms 250]
+
+Runs, in fresh interpreters with ``-X importtime``:
+
+1. ``import src.main`` -- the cost every invocation pays before doing work;
+2. a no-op run (``python -m src.main`` with a config whose only source is
+   disabled), which must exit without touching the network or the LLM.
+
+Prints the best-of-N import time and the slowest imports, and exits non-zero
+if ``import src.main`` exceeds the budget or if either step imports one of the
+heavy dependencies that should load only on demand (trafilatura, openai, bs4,
+feedparser, requests, numpy, jinja2).
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+HEAVY = ("trafilatura", "openai", "bs4", "feedparser", "requests", "numpy", "jinja2")
+
+NOOP_CONFIG = """\
+storage_dir: "{storage}"
+interests: "anything"
+sources:
+  blogs:
+    - key: disabled_blog
+      feed: "https://example.invalid/feed"
+      enabled: false
+"""
+
+
+def _importtime(argv: list[str]) -> tuple[dict, float]:
+    """Run python -X importtime with `argv`; return ({module: cumulative µs}, wall seconds)."""
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - t0
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            modules[name.strip()] = int(cumulative)
+        except ValueError:  # header line
+            continue
+    return modules, wall
+
+
+def _heavy(modules: dict) -> list[str]:
+    return sorted({m.split(".")[0] for m in modules} & set(HEAVY))
+
+
+def run_benchmark(repeat: int = 5) -> dict:
+    best_import, best_profile = float("inf"), {}
+    for _ in range(repeat):
+        modules, _ = _importtime(["-c", "import src.main"])
+        us = modules.get("src.main", 0)
+        if us < best_import:
+            best_import, best_profile = us, modules
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Path(tmp) / "config.yml"
+        config.write_text(NOOP_CONFIG.format(storage=Path(tmp) / "data"), encoding="utf-8")
+        best_noop, noop_modules = float("inf"), {}
+        for _ in range(repeat):
+            modules, wall = _importtime(["-m", "src.main", "--config", str(config)])
+            if wall < best_noop:
+                best_noop, noop_modules = wall, modules
+
+    own = {m: us for m, us in best_profile.items() if m.startswith("src.") or "." not in m}
+    return {
+        "import_ms": best_import / 1000,
+        "slowest": sorted(own.items(), key=lambda kv: kv[1], reverse=True)[:8],
+        "import_heavy": _heavy(best_profile),
+        "noop_s": best_noop,
+        "noop_heavy": _heavy(noop_modules),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=250.0, help="max cumulative import time of src.main")
+    args = ap.parse_args()
+
+    r = run_benchmark(args.repeat)
+    print(f"import src.main : {r['import_ms']:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, us in r["slowest"]:
+        print(f"  {name:<34}: {us / 1000:8.1f} ms")
+    print(f"no-op run       : {r['noop_s'] * 1000:8.1f} ms wall")
+
+    failures = []
+    if r["import_ms"] > args.budget_ms:
+        failures.append(f"import src.main took {r['import_ms']:.1f} ms > {args.budget_ms:.0f} ms")
+    if r["import_heavy"]:
+        failures.append(f"import src.main pulls in {', '.join(r['import_heavy'])}")
+    if r["noop_heavy"]:
+        failures.append(f"no-op run pulls in {', '.join(r['noop_heavy'])}")
+    for msg in failures:
+        print(f"REGRESSION: {msg}")
+    sys.exit(1 if failures else 0)
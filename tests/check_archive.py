@@ -0,0 +1,96 @@
+"""
+Check post archive lookups across index growth and reopening (src.util.archive).
+
+Usage:
+
+    python -m tests.check_archive [--posts 1200] [--segment-mb 0.05]
+
+For each compression codec available here, stores `--posts` bodies (two index
+keys each, so the 1024-slot index doubles more than once) in a temporary dir
+with small segments, and asserts that:
+
+- every body is found by post id and by content hash right after it is stored,
+  and all of them still are after the index has grown;
+- identical bodies share one record, and unknown ids and hashes miss;
+- after closing and reopening, the grown index is loaded as it was and every
+  lookup still round-trips.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.util.archive import DEFAULT_CAPACITY, MAX_LOAD, PostArchive, _zstd, content_hash
+
+
+def _body(rng: random.Random, i: int) -> str:
+    words = " ".join(f"w{rng.randrange(3000)}" for _ in range(rng.randrange(20, 400)))
+    return f"# Post {i}\n\n{words}\n"
+
+
+def _check_all(archive: PostArchive, bodies: dict, digests: dict):
+    for (key, pid), text in bodies.items():
+        assert archive.get(key, pid) == text, f"{key}:{pid} lost"
+        assert archive.get_by_hash(digests[(key, pid)]) == text, f"hash of {key}:{pid} lost"
+
+
+def run_check(n_posts: int, segment_mb: float, compression: str) -> dict:
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "posts"
+        bodies = {}
+        digests = {}
+        with PostArchive(root, compression=compression, segment_mb=segment_mb) as archive:
+            assert archive._capacity == DEFAULT_CAPACITY
+            for i in range(n_posts):
+                key, pid = f"blog_{i % 7}", f"p-{i}"
+                text = _body(rng, i)
+                digest = archive.put(key, pid, text)
+                assert digest == content_hash(text)
+                assert archive.get(key, pid) == text, f"{key}:{pid} not readable right after put"
+                bodies[(key, pid)] = text
+                digests[(key, pid)] = digest
+            capacity = archive._capacity
+            assert capacity > DEFAULT_CAPACITY, "index never grew"
+            assert len(archive) == 2 * n_posts
+            assert len(archive) <= capacity * MAX_LOAD
+            _check_all(archive, bodies, digests)
+
+            # A crosspost with the same body adds an id key, not a record
+            shared = bodies[("blog_0", "p-0")]
+            archive.put("youtube_x", "v-1", shared)
+            bodies[("youtube_x", "v-1")] = shared
+            digests[("youtube_x", "v-1")] = digests[("blog_0", "p-0")]
+            assert len(archive) == 2 * n_posts + 1
+            assert archive.get("blog_0", "p-missing") is None
+            assert archive.get_by_hash(content_hash("never stored")) is None
+            segments = len(list(root.glob("seg-*.dat")))
+
+        with PostArchive(root, compression=compression, segment_mb=segment_mb) as archive:
+            assert archive._capacity == capacity, "reopened index has a different size"
+            assert len(archive) == 2 * n_posts + 1
+            _check_all(archive, bodies, digests)
+            assert archive.misses == 0
+
+        return {"posts": n_posts, "capacity": capacity, "segments": segments}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--posts", type=int, default=1200)
+    ap.add_argument("--segment-mb", type=float, default=0.05, help="small segments, so records span several files")
+    args = ap.parse_args()
+
+    codecs = ["gzip", "none"] + (["zstd"] if _zstd() is not None else [])
+    for codec in codecs:
+        r = run_check(args.posts, args.segment_mb, codec)
+        print(f"archive OK ({codec}): {r['posts']} posts, index grew to {r['capacity']} slots, {r['segments']} segment(s)")
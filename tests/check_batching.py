@@ -0,0 +1,104 @@
+"""
+Check that batched summarization reports the tokens actually spent (src.agent.router).
+
+Usage:
+
+    python -m tests.check_batching [--items 5]
+
+Summarizes one batch of short posts with a fake client whose batch reply
+answers all, some or none of the items, or whose batch request fails, and
+asserts that:
+
+- the answered items get their summaries from the batch and the others fall
+  back to single calls;
+- the usage summed over the returned items equals the usage of the requests
+  the client saw, so no request is counted twice or dropped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.agent.prompts import PromptRegistry
+from src.agent.router import MODEL, summarize_batch
+
+BATCH_USAGE = {"input_tokens": 1200, "output_tokens": 360}
+SINGLE_USAGE = {"input_tokens": 300, "output_tokens": 90}
+
+
+class FakeResponses:
+    """Answers the batch items in `answer` (1-based); ``answer=None`` sends broken JSON."""
+
+    def __init__(self, answer, fail_batch: bool = False):
+        self.answer = answer
+        self.fail_batch = fail_batch
+        self.spent = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
+
+    def create(self, *, model, input, text=None, **kwargs):
+        batch = bool(text and text.get("format", {}).get("type") == "json_object")
+        if batch and self.fail_batch:
+            raise RuntimeError("batch request failed")
+        usage = BATCH_USAGE if batch else SINGLE_USAGE
+        for name, val in usage.items():
+            self.spent[name] += val
+        self.spent["calls"] += 1
+        if not batch:
+            output = "- single summary"
+        elif self.answer is None:
+            output = "not json"
+        else:
+            output = json.dumps({"items": [{"n": n, "summary": f"- batch summary {n}"} for n in self.answer]})
+        return SimpleNamespace(
+            output_text=output,
+            usage=SimpleNamespace(**usage, input_tokens_details=SimpleNamespace(cached_tokens=0)),
+        )
+
+
+def _total(items: list) -> dict:
+    total = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
+    for it in items:
+        for name in total:
+            total[name] += (it.get("usage") or {}).get(name, 0)
+    return total
+
+
+def run_check(n_items: int) -> dict:
+    prompts = PromptRegistry.from_config(ROOT / "prompts", "genomics", None, model=MODEL)
+    posts = [
+        {"id": f"p-{i}", "kind": "blog", "source_key": "blog_a", "title": f"Post {i}",
+         "url": f"https://a.example/{i}", "text": f"A short post number {i}.", "metadata": {}}
+        for i in range(n_items)
+    ]
+    cases = {
+        "all parsed": (FakeResponses(list(range(1, n_items + 1))), n_items),
+        "some parsed": (FakeResponses(list(range(1, n_items + 1, 2))), (n_items + 1) // 2),
+        "none parsed": (FakeResponses(None), 0),
+        "batch failed": (FakeResponses([], fail_batch=True), 0),
+    }
+    for name, (responses, n_batched) in cases.items():
+        items = summarize_batch(posts, SimpleNamespace(responses=responses), prompts)
+        assert [it["post"] for it in items] == posts, f"{name}: order changed"
+        assert sum(1 for it in items if it.get("batched")) == n_batched, f"{name}: wrong items answered by the batch"
+        total = _total(items)
+        # Shares of a split request are floats; compare with a little slack
+        for key, spent in responses.spent.items():
+            assert abs(total[key] - spent) < 1e-6, f"{name}: reported {key} {total[key]} != spent {spent}"
+    return {"items": n_items, "cases": len(cases)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=5, help="posts in the batch (at least 2)")
+    args = ap.parse_args()
+
+    r = run_check(args.items)
+    print(f"batch usage OK: {r['cases']} cases of {r['items']} items, totals match the requests made")
@@ -0,0 +1,145 @@
+"""
+Check that a bad config edit leaves the daemon on its previous config (src.daemon).
+
+Usage:
+
+    python -m tests.check_daemon_reload
+
+Loads a config into a `Daemon` in a temporary dir (fake clock, polls and
+emissions recorded instead of run), then makes edits that parse as YAML
+but cannot be applied, and asserts that each one is logged and rejected
+whole:
+
+- a `poll_minutes` that is not a number;
+- new `interests` while a prompt template has an unknown placeholder;
+- an `llm:` change while OPENAI_API_KEY is missing.
+
+The config, intervals, schedule, prompts, client and cache are asserted to
+be the previous ones, and `tick()` keeps running. A valid edit afterwards
+is applied.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.daemon import Daemon
+from src.main import build_parser
+
+CONFIG = """
+storage_dir: "{tmp}/data"
+interests: "{interests}"
+llm: {{max_concurrency: {concurrency}}}
+output: {{save_dir: "{tmp}/reports"}}
+daemon: {{digest_times: ["07:00"]}}
+sources:
+  blogs:
+    - {{key: blog_a, feed: "http://127.0.0.1:9/a/feed", poll_minutes: {minutes}}}
+    - {{key: blog_b, feed: "http://127.0.0.1:9/b/feed"}}
+"""
+
+
+class _Edits:
+    """Rewrites config.yml with a fresh mtime each time, so the daemon sees every edit."""
+
+    def __init__(self, tmp: Path):
+        self.tmp = tmp
+        self.path = tmp / "config.yml"
+        self.stamp = 1_000_000_000.0
+
+    def write(self, interests="genomics", concurrency=4, minutes=30):
+        self.path.write_text(CONFIG.format(
+            tmp=self.tmp, interests=interests, concurrency=concurrency, minutes=minutes,
+        ), encoding="utf-8")
+        self.stamp += 10
+        os.utime(self.path, (self.stamp, self.stamp))
+
+
+def _snapshot(d: Daemon) -> tuple:
+    return (
+        d.cfg, dict(d.intervals), dict(d.next_due), list(d.times),
+        d.prompts, d._prompt_key, d.client, d._client_key, d.cache, d._cache_key,
+    )
+
+
+def run_check() -> dict:
+    with tempfile.TemporaryDirectory() as tmp_name:
+        tmp = Path(tmp_name)
+        prompts_dir = tmp / "prompts"
+        shutil.copytree(ROOT / "prompts", prompts_dir)
+        edits = _Edits(tmp)
+        edits.write()
+        args = build_parser().parse_args(["--config", str(edits.path), "--prompts", str(prompts_dir), "--daemon"])
+        os.environ.setdefault("OPENAI_API_KEY", "sk-check")
+        clock = [5000.0]
+        d = Daemon(args, clock=lambda: clock[0])
+        polled = []
+        d.poll = lambda keys: polled.append(sorted(keys))
+        d.emit = lambda: None
+        try:
+            assert d.reload_config(), "first config not applied"
+            assert d.intervals == {"blog_a": 1800.0, "blog_b": 3600.0}
+            d.tick()
+            assert polled == [["blog_a", "blog_b"]], polled
+            rejected = 0
+
+            # 1. poll_minutes that float() rejects
+            before = _snapshot(d)
+            edits.write(minutes='"soon"')
+            assert not d.reload_config(), "bad poll_minutes applied"
+            assert _snapshot(d) == before, "bad poll_minutes partly applied"
+            rejected += 1
+
+            # 2. new interests rebuild the prompts, and a template is broken
+            user = prompts_dir / "blog_user.txt"
+            good_template = user.read_text(encoding="utf-8")
+            user.write_text(good_template + "\n{audience}\n", encoding="utf-8")
+            edits.write(interests="proteomics")
+            assert not d.reload_config(), "broken prompt template applied"
+            assert _snapshot(d) == before, "broken prompt edit partly applied"
+            assert d.prompts.interests == "genomics"
+            user.write_text(good_template, encoding="utf-8")
+            rejected += 1
+
+            # 3. llm: changed, so the client is rebuilt, but the API key is gone
+            key = os.environ.pop("OPENAI_API_KEY")
+            dotenv = ROOT / ".env"
+            if not dotenv.exists():  # a local .env would supply the key again
+                edits.write(concurrency=8)
+                assert not d.reload_config(), "config applied without an API key"
+                assert _snapshot(d) == before, "keyless llm edit partly applied"
+                rejected += 1
+            os.environ["OPENAI_API_KEY"] = key
+
+            # The loop keeps going on the previous config
+            clock[0] += 1800
+            d.tick()
+            assert polled[-1] == ["blog_a"], polled
+
+            # A good edit still applies
+            edits.write(minutes=5, interests="proteomics")
+            assert d.reload_config(), "valid edit rejected"
+            assert d.intervals["blog_a"] == 300.0
+            assert d.prompts.interests == "proteomics"
+        finally:
+            if d.cache is not None:
+                d.cache.close()
+        return {"rejected": rejected}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.parse_args()
+
+    r = run_check()
+    print(f"daemon reload OK: {r['rejected']} bad edit(s) rejected, previous config kept, valid edit applied")
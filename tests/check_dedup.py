@@ -0,0 +1,164 @@
+"""
+Check cross-source near-duplicate clustering (src.aggregator.dedup).
+
+Usage:
+
+    python -m tests.check_dedup [--words 300] [--distinct 50]
+
+Builds synthetic posts in a temporary storage dir and asserts that:
+
+- a lightly edited copy of a post from another source, and a link to the same
+  page with tracking parameters, are merged into the first post's `also_at`;
+- distinct posts from the same sources all stay separate, as do
+  near-identical posts from one source (a feed's own reposts are not merged);
+- a copy arriving in a later run is dropped as covered by the stored digest;
+- when the per-source cap leaves a cluster's first copy out, another copy that
+  fits its own source's cap takes over, in a one-shot and a streaming run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.aggregator.dedup import Deduplicator
+from src.main import build_parser
+from src.pipeline import SummaryStream
+from src.summarize import select_posts
+
+VOCAB = [f"w{i}" for i in range(5000)]
+
+
+def _text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(n_words))
+
+
+def _edit(rng: random.Random, text: str, n_edits: int) -> str:
+    words = text.split()
+    for _ in range(n_edits):
+        words[rng.randrange(len(words))] = rng.choice(VOCAB)
+    return " ".join(words)
+
+
+def _post(source_key: str, pid: str, title: str, text: str, url: str, published: str = "") -> dict:
+    return {
+        "id": pid, "source_key": source_key, "kind": "blog", "title": title, "url": url, "text": text,
+        "published": published, "metadata": {"display_name": source_key.title()},
+    }
+
+
+def _capped_cluster(rng: random.Random, n_words: int, edits: int) -> tuple:
+    """Blog A posts three times, its oldest a crosspost of blog B's only post."""
+    story = _text(rng, n_words)
+    a = [
+        _post("blog_a", f"a-{i}", f"A post {i}", _text(rng, n_words) if i < 3 else story,
+              f"https://a.example/{i}", f"2026-10-0{5 - i}T10:00:00Z")
+        for i in (1, 2, 3)
+    ]
+    b1 = _post("blog_b", "b-1", "B post", _edit(rng, story, edits), "https://b.example/1", "2026-10-02T12:00:00Z")
+    return a, b1
+
+
+def check_capped_representative(storage: Path, n_words: int, edits: int):
+    """The story survives `blog_per_source: 1` although its first copy (A's oldest post) is capped out."""
+    rng = random.Random(3)
+    cfg = {"sources": {"blog_per_source_limit": 1}}
+    args = build_parser().parse_args([])
+
+    # One-shot run: dedup over the whole poll, then select_posts
+    (a1, a2, a3), b1 = _capped_cluster(rng, n_words, edits)
+    dedup = Deduplicator.from_config(storage, {"keep_days": 0})
+    try:
+        kept = dedup.filter([a1, a2, a3, b1])
+        assert kept == [a1, a2, a3] and b1["metadata"]["duplicate_of"] == "blog_a:a-3"
+        selected = select_posts(kept, cfg, args, dedup)
+        assert [p["id"] for p in selected] == ["a-1", "b-1"], [p["id"] for p in selected]
+        assert [c["id"] for c in b1["metadata"]["also_at"]] == ["a-3"], "capped-out copy not linked"
+        assert "also_at" not in a3["metadata"] and a3["metadata"]["duplicate_of"] == "blog_b:b-1"
+        assert dedup.filter([a1, a2, a3, b1]) == [a1, a2, b1], "filter disagrees with the promotion"
+        assert dedup.duplicates == 1
+    finally:
+        dedup.close()
+
+    # Streaming run: A finishes first, then B. Ranking holds every post back,
+    # so nothing is summarized and the held posts can be inspected.
+    (a1, a2, a3), b1 = _capped_cluster(random.Random(3), n_words, edits)
+    dedup = Deduplicator.from_config(storage, {"keep_days": 0})
+    stream = SummaryStream(cfg, storage, build_parser().parse_args(["--rank"]), lambda: None, None, None, dedup=dedup)
+    try:
+        stream.sources_planned([("blogs", {"key": "blog_a"}), ("blogs", {"key": "blog_b"})])
+        stream.source_done("blog_a", [a1, a2, a3])
+        stream.source_done("blog_b", [b1])
+        held = sorted(p["id"] for _, _, p in stream._held)
+        assert held == ["a-1", "b-1"], held
+        assert [c["id"] for c in b1["metadata"]["also_at"]] == ["a-3"]
+        selected = select_posts(dedup.filter([a1, a2, a3, b1]), cfg, args, dedup)
+        assert sorted(p["id"] for p in selected) == ["a-1", "b-1"], "final selection differs from the stream"
+    finally:
+        stream.close()
+        dedup.close()
+
+
+def run_check(n_words: int, n_distinct: int) -> dict:
+    rng = random.Random(7)
+    story = _text(rng, n_words)
+    edits = max(1, n_words // 150)  # each edit changes <= 3 shingles: copies stay well above the 0.8 threshold
+    original = _post("blog_a", "a-1", "A new assay", story, "https://a.example/posts/assay")
+    crosspost = _post("blog_b", "b-1", "A new assay (crosspost)", _edit(rng, story, edits), "https://b.example/p/1")
+    linked = _post("blog_c", "c-1", "Assay", "short teaser", "https://www.a.example/posts/assay/?utm_source=rss#top")
+    repost = _post("blog_a", "a-2", "A new assay (updated)", _edit(rng, story, 1), "https://a.example/posts/assay-v2")
+    distinct = [
+        _post(("blog_a", "blog_b")[i % 2], f"d-{i}", f"Post {i}", _text(rng, n_words), f"https://d.example/{i}")
+        for i in range(n_distinct)
+    ]
+    posts = [original, crosspost, linked, repost] + distinct
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Path(tmp)
+        dedup = Deduplicator.from_config(storage, {})
+        try:
+            kept = dedup.filter(posts)
+            assert kept == [original, repost] + distinct, "wrong posts kept"
+            assert dedup.duplicates == 2, f"expected 2 copies, got {dedup.duplicates}"
+            also_at = [(c["source_key"], c["id"]) for c in original["metadata"]["also_at"]]
+            assert also_at == [("blog_b", "b-1"), ("blog_c", "c-1")], also_at
+            assert crosspost["metadata"]["duplicate_of"] == "blog_a:a-1"
+            assert "also_at" not in repost["metadata"], "same-source repost merged"
+            assert all("also_at" not in p["metadata"] for p in distinct), "distinct posts merged"
+            assert dedup.filter(posts) == kept, "filter is not idempotent"
+            dedup.remember([{"post": p} for p in kept])
+        finally:
+            dedup.close()
+
+        # Next run: another copy of the story, from a source not seen before
+        later = _post("youtube_d", "d-9", "Assay video", _edit(rng, story, edits), "https://youtube.com/watch?v=x")
+        fresh = _post("youtube_d", "d-10", "Something else", _text(rng, n_words), "https://youtube.com/watch?v=y")
+        dedup = Deduplicator.from_config(storage, {})
+        try:
+            assert dedup.filter([later, fresh]) == [fresh], "copy of an earlier digest's post kept"
+            assert dedup.covered == [later]
+            assert later["metadata"]["covered_by"]["url"] == original["url"]
+        finally:
+            dedup.close()
+
+        check_capped_representative(storage, n_words, edits)
+
+    return {"posts": len(posts), "kept": len(kept), "merged": 2}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--words", type=int, default=300, help="words per synthetic post")
+    ap.add_argument("--distinct", type=int, default=50, help="unrelated posts mixed in")
+    args = ap.parse_args()
+
+    r = run_check(args.words, args.distinct)
+    print(f"dedup OK: {r['posts']} posts, {r['kept']} kept, {r['merged']} merged as copies")
@@ -0,0 +1,96 @@
+"""
+Check that an existing state.json is migrated into the SQLite state store.
+
+Usage:
+
+    python -m tests.check_state [--ids 2500]
+
+Writes a legacy state.json (seen ids for a few buckets, feed validators) into a
+temporary storage dir, opens it with `load_state` and asserts that:
+
+- every id is seen after the migration, up to the per-bucket bound, which
+  keeps the newest ids (those listed last);
+- feed validators survive;
+- state.json is renamed to state.json.migrated and is not imported again,
+  while ids marked after the migration persist across reopenings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.util.state import (
+    LEGACY_STATE_NAME, MAX_IDS_PER_BUCKET, get_feed_validators, have_seen, load_state, mark_seen, save_state,
+)
+
+
+def run_check(n_ids: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Path(tmp)
+        big = [f"post-{i}" for i in range(n_ids)]
+        legacy = {
+            "seen_ids": {
+                "blog_a": ["a-1", "a-2", "a-3"],
+                "youtube_b": ["b-1"],
+                "biorxiv_c": big,
+            },
+            "feed_validators": {
+                "blog_a": {"etag": '"abc123"', "modified": "Wed, 01 Oct 2025 08:00:00 GMT"},
+                "youtube_b": {"etag": 'W/"yt"'},
+            },
+        }
+        (storage / LEGACY_STATE_NAME).write_text(json.dumps(legacy), encoding="utf-8")
+        state_path = storage / "state.sqlite"
+
+        state = load_state(state_path)
+        try:
+            for bucket in ("blog_a", "youtube_b"):
+                for _id in legacy["seen_ids"][bucket]:
+                    assert have_seen(state, bucket, _id), f"{bucket}/{_id} lost in migration"
+            kept = big[-MAX_IDS_PER_BUCKET:]
+            assert all(have_seen(state, "biorxiv_c", i) for i in kept), "newest ids lost in migration"
+            dropped = big[:-MAX_IDS_PER_BUCKET]
+            assert not any(have_seen(state, "biorxiv_c", i) for i in dropped), "bucket bound not applied"
+            assert not have_seen(state, "blog_a", "b-1"), "ids leaked across buckets"
+            assert get_feed_validators(state, "blog_a") == legacy["feed_validators"]["blog_a"]
+            assert get_feed_validators(state, "youtube_b") == {"etag": 'W/"yt"'}
+            assert get_feed_validators(state, "biorxiv_c") == {}
+            mark_seen(state, "blog_a", ["a-4"])
+            save_state(state_path, state)
+        finally:
+            state.close()
+
+        assert state_path.exists(), "state.sqlite not created"
+        assert not (storage / LEGACY_STATE_NAME).exists(), "state.json left in place"
+        assert (storage / (LEGACY_STATE_NAME + ".migrated")).exists(), "state.json not renamed"
+
+        # A state.json that reappears must not be imported over the database
+        (storage / LEGACY_STATE_NAME).write_text(json.dumps({"seen_ids": {"blog_a": ["stale"]}}), encoding="utf-8")
+        state = load_state(state_path)
+        try:
+            assert have_seen(state, "blog_a", "a-4"), "id marked after migration lost on reopen"
+            assert have_seen(state, "blog_a", "a-1"), "migrated id lost on reopen"
+            assert not have_seen(state, "blog_a", "stale"), "state.json imported twice"
+            assert get_feed_validators(state, "blog_a") == legacy["feed_validators"]["blog_a"]
+        finally:
+            state.close()
+
+        return {"ids": n_ids + 4, "kept": len(kept), "dropped": len(dropped)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ids", type=int, default=MAX_IDS_PER_BUCKET + 500, help="ids in the large legacy bucket")
+    args = ap.parse_args()
+
+    r = run_check(args.ids)
+    print(f"state.json migration OK: {r['ids']} ids, {r['kept']} kept in the bounded bucket, {r['dropped']} evicted")